@@ -0,0 +1,58 @@
+"""unique daily ai usage rollup per org/model
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+# revision identifiers
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Merge duplicate rollup rows (possible under the old read-modify-write
+    # path) into the oldest row before adding the constraint
+    op.execute("""
+        WITH totals AS (
+            SELECT MIN(id) AS keep_id, organization_id, model, date,
+                   SUM(COALESCE(message_count, 0)) AS message_count,
+                   SUM(COALESCE(input_tokens, 0)) AS input_tokens,
+                   SUM(COALESCE(output_tokens, 0)) AS output_tokens,
+                   SUM(COALESCE(total_tokens, 0)) AS total_tokens,
+                   SUM(COALESCE(estimated_cost, 0)) AS estimated_cost
+            FROM ai_usage
+            GROUP BY organization_id, model, date
+            HAVING COUNT(*) > 1
+        ),
+        merged AS (
+            UPDATE ai_usage u
+            SET message_count = t.message_count,
+                input_tokens = t.input_tokens,
+                output_tokens = t.output_tokens,
+                total_tokens = t.total_tokens,
+                estimated_cost = t.estimated_cost
+            FROM totals t
+            WHERE u.id = t.keep_id
+        )
+        DELETE FROM ai_usage u
+        USING totals t
+        WHERE u.organization_id = t.organization_id
+          AND u.model = t.model
+          AND u.date = t.date
+          AND u.id <> t.keep_id
+    """)
+    
+    op.create_unique_constraint(
+        'uq_ai_usage_org_model_date',
+        'ai_usage',
+        ['organization_id', 'model', 'date']
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_ai_usage_org_model_date', 'ai_usage', type_='unique')
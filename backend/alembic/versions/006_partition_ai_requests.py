@@ -0,0 +1,125 @@
+"""partition ai_requests by month on created_at
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+# revision identifiers
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+COLUMNS = (
+    "id, organization_id, user_id, model, prompt_length, response_length, "
+    "input_tokens, output_tokens, total_tokens, duration_ms, status, "
+    "error_message, created_at"
+)
+
+
+def upgrade() -> None:
+    # Keep the old heap around until its rows are copied
+    op.execute("ALTER TABLE ai_requests RENAME TO ai_requests_unpartitioned")
+    op.execute("ALTER TABLE ai_requests_unpartitioned RENAME CONSTRAINT ai_requests_pkey TO ai_requests_unpartitioned_pkey")
+    op.execute("ALTER INDEX ix_ai_requests_organization_id RENAME TO ix_ai_requests_unpartitioned_organization_id")
+    
+    # The partition key has to be part of the primary key
+    op.execute("""
+        CREATE TABLE ai_requests (
+            id INTEGER NOT NULL DEFAULT nextval('ai_requests_id_seq'::regclass),
+            organization_id INTEGER NOT NULL
+                CONSTRAINT ai_requests_organization_id_fkey REFERENCES organizations (id) ON DELETE CASCADE,
+            user_id INTEGER CONSTRAINT ai_requests_user_id_fkey REFERENCES users (id),
+            model VARCHAR NOT NULL,
+            prompt_length INTEGER,
+            response_length INTEGER,
+            input_tokens INTEGER,
+            output_tokens INTEGER,
+            total_tokens INTEGER,
+            duration_ms INTEGER,
+            status VARCHAR NOT NULL,
+            error_message VARCHAR,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            CONSTRAINT ai_requests_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("ALTER SEQUENCE ai_requests_id_seq OWNED BY ai_requests.id")
+    op.execute("CREATE INDEX ix_ai_requests_organization_id ON ai_requests (organization_id)")
+    op.execute("CREATE INDEX ix_ai_requests_created_at ON ai_requests (created_at)")
+    
+    # Idempotent helper used here and by the maintain_ai_request_partitions
+    # beat task: creates the (UTC) monthly partition containing p_month
+    op.execute("""
+        CREATE OR REPLACE FUNCTION ai_requests_ensure_partition(p_month DATE)
+        RETURNS TEXT AS $$
+        DECLARE
+            start_date DATE := date_trunc('month', p_month)::DATE;
+            end_date DATE := (date_trunc('month', p_month) + INTERVAL '1 month')::DATE;
+            partition_name TEXT := format('ai_requests_%s', to_char(start_date, 'YYYY_MM'));
+        BEGIN
+            EXECUTE format(
+                'CREATE TABLE IF NOT EXISTS %I PARTITION OF ai_requests FOR VALUES FROM (%L) TO (%L)',
+                partition_name,
+                start_date::TIMESTAMP AT TIME ZONE 'UTC',
+                end_date::TIMESTAMP AT TIME ZONE 'UTC'
+            );
+            RETURN partition_name;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    
+    # Partitions for all existing data plus the next three months
+    op.execute("""
+        SELECT ai_requests_ensure_partition(month::DATE)
+        FROM generate_series(
+            date_trunc('month', COALESCE(
+                (SELECT MIN(created_at) FROM ai_requests_unpartitioned), now()
+            ) AT TIME ZONE 'UTC'),
+            date_trunc('month', now() AT TIME ZONE 'UTC') + INTERVAL '3 months',
+            INTERVAL '1 month'
+        ) AS month
+    """)
+    
+    op.execute(f"""
+        INSERT INTO ai_requests ({COLUMNS})
+        SELECT id, organization_id, user_id, model, prompt_length, response_length,
+               input_tokens, output_tokens, total_tokens, duration_ms, status,
+               error_message, COALESCE(created_at, now())
+        FROM ai_requests_unpartitioned
+    """)
+    op.execute("DROP TABLE ai_requests_unpartitioned")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE ai_requests RENAME TO ai_requests_partitioned")
+    op.execute("ALTER TABLE ai_requests_partitioned RENAME CONSTRAINT ai_requests_pkey TO ai_requests_partitioned_pkey")
+    op.execute("ALTER INDEX ix_ai_requests_organization_id RENAME TO ix_ai_requests_partitioned_organization_id")
+    
+    op.execute("""
+        CREATE TABLE ai_requests (
+            id INTEGER NOT NULL DEFAULT nextval('ai_requests_id_seq'::regclass),
+            organization_id INTEGER NOT NULL
+                CONSTRAINT ai_requests_organization_id_fkey REFERENCES organizations (id) ON DELETE CASCADE,
+            user_id INTEGER CONSTRAINT ai_requests_user_id_fkey REFERENCES users (id),
+            model VARCHAR NOT NULL,
+            prompt_length INTEGER,
+            response_length INTEGER,
+            input_tokens INTEGER,
+            output_tokens INTEGER,
+            total_tokens INTEGER,
+            duration_ms INTEGER,
+            status VARCHAR NOT NULL,
+            error_message VARCHAR,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+            CONSTRAINT ai_requests_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute("ALTER SEQUENCE ai_requests_id_seq OWNED BY ai_requests.id")
+    op.execute("CREATE INDEX ix_ai_requests_organization_id ON ai_requests (organization_id)")
+    op.execute(f"INSERT INTO ai_requests ({COLUMNS}) SELECT {COLUMNS} FROM ai_requests_partitioned")
+    
+    op.execute("DROP TABLE ai_requests_partitioned")
+    op.execute("DROP FUNCTION IF EXISTS ai_requests_ensure_partition(DATE)")
@@ -18,6 +18,7 @@ class UserAdmin(ModelView, model=User):
     column_sortable_list = [User.id, User.email, User.created_at]
     column_default_sort = [(User.created_at, True)]
     
+    column_details_exclude_list = [User.hashed_password]
     form_excluded_columns = [User.hashed_password, User.created_at, User.updated_at]
     
     can_create = True
@@ -1,33 +1,83 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
+import asyncio
 import time
 from app.database import get_db
-from app.dependencies import get_current_active_user, get_current_organization
+from app.dependencies import (
+    TenantContext,
+    get_current_active_user,
+    get_current_organization,
+    get_tenant_context
+)
 from app.models.user import User
 from app.models.organization import Organization
+from app.models.subscription import Subscription
 from app.schemas.ai import ChatRequest, ChatResponse, UsageSummary
 from app.services.ai_service import AIService
-from app.crud import ai_usage as crud_ai_usage
-from app.crud import subscription as crud_subscription
-from app.core.ai_config import AI_LIMITS, calculate_cost, get_ai_limit
+from app.services.providers import ProviderError, StreamTrailer
+from app.services.usage_service import UsageService
+from app.services.idempotency import (
+    IdempotencyService,
+    IdempotencyKeyReused,
+    IdempotencyInFlight,
+    request_fingerprint
+)
+from app.services import usage_summary_cache
+from app.services.response_cache import (
+    response_cache,
+    is_cacheable,
+    cache_directives,
+    request_key,
+    replay_chunks
+)
+from app.services.stream_buffer import resumable_streams, StreamNotFound
+from app.core.ai_config import AI_LIMITS, get_ai_limit
 from app.core.rate_limiter import RateLimiter
+from app.core.metrics import ai_stream_cancelled_total
+from app.core.sse import encode_event
+from app.core.tokenizer import count_tokens, count_message_tokens
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+def completion_error_status(error: Exception) -> int:
+    """
+    HTTP status for a failed completion
+    
+    Upstream failures are a bad gateway; an upstream 429 is our provider
+    quota running out, not the caller's rate limit, so it is a 503.
+    """
+    if not isinstance(error, ProviderError):
+        return status.HTTP_500_INTERNAL_SERVER_ERROR
+    if error.status_code == 429:
+        return status.HTTP_503_SERVICE_UNAVAILABLE
+    return status.HTTP_502_BAD_GATEWAY
+
+
 async def check_ai_limits(
-    db: AsyncSession,
     org: Organization,
+    subscription: Optional[Subscription],
     model: str,
-    max_tokens: int
+    max_tokens: int,
+    input_tokens_estimate: int = 0
 ):
-    """Check if organization can make AI request"""
-    # Get subscription
-    subscription = await crud_subscription.get_subscription_by_org(db, org.id)
+    """
+    Check if organization can make AI request
+    
+    Checks that need no Redis run first, and tokens are reserved before a
+    request unit is spent, so a request turned away by the token limit does
+    not count against the requests-per-minute limit.
+    
+    On success, `input_tokens_estimate + max_tokens` is reserved against the
+    plan's tokens-per-minute limit. The caller must hand the returned
+    "token_reservation" to RateLimiter.reconcile_tokens() with the real usage.
+    The subscription comes from the request's tenant context, so no database
+    query is made here.
+    """
     if not subscription:
         raise HTTPException(
             status_code=status.HTTP_402_PAYMENT_REQUIRED,
@@ -52,23 +102,20 @@ async def check_ai_limits(
             detail=f"Max tokens per request: {max_tokens_limit}"
         )
     
-    # Check rate limit (per minute)
-    rate_limit = get_ai_limit(plan_type, "rate_limit_per_minute")
-    rate_key = f"ai_rate:{org.id}:minute"
-    allowed, current, remaining = RateLimiter.check_rate_limit(rate_key, rate_limit, 60)
-    
-    if not allowed:
+    # A request larger than the whole per-minute token budget can never fit
+    tokens_per_minute = get_ai_limit(plan_type, "tokens_per_minute")
+    reserve = input_tokens_estimate + max_tokens
+    if reserve > tokens_per_minute:
         raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail=f"Rate limit exceeded. Max {rate_limit} requests per minute.",
-            headers={"X-RateLimit-Remaining": "0"}
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Request exceeds your plan's limit of {tokens_per_minute} tokens per minute."
         )
     
     # Check monthly limits
     messages_limit = get_ai_limit(plan_type, "messages_per_month")
     tokens_limit = get_ai_limit(plan_type, "tokens_per_month")
     
-    allowed, usage_info = RateLimiter.check_monthly_limit(
+    allowed, usage_info = await RateLimiter.check_monthly_limit(
         org.id, messages_limit, tokens_limit
     )
     
@@ -82,8 +129,39 @@ async def check_ai_limits(
             }
         )
     
+    # Reserve tokens (per minute) for the worst case of this request, before
+    # spending a request unit: a request the token limit turns away must not
+    # also count against the requests-per-minute limit
+    tokens_key = f"ai_tokens:{org.id}:minute"
+    tokens_rate, reservation = await RateLimiter.reserve_tokens(
+        tokens_key, tokens_per_minute, reserve, 60
+    )
+    
+    if not tokens_rate.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Token rate limit exceeded. Max {tokens_per_minute} tokens per minute.",
+            headers=tokens_rate.headers("-Tokens")
+        )
+    
+    # Check rate limit (per minute)
+    rate_limit = get_ai_limit(plan_type, "rate_limit_per_minute")
+    rate_key = f"ai_rate:{org.id}:minute"
+    rate = await RateLimiter.check_rate_limit(rate_key, rate_limit, 60)
+    
+    if not rate.allowed:
+        # Hand the reservation back; this request won't run
+        await RateLimiter.reconcile_tokens(reservation, 0)
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Rate limit exceeded. Max {rate_limit} requests per minute.",
+            headers=rate.headers()
+        )
+    
     return {
-        "rate_limit_remaining": remaining,
+        "rate_limit_remaining": rate.remaining,
+        "rate_limit_headers": {**rate.headers(), **tokens_rate.headers("-Tokens")},
+        "token_reservation": reservation,
         "usage_info": usage_info
     }
 
@@ -91,9 +169,13 @@ async def check_ai_limits(
 @router.post("/chat", response_model=ChatResponse)
 async def chat_completion(
     request: ChatRequest,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
-    current_org: Organization = Depends(get_current_organization)
+    current_org: Organization = Depends(get_current_organization),
+    tenant: TenantContext = Depends(get_tenant_context),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    cache_control: Optional[str] = Header(None)
 ):
     """
     AI Chat Completion
@@ -105,12 +187,93 @@ async def chat_completion(
     - Free: 50 messages/month, 5 req/min
     - Pro: 10,000 messages/month, 60 req/min
     - Team: Unlimited, 300 req/min
+    
+    Send an `Idempotency-Key` header to make retries safe: a repeated
+    request with the same key and body waits for the original and returns
+    its response (marked `Idempotent-Replayed: true`) without calling the
+    model or counting usage again.
+    
+    When the response cache is enabled, requests with `temperature: 0` are
+    answered from it if an identical request was seen before (marked
+    `X-AI-Cache: hit`). Send `Cache-Control: no-cache` for a fresh answer,
+    or `no-store` to keep the request out of the cache entirely.
     """
-    # Check limits
+    if not idempotency_key:
+        return await _chat_completion(
+            request, response, db, current_user, current_org, tenant, cache_control
+        )
+    
+    fingerprint = request_fingerprint(request.model_dump_json())
+    try:
+        stored = await IdempotencyService.begin(current_org.id, idempotency_key, fingerprint)
+    except IdempotencyKeyReused:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used with a different request"
+        )
+    except IdempotencyInFlight:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this Idempotency-Key is still in progress"
+        )
+    
+    if stored is not None:
+        response.headers["Idempotent-Replayed"] = "true"
+        return ChatResponse(**stored)
+    
+    try:
+        result = await _chat_completion(
+            request, response, db, current_user, current_org, tenant, cache_control
+        )
+    except BaseException:
+        # Limit errors, provider failures and disconnects can be retried
+        await IdempotencyService.release(current_org.id, idempotency_key)
+        raise
+    
+    await IdempotencyService.complete(
+        current_org.id, idempotency_key, fingerprint, result.model_dump(mode="json")
+    )
+    return result
+
+
+async def _chat_completion(
+    request: ChatRequest,
+    response: Response,
+    db: AsyncSession,
+    current_user: User,
+    current_org: Organization,
+    tenant: TenantContext,
+    cache_control: Optional[str] = None
+) -> ChatResponse:
     limits_info = await check_ai_limits(
-        db, current_org, request.model, request.max_tokens
+        current_org, tenant.subscription, request.model, request.max_tokens,
+        count_message_tokens(request.messages)
     )
     
+    response.headers.update(limits_info["rate_limit_headers"])
+    used_tokens = 0
+    
+    # Return the auth dependencies' connection to the pool so it isn't held
+    # for the whole provider round trip
+    await db.close()
+    
+    cache_key = None
+    if is_cacheable(request):
+        read_cache, write_cache = cache_directives(cache_control)
+        cache_key = request_key(current_org.id, request) if write_cache else None
+        response.headers["X-AI-Cache"] = "miss"
+        
+        cached = await response_cache.get(cache_key) if read_cache else None
+        if cached is not None:
+            response.headers["X-AI-Cache"] = "hit"
+            try:
+                used_tokens = await UsageService.record_cache_hit(
+                    current_org.id, current_user.id, request.model, cached["usage"], 0
+                )
+            finally:
+                await RateLimiter.reconcile_tokens(limits_info["token_reservation"], used_tokens)
+            return ChatResponse(model=request.model, **cached)
+    
     try:
         # Get AI response
         result = await AIService.chat_completion(
@@ -119,55 +282,45 @@ async def chat_completion(
             temperature=request.temperature,
             max_tokens=request.max_tokens
         )
-        
-        # Update usage
-        input_tokens = result["usage"]["input_tokens"]
-        output_tokens = result["usage"]["output_tokens"]
-        total_tokens = result["usage"]["total_tokens"]
-        
-        # Calculate cost
-        cost_cents = calculate_cost(request.model, input_tokens, output_tokens)
-        
-        # Update Redis counters
-        RateLimiter.increment_monthly_usage(
-            current_org.id,
-            messages=1,
-            tokens=total_tokens
-        )
-        
-        # Update database usage
-        await crud_ai_usage.update_usage(
-            db, current_org.id, request.model,
-            input_tokens, output_tokens, cost_cents
-        )
-        
-        # Log request
-        await crud_ai_usage.log_request(
-            db, current_org.id, current_user.id, request.model,
-            input_tokens, output_tokens, result["duration_ms"],
-            status="success"
-        )
-        
-        return ChatResponse(
-            message=result["message"],
-            model=request.model,
-            usage=result["usage"],
-            finish_reason=result["finish_reason"]
-        )
+        used_tokens = result["usage"]["total_tokens"]
     
     except Exception as e:
         logger.error(f"AI request failed: {e}")
         
-        # Log failed request
-        await crud_ai_usage.log_request(
-            db, current_org.id, current_user.id, request.model,
+        # Log failed request (only provider failures; accounting errors
+        # below must not produce a second log entry)
+        await UsageService.log_request(
+            current_org.id, current_user.id, request.model,
             0, 0, 0, status="error", error_message=str(e)
         )
         
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            status_code=completion_error_status(e),
             detail=f"AI request failed: {str(e)}"
         )
+    
+    finally:
+        # Refund the unused part of the token reservation
+        await RateLimiter.reconcile_tokens(limits_info["token_reservation"], used_tokens)
+    
+    if cache_key is not None:
+        await response_cache.set(cache_key, result)
+    
+    # Record usage (Redis counters + background DB writers)
+    await UsageService.record_completion(
+        current_org.id, current_user.id, request.model,
+        result["usage"]["input_tokens"],
+        result["usage"]["output_tokens"],
+        result["usage"]["total_tokens"],
+        result["duration_ms"]
+    )
+    
+    return ChatResponse(
+        message=result["message"],
+        model=request.model,
+        usage=result["usage"],
+        finish_reason=result["finish_reason"]
+    )
 
 
 @router.post("/chat/stream")
@@ -175,84 +328,196 @@ async def chat_completion_stream(
     request: ChatRequest,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
-    current_org: Organization = Depends(get_current_organization)
+    current_org: Organization = Depends(get_current_organization),
+    tenant: TenantContext = Depends(get_tenant_context),
+    cache_control: Optional[str] = Header(None),
+    last_event_id: Optional[str] = Header(None, max_length=100)
 ):
     """
     AI Chat Completion with Streaming
     
     Stream AI responses in real-time using Server-Sent Events (SSE).
+    Cached responses (see `/chat`) are replayed as a stream.
+    
+    Events carry an `id:`. The generation keeps running if the connection
+    drops; re-send the request with the last id seen as `Last-Event-ID` to
+    receive the rest of it (on any worker, for a few minutes) without a
+    new generation or usage being counted again.
     """
-    # Check limits
-    await check_ai_limits(db, current_org, request.model, request.max_tokens)
+    headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+    }
     
-    async def generate():
+    if last_event_id:
+        await db.close()
+        try:
+            events = await resumable_streams.resume(current_org.id, last_event_id)
+        except StreamNotFound:
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="Stream is no longer available. Send the request again without Last-Event-ID."
+            )
+        return StreamingResponse(events, media_type="text/event-stream", headers=headers)
+    
+    limits_info = await check_ai_limits(
+        current_org, tenant.subscription, request.model, request.max_tokens,
+        count_message_tokens(request.messages)
+    )
+    
+    # No DB connection is held while tokens flow; usage is recorded
+    # afterwards through UsageService on its own session
+    await db.close()
+    org_id = current_org.id
+    user_id = current_user.id
+    reservation = limits_info["token_reservation"]
+    headers.update(limits_info["rate_limit_headers"])
+    
+    async def replay_cached(cached: dict):
+        used_tokens = 0
         try:
-            start_time = time.time()
-            full_response = ""
+            for chunk in replay_chunks(cached["message"]):
+                yield encode_event(chunk)
+            yield encode_event("[DONE]")
             
+            used_tokens = await UsageService.record_cache_hit(
+                org_id, user_id, request.model, cached["usage"], 0
+            )
+        
+        finally:
+            await RateLimiter.reconcile_tokens(reservation, used_tokens)
+    
+    async def record_usage(
+        text: str,
+        trailer: Optional[StreamTrailer],
+        duration_ms: int,
+        status: str
+    ) -> int:
+        """
+        Count a (possibly partial) streamed answer like /chat does; returns
+        the tokens used
+        
+        Uses the usage the provider reported in its final chunk, or local
+        token counts if it didn't (or the stream was cut off before it).
+        """
+        if trailer is not None and trailer.usage:
+            usage = trailer.usage
+        else:
+            input_tokens = count_message_tokens(request.messages)
+            output_tokens = count_tokens(text)
+            usage = {
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            }
+        
+        await UsageService.record_completion(
+            org_id, user_id, request.model,
+            usage["input_tokens"],
+            usage["output_tokens"],
+            usage["total_tokens"],
+            duration_ms,
+            status=status
+        )
+        
+        if status == "success" and cache_key is not None:
+            await response_cache.set(cache_key, {
+                "message": text,
+                "usage": usage,
+                "finish_reason": trailer.finish_reason if trailer else "stop",
+            })
+        
+        return usage["total_tokens"]
+    
+    async def generate():
+        """Payloads of the generation; framed and buffered by resumable_streams"""
+        used_tokens = 0
+        start_time = time.time()
+        parts = []
+        trailer = None
+        try:
             async for chunk in AIService.chat_completion_stream(
                 messages=request.messages,
                 model=request.model,
                 temperature=request.temperature,
                 max_tokens=request.max_tokens
             ):
-                full_response += chunk
-                yield f"data: {chunk}\n\n"
+                if isinstance(chunk, StreamTrailer):
+                    trailer = chunk
+                    continue
+                parts.append(chunk)
+                yield chunk
             
             # Send done signal
-            yield "data: [DONE]\n\n"
-            
-            # Update usage (approximate)
-            duration_ms = int((time.time() - start_time) * 1000)
-            input_tokens = sum(len(m.content.split()) for m in request.messages) * 1.3
-            output_tokens = len(full_response.split()) * 1.3
+            yield "[DONE]"
             
-            RateLimiter.increment_monthly_usage(
-                current_org.id,
-                messages=1,
-                tokens=int(input_tokens + output_tokens)
+            used_tokens = await record_usage(
+                "".join(parts), trailer, int((time.time() - start_time) * 1000), "success"
             )
-            
-            await crud_ai_usage.log_request(
-                db, current_org.id, current_user.id, request.model,
-                int(input_tokens), int(output_tokens), duration_ms,
-                status="success"
+        
+        except (asyncio.CancelledError, GeneratorExit):
+            # Abandoned by the client, or cut off by a worker shutdown
+            # (`generation` is bound before this task first runs). The
+            # upstream request was closed with us; what was generated up to
+            # here has been paid for.
+            if generation.abandoned:
+                ai_stream_cancelled_total.labels(model=request.model).inc()
+            used_tokens = await record_usage(
+                "".join(parts), trailer, int((time.time() - start_time) * 1000),
+                "cancelled" if generation.abandoned else "interrupted"
             )
+            raise
         
         except Exception as e:
             logger.error(f"Streaming failed: {e}")
-            yield f"data: [ERROR] {str(e)}\n\n"
-    
-    return StreamingResponse(
-        generate(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-        }
-    )
+            await UsageService.log_request(
+                org_id, user_id, request.model,
+                0, 0, 0, status="error", error_message=str(e)
+            )
+            yield f"[ERROR] {str(e)}"
+        
+        finally:
+            # Refund the unused part of the token reservation
+            await RateLimiter.reconcile_tokens(reservation, used_tokens)
+    
+    cache_key = None
+    if is_cacheable(request):
+        read_cache, write_cache = cache_directives(cache_control)
+        cache_key = request_key(org_id, request) if write_cache else None
+        headers["X-AI-Cache"] = "miss"
+        
+        cached = await response_cache.get(cache_key) if read_cache else None
+        if cached is not None:
+            headers["X-AI-Cache"] = "hit"
+            return StreamingResponse(
+                replay_cached(cached), media_type="text/event-stream", headers=headers
+            )
+    
+    generation = resumable_streams.start(org_id, generate())
+    headers["X-Generation-Id"] = generation.generation_id
+    return StreamingResponse(generation.events(), media_type="text/event-stream", headers=headers)
 
 
 @router.get("/usage", response_model=UsageSummary)
 async def get_usage_stats(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
-    current_org: Organization = Depends(get_current_organization)
+    current_org: Organization = Depends(get_current_organization),
+    tenant: TenantContext = Depends(get_tenant_context)
 ):
     """Get AI usage statistics for current month"""
     # Get subscription for limits
-    subscription = await crud_subscription.get_subscription_by_org(db, current_org.id)
+    subscription = tenant.subscription
     plan_type = subscription.plan_type if subscription else None
     
     messages_limit = get_ai_limit(plan_type, "messages_per_month")
     tokens_limit = get_ai_limit(plan_type, "tokens_per_month")
     
     # Get usage from Redis (fast)
-    current_messages = RateLimiter.get_monthly_usage(current_org.id, "messages")
-    current_tokens = RateLimiter.get_monthly_usage(current_org.id, "tokens")
+    current_messages, current_tokens = await RateLimiter.get_monthly_totals(current_org.id)
     
-    # Get detailed breakdown from database
-    summary = await crud_ai_usage.get_usage_summary(db, current_org.id)
+    # Get detailed breakdown (cached, from database)
+    summary = await usage_summary_cache.get_usage_summary(db, current_org.id)
     
     # Calculate usage percentage
     if messages_limit:
@@ -273,10 +538,11 @@ async def get_usage_stats(
 @router.get("/models")
 async def get_available_models(
     db: AsyncSession = Depends(get_db),
-    current_org: Organization = Depends(get_current_organization)
+    current_org: Organization = Depends(get_current_organization),
+    tenant: TenantContext = Depends(get_tenant_context)
 ):
     """Get list of available AI models for current plan"""
-    subscription = await crud_subscription.get_subscription_by_org(db, current_org.id)
+    subscription = tenant.subscription
     plan_type = subscription.plan_type if subscription else None
     
     allowed_models = get_ai_limit(plan_type, "allowed_models") or []
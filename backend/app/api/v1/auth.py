@@ -1,12 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.schemas.user import UserCreate, User as UserSchema
 from app.schemas.token import Token
 from app.crud import user as crud_user
-from app.core.security import create_access_token, create_refresh_token, decode_token
+from app.core.security import (
+    create_access_token,
+    create_refresh_token,
+    decode_token,
+    is_token_revoked,
+    revoke_token
+)
 from app.core.config import settings
+from app.dependencies import oauth2_scheme
 
 router = APIRouter()
 
@@ -121,6 +129,9 @@ async def refresh_token(refresh_token: str, db: AsyncSession = Depends(get_db)):
     if payload is None or payload.get("type") != "refresh":
         raise credentials_exception
     
+    if await is_token_revoked(payload):
+        raise credentials_exception
+    
     user_id_str = payload.get("sub")
     if user_id_str is None:
         raise credentials_exception
@@ -142,3 +153,19 @@ async def refresh_token(refresh_token: str, db: AsyncSession = Depends(get_db)):
         "refresh_token": new_refresh_token,
         "token_type": "bearer"
     }
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    refresh_token: Optional[str] = None,
+    token: Optional[str] = Depends(oauth2_scheme)
+):
+    """
+    Revoke the current access token (and refresh token, if given)
+    
+    Enforced when JWT_REVOCATION_CHECK is enabled.
+    """
+    if token:
+        await revoke_token(token)
+    if refresh_token:
+        await revoke_token(refresh_token)
@@ -17,6 +17,7 @@ from app.schemas.subscription import (
 )
 from app.crud import subscription as crud_subscription
 from app.core.config import settings
+from app.core import tenant_cache
 from app.core.stripe_config import STRIPE_PRICES, PLAN_CONFIGS
 import logging
 
@@ -103,6 +104,7 @@ async def create_checkout_session(
             )
             current_org.stripe_customer_id = customer.id
             await db.commit()
+            await tenant_cache.invalidate_org(current_org.id)
         except Exception as e:
             logger.error(f"Failed to create Stripe customer: {e}")
             raise HTTPException(
@@ -214,6 +216,7 @@ async def sync_subscription_from_stripe(
             if subscription and subscription.plan_type != PlanType.FREE:
                 subscription.plan_type = PlanType.FREE
                 await db.commit()
+                await tenant_cache.invalidate_org(current_org.id)
             
             return {"status": "success", "plan_type": "free"}
     
@@ -357,4 +360,5 @@ async def handle_invoice_payment_failed(db: AsyncSession, invoice: dict):
             from app.models.subscription import SubscriptionStatus
             subscription.status = SubscriptionStatus.PAST_DUE
             await db.commit()
+            await tenant_cache.invalidate_org(subscription.organization_id)
             logger.warning(f"Payment failed for subscription: {subscription_id}")
@@ -21,6 +21,7 @@ from app.schemas.organization import (
 )
 from app.crud import organization as crud_org
 from app.crud import user as crud_user
+from app.core import tenant_cache
 
 router = APIRouter()
 
@@ -251,6 +252,7 @@ async def update_member_role(
         membership.is_active = update.is_active
         await db.commit()
         await db.refresh(membership)
+        await tenant_cache.invalidate_org(org_id)
     
     user = await crud_user.get_user_by_id(db, user_id)
     return MembershipResponse(
@@ -48,6 +48,7 @@ AI_LIMITS = {
         "allowed_models": ["gemini-2.0-flash", "gemini-1.5-flash", "gpt-4o-mini"],
         "max_tokens_per_request": 1024,
         "rate_limit_per_minute": 5,
+        "tokens_per_minute": 20000,
     },
     PlanType.PRO: {
         "messages_per_month": 10000,
@@ -55,6 +56,7 @@ AI_LIMITS = {
         "allowed_models": ["gemini-2.0-flash", "gemini-1.5-flash", "gemini-1.5-pro", "claude-3-haiku", "gpt-4o-mini"],
         "max_tokens_per_request": 4096,
         "rate_limit_per_minute": 60,
+        "tokens_per_minute": 400000,
     },
     PlanType.TEAM: {
         "messages_per_month": None,  # Unlimited
@@ -62,6 +64,7 @@ AI_LIMITS = {
         "allowed_models": ["gemini-2.0-flash", "gemini-1.5-flash", "gemini-1.5-pro", "claude-3-haiku", "gpt-4o-mini"],
         "max_tokens_per_request": 8192,
         "rate_limit_per_minute": 300,
+        "tokens_per_minute": 2000000,
     }
 }
 
@@ -77,8 +80,8 @@ def calculate_cost(model: str, input_tokens: int, output_tokens: int) -> int:
         return 0
     
     config = AI_MODELS[model]
-    input_cost = (input_tokens / 1000) * config["cost_per_1k_input"]
-    output_cost = (output_tokens / 1000) * config["cost_per_1k_output"]
+    input_cost = Decimal(input_tokens) / 1000 * config["cost_per_1k_input"]
+    output_cost = Decimal(output_tokens) / 1000 * config["cost_per_1k_output"]
     
     total_cost_dollars = input_cost + output_cost
     return int(total_cost_dollars * 100)  # Convert to cents
@@ -0,0 +1,148 @@
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import NamedTuple, Optional
+import redis.asyncio as aioredis
+from app.core.config import settings
+from app.core.redis_client import get_redis
+import logging
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_CHANNEL = "api_key_revocations"
+
+
+class CachedApiKey(NamedTuple):
+    key_id: int
+    organization_id: int
+    expires_at: Optional[datetime]
+    is_active: bool
+    organization: dict  # tenant_cache.dump_row() of the organization
+
+
+class ApiKeyCache:
+    """
+    LRU + TTL cache from API key hash to the key's auth data
+    
+    Entries are dropped on every worker when a key is revoked or deleted,
+    or its organization changes, via a Redis pub/sub channel. The cache is
+    only consulted while this worker is subscribed to that channel; after
+    a (re)subscribe it starts empty, since messages may have been missed.
+    
+    Every invalidation bumps `epoch`. A caller filling the cache reads the
+    epoch before its database lookup and passes it to `put`, which skips
+    the fill if an invalidation arrived in between.
+    """
+    
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._subscribed = False
+        self._task: Optional[asyncio.Task] = None
+        self._epoch = 0
+    
+    @property
+    def epoch(self) -> int:
+        return self._epoch
+    
+    def get(self, key_hash: str) -> Optional[CachedApiKey]:
+        if self._task is None:
+            self.start()
+        if not self._subscribed:
+            return None
+        
+        entry = self._entries.get(key_hash)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._entries[key_hash]
+            return None
+        self._entries.move_to_end(key_hash)
+        return value
+    
+    def put(self, key_hash: str, value: CachedApiKey, epoch: int):
+        """Cache a row read from the database after `epoch` was taken"""
+        if not self._subscribed or epoch != self._epoch:
+            return
+        self._entries[key_hash] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key_hash)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def _clear(self):
+        self._epoch += 1
+        self._entries.clear()
+    
+    def _discard(self, message: str):
+        self._epoch += 1
+        kind, _, value = message.partition(":")
+        if kind == "key":
+            self._entries.pop(value, None)
+        elif kind == "org":
+            org_id = int(value)
+            for key_hash, (_, cached) in list(self._entries.items()):
+                if cached.organization_id == org_id:
+                    self._entries.pop(key_hash, None)
+    
+    async def _publish(self, message: str):
+        self._discard(message)
+        try:
+            await get_redis().publish(REVOCATION_CHANNEL, message)
+        except (aioredis.RedisError, OSError) as e:
+            # Other workers can't be told; stop trusting our own entries too
+            logger.error(f"API key revocation broadcast failed: {e}")
+            self._clear()
+    
+    async def revoke(self, key_hash: str):
+        """Drop a key from every worker's cache"""
+        await self._publish(f"key:{key_hash}")
+    
+    async def invalidate_org(self, org_id: int):
+        """Drop all keys of an organization from every worker's cache"""
+        await self._publish(f"org:{org_id}")
+    
+    async def _run(self):
+        while True:
+            pubsub = get_redis().pubsub()
+            try:
+                await pubsub.subscribe(REVOCATION_CHANNEL)
+                self._clear()
+                self._subscribed = True
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is not None:
+                        self._discard(message["data"])
+            except (aioredis.RedisError, OSError) as e:
+                logger.warning(f"API key revocation listener disconnected: {e}")
+            finally:
+                self._subscribed = False
+                try:
+                    await pubsub.aclose()
+                except (aioredis.RedisError, OSError):
+                    pass
+            await asyncio.sleep(1)
+    
+    def start(self):
+        """Start the revocation listener (called from lifespan)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the revocation listener"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._clear()
+
+
+api_key_cache = ApiKeyCache(
+    max_entries=settings.API_KEY_CACHE_MAX_ENTRIES,
+    ttl=settings.API_KEY_CACHE_TTL_SECONDS
+)
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Literal
 
 
 class Settings(BaseSettings):
@@ -9,12 +9,21 @@ class Settings(BaseSettings):
     
     # Redis
     REDIS_URL: str
+    REDIS_MAX_CONNECTIONS: int = 100
+    REDIS_SOCKET_TIMEOUT: float = 5.0
     
     # JWT
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    JWT_CACHE_MAX_ENTRIES: int = 10000  # verified tokens kept per worker, 0 = off
+    JWT_REVOCATION_CHECK: bool = False
+    
+    # Password hashing
+    BCRYPT_ROUNDS: int = 12  # existing hashes are upgraded on login
+    PASSWORD_HASH_EXECUTOR: str = "process"  # process, thread
+    PASSWORD_HASH_WORKERS: int = 0  # 0 = one per CPU core
     
     # Stripe
     STRIPE_SECRET_KEY: str
@@ -26,6 +35,67 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str = ""
     ANTHROPIC_API_KEY: str = ""
     OPENROUTER_API_KEY: str = ""
+    AI_GEMINI_BACKEND: str = "openrouter"  # openrouter (free Gemma models) or google
+    
+    # AI provider HTTP connection pool
+    AI_HTTP_MAX_CONNECTIONS: int = 100
+    AI_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    AI_HTTP_KEEPALIVE_EXPIRY: float = 30.0  # seconds
+    AI_HTTP_CONNECT_TIMEOUT: float = 5.0
+    AI_HTTP_READ_TIMEOUT: float = 60.0
+    AI_HTTP_WRITE_TIMEOUT: float = 10.0
+    AI_HTTP_POOL_TIMEOUT: float = 10.0
+    AI_HTTP2: bool = True
+    
+    # AI usage accounting (write-behind daily rollups)
+    USAGE_FLUSH_INTERVAL_SECONDS: float = 5.0
+    USAGE_FLUSH_MAX_EVENTS: int = 500
+    REQUEST_LOG_BATCH_SIZE: int = 500
+    REQUEST_LOG_FLUSH_INTERVAL_SECONDS: float = 2.0
+    REQUEST_LOG_MAX_QUEUE: int = 10000
+    REQUEST_LOG_OVERFLOW_POLICY: str = "drop_oldest"  # drop_oldest, drop_newest, block
+    AI_REQUESTS_RETENTION_DAYS: int = 90
+    AI_REQUESTS_PARTITIONS_AHEAD: int = 3  # months
+    USAGE_CLEANUP_CHUNK_SIZE: int = 5000
+    USAGE_REPORT_FETCH_SIZE: int = 2000
+    USAGE_REPORT_WORKERS: int = 8
+    USAGE_SUMMARY_CACHE_TTL_SECONDS: int = 30
+    
+    # Tenant context cache (user, membership, org, subscription)
+    TENANT_CACHE_TTL_SECONDS: int = 60
+    TENANT_CACHE_LOCAL_TTL_SECONDS: float = 5.0
+    TENANT_CACHE_LOCAL_MAX_ENTRIES: int = 10000
+    
+    # API key auth cache
+    API_KEY_CACHE_TTL_SECONDS: float = 60.0
+    API_KEY_CACHE_MAX_ENTRIES: int = 10000
+    API_KEY_LAST_USED_FLUSH_SECONDS: float = 30.0
+    
+    # Idempotency-Key on /ai/chat
+    IDEMPOTENCY_TTL_SECONDS: int = 86400  # how long completed responses are replayed
+    IDEMPOTENCY_LOCK_SECONDS: int = 120  # in-flight claim; must outlive the provider call
+    IDEMPOTENCY_WAIT_SECONDS: float = 60.0  # how long a duplicate waits for the original
+    
+    # Response cache for deterministic (temperature 0) chat completions
+    AI_RESPONSE_CACHE_ENABLED: bool = False
+    AI_RESPONSE_CACHE_TTL_SECONDS: int = 3600
+    AI_RESPONSE_CACHE_LOCAL_MAX_BYTES: int = 16 * 1024 * 1024  # per worker
+    AI_RESPONSE_CACHE_BILLING: Literal["full", "messages_only", "free"] = "full"
+    
+    # Single-flight: identical concurrent provider calls share one upstream request
+    AI_SINGLE_FLIGHT_ENABLED: bool = True
+    AI_SINGLE_FLIGHT_CROSS_WORKER: bool = False  # coalesce completions across workers via Redis
+    AI_SINGLE_FLIGHT_LOCK_SECONDS: int = 120  # must outlive the provider call
+    AI_SINGLE_FLIGHT_RESULT_TTL_SECONDS: int = 10  # how long waiting workers can pick the result up
+    
+    # Resumable SSE (Last-Event-ID) on /ai/chat/stream
+    AI_STREAM_BUFFER_TTL_SECONDS: int = 300  # after the last chunk
+    AI_STREAM_BUFFER_MAX_CHUNKS: int = 4096  # per generation, oldest trimmed first
+    AI_STREAM_RESUME_BLOCK_MS: int = 15000  # keep-alive interval while a resumed stream waits
+    AI_STREAM_RESUME_GRACE_SECONDS: float = 15.0  # unread generations are cancelled after this
+    AI_STREAM_COALESCE_MS: int = 20  # window for merging tokens into one write, 0 = per token
+    AI_STREAM_COALESCE_MAX_BYTES: int = 4096  # text per merged SSE event
+    TOKENIZER_LOAD_TIMEOUT_SECONDS: float = 10.0  # startup waits this long for tiktoken's BPE file
     
     # App
     APP_NAME: str = "FastAPI SaaS"
@@ -0,0 +1,82 @@
+import httpx
+from typing import Dict, Optional
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Upstream AI providers and their API base URLs
+PROVIDER_BASE_URLS = {
+    "openrouter": "https://openrouter.ai/api/v1",
+    "openai": "https://api.openai.com/v1",
+    "anthropic": "https://api.anthropic.com/v1",
+    "gemini": "https://generativelanguage.googleapis.com/v1beta",
+}
+
+# One pooled client per provider, shared by every request on this worker
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _provider_headers(provider: str) -> dict:
+    """Default headers (auth) for a provider"""
+    if provider == "openrouter":
+        return {"Authorization": f"Bearer {settings.OPENROUTER_API_KEY}"}
+    if provider == "openai":
+        return {"Authorization": f"Bearer {settings.OPENAI_API_KEY}"}
+    if provider == "anthropic":
+        return {"x-api-key": settings.ANTHROPIC_API_KEY, "anthropic-version": "2023-06-01"}
+    if provider == "gemini":
+        return {"x-goog-api-key": settings.GEMINI_API_KEY}
+    return {}
+
+
+def _build_client(provider: str) -> httpx.AsyncClient:
+    """Create a pooled HTTP client configured from settings"""
+    limits = httpx.Limits(
+        max_connections=settings.AI_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.AI_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.AI_HTTP_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(
+        connect=settings.AI_HTTP_CONNECT_TIMEOUT,
+        read=settings.AI_HTTP_READ_TIMEOUT,
+        write=settings.AI_HTTP_WRITE_TIMEOUT,
+        pool=settings.AI_HTTP_POOL_TIMEOUT,
+    )
+    return httpx.AsyncClient(
+        base_url=PROVIDER_BASE_URLS[provider],
+        headers=_provider_headers(provider),
+        limits=limits,
+        timeout=timeout,
+        http2=settings.AI_HTTP2,
+    )
+
+
+async def init_http_clients():
+    """Create pooled clients for all providers (called from lifespan)"""
+    for provider in PROVIDER_BASE_URLS:
+        if provider not in _clients:
+            _clients[provider] = _build_client(provider)
+    logger.info(f"HTTP client pools initialized: {', '.join(_clients)}")
+
+
+def get_http_client(provider: str) -> httpx.AsyncClient:
+    """
+    Get the pooled client for a provider
+
+    Falls back to creating the client lazily when the app lifespan did not run
+    (Celery workers, scripts, tests).
+    """
+    client: Optional[httpx.AsyncClient] = _clients.get(provider)
+    if client is None or client.is_closed:
+        client = _build_client(provider)
+        _clients[provider] = client
+    return client
+
+
+async def close_http_clients():
+    """Close all pooled clients (called on shutdown)"""
+    for provider, client in list(_clients.items()):
+        await client.aclose()
+        _clients.pop(provider, None)
+    logger.info("HTTP client pools closed")
@@ -45,6 +45,35 @@ ai_tokens_used_total = Counter(
     ['provider', 'model']
 )
 
+ai_request_logs_dropped_total = Counter(
+    'ai_request_logs_dropped_total',
+    'AI request log rows dropped because the write queue was full',
+    ['policy']
+)
+
+ai_response_cache_hits_total = Counter(
+    'ai_response_cache_hits_total',
+    'Chat completions served from the response cache',
+    ['tier']
+)
+
+ai_response_cache_misses_total = Counter(
+    'ai_response_cache_misses_total',
+    'Cacheable chat completions not found in the response cache'
+)
+
+ai_single_flight_coalesced_total = Counter(
+    'ai_single_flight_coalesced_total',
+    'AI requests that shared an identical in-flight upstream call',
+    ['kind', 'scope']
+)
+
+ai_stream_cancelled_total = Counter(
+    'ai_stream_cancelled_total',
+    'Streamed generations cancelled because the client went away',
+    ['model']
+)
+
 api_key_requests_total = Counter(
     'api_key_requests_total',
     'Total API key requests',
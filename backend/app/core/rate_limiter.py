@@ -1,78 +1,284 @@
-import redis
-from datetime import datetime, timedelta
-from typing import Optional
-from app.core.config import settings
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, NamedTuple
+from app.core.redis_client import get_redis
 
-redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+# Generic Cell Rate Algorithm: the key stores the "theoretical arrival time"
+# (TAT) of the next request. Check and consume happen atomically in a single
+# EVALSHA, so concurrent requests at a window boundary can't both slip through.
+#
+# KEYS[1] = rate limit key
+# ARGV[1] = limit (requests per period), ARGV[2] = period in seconds,
+# ARGV[3] = cost of this request
+# Returns: {allowed, remaining, retry_after, reset_after} (floats as strings)
+GCRA_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local emission_interval = period / limit
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if tat == nil or tat < now then
+    tat = now
+end
+
+local new_tat = tat + emission_interval * cost
+local diff = now - (new_tat - period)
+
+if diff < 0 then
+    return {0, 0, tostring(-diff), tostring(tat - now)}
+end
+
+local reset_after = new_tat - now
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil(reset_after * 1000))
+local remaining = math.floor(diff / emission_interval + 0.000001)
+return {1, remaining, '0', tostring(reset_after)}
+"""
+
+# Give back (or, with a negative amount, additionally charge) capacity on a
+# GCRA key, e.g. to refund the unused part of a token reservation.
+#
+# KEYS[1] = rate limit key
+# ARGV[1] = limit, ARGV[2] = period in seconds, ARGV[3] = amount to refund
+GCRA_ADJUST_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local amount = tonumber(ARGV[3])
+local emission_interval = period / limit
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if tat == nil or tat < now then
+    tat = now
+end
+
+local new_tat = tat - emission_interval * amount
+if new_tat <= now then
+    redis.call('DEL', KEYS[1])
+    return 0
+end
+
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return 1
+"""
+
+_gcra_async = None
+_gcra_adjust_async = None
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float  # seconds until the request would be allowed
+    reset_after: float  # seconds until the limit is fully replenished
+    
+    def headers(self, suffix: str = "") -> dict:
+        """
+        X-RateLimit-* (and Retry-After when rejected) response headers
+        
+        `suffix` names the limited resource, e.g. "-Tokens" for
+        X-RateLimit-Limit-Tokens.
+        """
+        headers = {
+            f"X-RateLimit-Limit{suffix}": str(self.limit),
+            f"X-RateLimit-Remaining{suffix}": str(self.remaining),
+            f"X-RateLimit-Reset{suffix}": str(math.ceil(self.reset_after)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class TokenReservation(NamedTuple):
+    """Tokens reserved at admission, reconciled once real usage is known"""
+    key: str
+    limit: int
+    tokens: int
+    window_seconds: int = 60
+
+
+# (month_end_ts, year_month, expire_at_ts) - recomputed once per month
+_month_cache: tuple = (0.0, "", 0)
+
+
+def _current_month() -> tuple[str, int]:
+    """
+    Current "YYYY-MM" and the expiry timestamp (end of next month) for its
+    counters, computed once per month rather than on every request
+    """
+    global _month_cache
+    month_end_ts, year_month, expire_at = _month_cache
+    if time.time() >= month_end_ts:
+        now = datetime.now(timezone.utc)
+        start_of_next_month = (now.replace(day=28) + timedelta(days=4)).replace(
+            day=1, hour=0, minute=0, second=0, microsecond=0
+        )
+        end_of_next_month = (start_of_next_month + timedelta(days=32)).replace(day=1) - timedelta(seconds=1)
+        year_month = now.strftime("%Y-%m")
+        expire_at = int(end_of_next_month.timestamp())
+        _month_cache = (start_of_next_month.timestamp(), year_month, expire_at)
+    return year_month, expire_at
+
+
+def _monthly_key(org_id: int, metric: str, year_month: Optional[str] = None) -> str:
+    if year_month is None:
+        year_month, _ = _current_month()
+    return f"ai_usage:{org_id}:{year_month}:{metric}"
+
+
+def _monthly_keys(org_id: int) -> tuple[str, str]:
+    """(messages_key, tokens_key) for the current month"""
+    year_month, _ = _current_month()
+    return (
+        _monthly_key(org_id, "messages", year_month),
+        _monthly_key(org_id, "tokens", year_month)
+    )
+
+
+def _queue_monthly_increment(pipe, org_id: int, messages: int, tokens: int):
+    """Queue INCRBY + EXPIREAT for both counters on a pipeline"""
+    _, expire_at = _current_month()
+    messages_key, tokens_key = _monthly_keys(org_id)
+    
+    if messages > 0:
+        pipe.incrby(messages_key, messages)
+        pipe.expireat(messages_key, expire_at)
+    
+    if tokens > 0:
+        pipe.incrby(tokens_key, tokens)
+        pipe.expireat(tokens_key, expire_at)
+
+
+def _rate_limit_result(limit: int, raw: list) -> RateLimitResult:
+    allowed, remaining, retry_after, reset_after = raw
+    return RateLimitResult(
+        allowed=bool(allowed),
+        limit=limit,
+        remaining=int(remaining),
+        retry_after=float(retry_after),
+        reset_after=float(reset_after)
+    )
+
+
+def _check_monthly_usage(
+    current_messages: int,
+    current_tokens: int,
+    messages_limit: Optional[int],
+    tokens_limit: Optional[int]
+) -> tuple[bool, dict]:
+    usage_info = {
+        "current_messages": current_messages,
+        "current_tokens": current_tokens,
+        "messages_limit": messages_limit,
+        "tokens_limit": tokens_limit
+    }
+    
+    # Check messages limit
+    if messages_limit is not None and current_messages >= messages_limit:
+        return False, usage_info
+    
+    # Check tokens limit
+    if tokens_limit is not None and current_tokens >= tokens_limit:
+        return False, usage_info
+    
+    return True, usage_info
 
 
 class RateLimiter:
-    """Redis-based rate limiter"""
+    """Redis-based rate limiter (async, shared connection pool)"""
     
     @staticmethod
-    def check_rate_limit(
+    async def check_rate_limit(
         key: str,
         limit: int,
-        window_seconds: int = 60
-    ) -> tuple[bool, int, int]:
+        window_seconds: int = 60,
+        cost: int = 1
+    ) -> RateLimitResult:
         """
-        Check if rate limit is exceeded
+        Check and consume rate limit in one round trip (GCRA)
         
-        Returns: (allowed, current_count, remaining)
+        Allows up to `limit` requests per `window_seconds`, replenished
+        continuously rather than at fixed window boundaries.
         """
-        current = redis_client.get(key)
+        global _gcra_async
+        client = get_redis()
+        if _gcra_async is None:
+            _gcra_async = client.register_script(GCRA_SCRIPT)
         
-        if current is None:
-            # First request in window
-            redis_client.setex(key, window_seconds, 1)
-            return True, 1, limit - 1
+        raw = await _gcra_async(
+            keys=[key], args=[limit, window_seconds, cost], client=client
+        )
+        return _rate_limit_result(limit, raw)
+    
+    @staticmethod
+    async def reserve_tokens(
+        key: str,
+        limit: int,
+        tokens: int,
+        window_seconds: int = 60
+    ) -> tuple[RateLimitResult, TokenReservation]:
+        """
+        Atomically reserve `tokens` against a tokens-per-window limit
         
-        current_count = int(current)
+        The reservation only holds if the result is allowed; pass it to
+        reconcile_tokens() once the actual usage is known.
+        """
+        result = await RateLimiter.check_rate_limit(key, limit, window_seconds, cost=tokens)
+        return result, TokenReservation(key, limit, tokens, window_seconds)
+    
+    @staticmethod
+    async def reconcile_tokens(reservation: TokenReservation, used_tokens: int):
+        """Refund the unused part of a reservation (or charge any overrun)"""
+        amount = reservation.tokens - used_tokens
+        if amount == 0:
+            return
         
-        if current_count >= limit:
-            return False, current_count, 0
+        global _gcra_adjust_async
+        client = get_redis()
+        if _gcra_adjust_async is None:
+            _gcra_adjust_async = client.register_script(GCRA_ADJUST_SCRIPT)
         
-        # Increment counter
-        redis_client.incr(key)
-        return True, current_count + 1, limit - current_count - 1
+        await _gcra_adjust_async(
+            keys=[reservation.key],
+            args=[reservation.limit, reservation.window_seconds, amount],
+            client=client
+        )
     
     @staticmethod
-    def get_monthly_usage(org_id: int, metric: str = "messages") -> int:
+    async def get_monthly_usage(org_id: int, metric: str = "messages") -> int:
         """Get monthly usage from Redis"""
-        year_month = datetime.utcnow().strftime("%Y-%m")
-        key = f"ai_usage:{org_id}:{year_month}:{metric}"
-        
-        value = redis_client.get(key)
+        value = await get_redis().get(_monthly_key(org_id, metric))
         return int(value) if value else 0
     
     @staticmethod
-    def increment_monthly_usage(
+    async def get_monthly_totals(org_id: int) -> tuple[int, int]:
+        """Get (messages, tokens) for the current month in one MGET"""
+        messages, tokens = await get_redis().mget(_monthly_keys(org_id))
+        return int(messages or 0), int(tokens or 0)
+    
+    @staticmethod
+    async def increment_monthly_usage(
         org_id: int,
         messages: int = 0,
         tokens: int = 0
     ):
-        """Increment monthly usage counters"""
-        year_month = datetime.utcnow().strftime("%Y-%m")
+        """Increment monthly usage counters (single MULTI/EXEC round trip)"""
+        if messages <= 0 and tokens <= 0:
+            return
         
-        # Calculate expiry (end of next month)
-        now = datetime.utcnow()
-        next_month = now.replace(day=28) + timedelta(days=4)
-        end_of_next_month = next_month.replace(day=1) + timedelta(days=32)
-        end_of_next_month = end_of_next_month.replace(day=1) - timedelta(seconds=1)
-        expiry_seconds = int((end_of_next_month - now).total_seconds())
-        
-        if messages > 0:
-            key = f"ai_usage:{org_id}:{year_month}:messages"
-            redis_client.incrby(key, messages)
-            redis_client.expire(key, expiry_seconds)
-        
-        if tokens > 0:
-            key = f"ai_usage:{org_id}:{year_month}:tokens"
-            redis_client.incrby(key, tokens)
-            redis_client.expire(key, expiry_seconds)
+        async with get_redis().pipeline(transaction=True) as pipe:
+            _queue_monthly_increment(pipe, org_id, messages, tokens)
+            await pipe.execute()
     
     @staticmethod
-    def check_monthly_limit(
+    async def check_monthly_limit(
         org_id: int,
         messages_limit: Optional[int],
         tokens_limit: Optional[int]
@@ -82,22 +288,9 @@ class RateLimiter:
         
         Returns: (allowed, usage_info)
         """
-        current_messages = RateLimiter.get_monthly_usage(org_id, "messages")
-        current_tokens = RateLimiter.get_monthly_usage(org_id, "tokens")
-        
-        usage_info = {
-            "current_messages": current_messages,
-            "current_tokens": current_tokens,
-            "messages_limit": messages_limit,
-            "tokens_limit": tokens_limit
-        }
+        current_messages, current_tokens = await RateLimiter.get_monthly_totals(org_id)
         
-        # Check messages limit
-        if messages_limit is not None and current_messages >= messages_limit:
-            return False, usage_info
-        
-        # Check tokens limit
-        if tokens_limit is not None and current_tokens >= tokens_limit:
-            return False, usage_info
-        
-        return True, usage_info
+        return _check_monthly_usage(
+            current_messages, current_tokens, messages_limit, tokens_limit
+        )
+
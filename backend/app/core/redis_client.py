@@ -0,0 +1,47 @@
+import redis.asyncio as aioredis
+from typing import Optional
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Shared async client (and its connection pool) for this worker
+_client: Optional[aioredis.Redis] = None
+
+
+def _build_client() -> aioredis.Redis:
+    return aioredis.from_url(
+        settings.REDIS_URL,
+        decode_responses=True,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    )
+
+
+async def init_redis():
+    """Create the shared Redis connection pool (called from lifespan)"""
+    global _client
+    if _client is None:
+        _client = _build_client()
+    logger.info("Redis connection pool initialized")
+
+
+def get_redis() -> aioredis.Redis:
+    """
+    Get the shared async Redis client
+    
+    Falls back to creating the client lazily when the app lifespan did not run.
+    """
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+async def close_redis():
+    """Close the shared Redis connection pool (called on shutdown)"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    logger.info("Redis connection pool closed")
@@ -1,8 +1,24 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 import bcrypt
+import redis.asyncio as aioredis
 from app.core.config import settings
+from app.core.redis_client import get_redis
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bounded pool that runs bcrypt off the event loop
+_hash_executor: Optional[Executor] = None
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -13,13 +29,69 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     )
 
 
-def get_password_hash(password: str) -> str:
+def get_password_hash(password: str, rounds: Optional[int] = None) -> str:
     """Hash a password using bcrypt"""
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=rounds or settings.BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True if a hash was made with a different cost than BCRYPT_ROUNDS"""
+    try:
+        rounds = int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds != settings.BCRYPT_ROUNDS
+
+
+def _build_hash_executor() -> Executor:
+    workers = settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+    if settings.PASSWORD_HASH_EXECUTOR == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+    # Spawned (not forked) so children don't inherit the event loop or sockets
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def init_password_hasher():
+    """Create the hashing pool (called from lifespan)"""
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = _build_hash_executor()
+
+
+def shutdown_password_hasher():
+    """Shut the hashing pool down (called on shutdown)"""
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=True, cancel_futures=True)
+        _hash_executor = None
+
+
+def _get_hash_executor() -> Executor:
+    # Created lazily when the app lifespan did not run (tests, scripts)
+    if _hash_executor is None:
+        init_password_hasher()
+    return _hash_executor
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password() in the hashing pool, without blocking the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(
+        _get_hash_executor(), verify_password, plain_password, hashed_password
+    )
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash() in the hashing pool, without blocking the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(
+        _get_hash_executor(), get_password_hash, password, settings.BCRYPT_ROUNDS
+    )
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     # Convert sub to string if it's an integer
@@ -29,7 +101,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire, "type": "access"})
+    to_encode.update({"exp": expire, "type": "access", "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
@@ -40,14 +112,75 @@ def create_refresh_token(data: dict) -> str:
     if "sub" in to_encode and isinstance(to_encode["sub"], int):
         to_encode["sub"] = str(to_encode["sub"])
     expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire, "type": "refresh"})
+    to_encode.update({"exp": expire, "type": "refresh", "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 
+# Verified tokens: sha256(token) -> (exp timestamp, payload), in LRU order
+_verified_tokens: "OrderedDict[bytes, tuple]" = OrderedDict()
+
+
+def _token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
 def decode_token(token: str) -> Optional[dict]:
+    """
+    Verify a JWT and return its claims (None if invalid or expired)
+    
+    Verified payloads are kept in a bounded LRU until their `exp`, so a
+    client re-sending the same token skips signature verification.
+    """
+    digest = _token_digest(token)
+    entry = _verified_tokens.get(digest)
+    if entry is not None:
+        if entry[0] > time.time():
+            _verified_tokens.move_to_end(digest)
+            return dict(entry[1])
+        _verified_tokens.pop(digest, None)
+    
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
     except JWTError:
         return None
+    
+    exp = payload.get("exp")
+    if settings.JWT_CACHE_MAX_ENTRIES > 0 and isinstance(exp, (int, float)):
+        _verified_tokens[digest] = (exp, dict(payload))
+        while len(_verified_tokens) > settings.JWT_CACHE_MAX_ENTRIES:
+            _verified_tokens.popitem(last=False)
+    return payload
+
+
+def clear_token_cache():
+    _verified_tokens.clear()
+
+
+async def revoke_token(token: str) -> bool:
+    """
+    Revoke a token until it expires (e.g. on logout)
+    
+    Only enforced where is_token_revoked() is checked, i.e. when
+    JWT_REVOCATION_CHECK is enabled.
+    """
+    payload = decode_token(token)
+    if payload is None or not payload.get("jti"):
+        return False
+    
+    _verified_tokens.pop(_token_digest(token), None)
+    ttl = max(int(payload["exp"] - time.time()), 1)
+    await get_redis().set(f"jwt_revoked:{payload['jti']}", 1, ex=ttl)
+    return True
+
+
+async def is_token_revoked(payload: dict) -> bool:
+    """Check the revocation list (no-op unless JWT_REVOCATION_CHECK is on)"""
+    if not settings.JWT_REVOCATION_CHECK or not payload.get("jti"):
+        return False
+    try:
+        return bool(await get_redis().exists(f"jwt_revoked:{payload['jti']}"))
+    except (aioredis.RedisError, OSError) as e:
+        # Fail closed: a revoked token must not get through while Redis is down
+        logger.error(f"Token revocation check failed: {e}")
+        return True
@@ -0,0 +1,106 @@
+import re
+from typing import AsyncIterator, Iterable, List, NamedTuple, Optional, Tuple
+
+# Any of these ends a line in an SSE stream
+_LINE_BREAK = re.compile(r"\r\n|\r|\n")
+
+
+def is_control(payload: str) -> bool:
+    """Protocol markers are never merged with text"""
+    return payload == "[DONE]" or payload.startswith("[ERROR]")
+
+
+def encode_event(data: str, event_id: Optional[str] = None) -> str:
+    """
+    One SSE event
+    
+    Every line of `data` gets its own `data:` field, so a chunk containing
+    newlines arrives intact (clients join data lines with "\\n").
+    """
+    parts = []
+    if event_id is not None:
+        parts.append(f"id: {event_id}\n")
+    for line in _LINE_BREAK.split(data):
+        parts.append(f"data: {line}\n")
+    parts.append("\n")
+    return "".join(parts)
+
+
+def encode_batch(
+    payloads: Iterable[Tuple[str, Optional[str]]],
+    max_bytes: int = 0
+) -> str:
+    """
+    Events for consecutive (payload, event_id) pairs, merged where possible
+    
+    Adjacent text payloads become one event (with the last one's id) until
+    it reaches `max_bytes` of UTF-8 text; control payloads always get their
+    own event.
+    `max_bytes` 0 means one event per payload.
+    """
+    events: List[str] = []
+    text: List[str] = []
+    size = 0
+    last_id = None
+    
+    def flush():
+        nonlocal size
+        if text:
+            events.append(encode_event("".join(text), last_id))
+            text.clear()
+            size = 0
+    
+    for payload, event_id in payloads:
+        if max_bytes <= 0 or is_control(payload):
+            flush()
+            events.append(encode_event(payload, event_id))
+            continue
+        
+        text.append(payload)
+        size += len(payload.encode())
+        last_id = event_id
+        if size >= max_bytes:
+            flush()
+    
+    flush()
+    return "".join(events)
+
+
+class SSEEvent(NamedTuple):
+    event: str
+    data: str
+    id: Optional[str]
+
+
+async def parse_sse(lines: AsyncIterator[str]) -> AsyncIterator[SSEEvent]:
+    """
+    Events of an SSE stream, from its lines (e.g. httpx `aiter_lines()`)
+    
+    Follows the event-stream format: multi-line data is joined with "\n",
+    comments and unknown fields are skipped, and the event type defaults
+    to "message".
+    """
+    event, data, event_id = "message", [], None
+    async for line in lines:
+        line = line.rstrip("\r\n")
+        if not line:
+            if data:
+                yield SSEEvent(event, "\n".join(data), event_id)
+            event, data = "message", []
+            continue
+        if line.startswith(":"):
+            continue
+        
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "data":
+            data.append(value)
+        elif field == "event":
+            event = value
+        elif field == "id":
+            event_id = value
+    
+    # A stream may end without the final blank line
+    if data:
+        yield SSEEvent(event, "\n".join(data), event_id)
@@ -0,0 +1,187 @@
+import json
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Dict, Optional, Tuple
+import redis.asyncio as aioredis
+from sqlalchemy import Date, DateTime, Numeric
+from sqlalchemy import Enum as SAEnum
+from sqlalchemy.orm import make_transient_to_detached
+from app.core.config import settings
+from app.core.redis_client import get_redis
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Never copied into the cache. Rebuilt rows leave them unloaded, so the
+# columns must be deferred with raiseload=True on the model: access raises
+# instead of attempting a lazy load in the async session.
+EXCLUDED_COLUMNS = {"hashed_password"}
+
+# Process-local layer: key -> (expires_at, payload)
+_local: Dict[str, Tuple[float, dict]] = {}
+
+
+def _key(user_id: int, org_ref: str) -> str:
+    return f"tenant:{user_id}:{org_ref}"
+
+
+def _user_index(user_id: int) -> str:
+    return f"tenant_index:user:{user_id}"
+
+
+def _org_index(org_id: int) -> str:
+    return f"tenant_index:org:{org_id}"
+
+
+def _encode(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _decode(column, value):
+    if value is None:
+        return None
+    if isinstance(column.type, SAEnum) and column.type.enum_class is not None:
+        return column.type.enum_class(value)
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(column.type, Date):
+        return date.fromisoformat(value)
+    if isinstance(column.type, Numeric):
+        return Decimal(value)
+    return value
+
+
+def dump_row(obj) -> Optional[dict]:
+    """Column values of an ORM object as a JSON-safe dict"""
+    if obj is None:
+        return None
+    return {
+        column.key: _encode(getattr(obj, column.key))
+        for column in obj.__table__.columns
+        if column.key not in EXCLUDED_COLUMNS
+    }
+
+
+def load_row(model, data: Optional[dict]):
+    """
+    Rebuild a detached ORM object from dump_row() output
+    
+    Attach it with `await db.merge(obj, load=False)`; that issues no SQL, and
+    later changes to it are flushed as a normal UPDATE. EXCLUDED_COLUMNS are
+    left unloaded; read them with `await db.refresh(obj, [name])`.
+    """
+    if data is None:
+        return None
+    obj = model(**{
+        column.key: _decode(column, data[column.key])
+        for column in model.__table__.columns
+        if column.key in data
+    })
+    make_transient_to_detached(obj)
+    return obj
+
+
+def _local_get(key: str) -> Optional[dict]:
+    entry = _local.get(key)
+    if entry is None:
+        return None
+    if entry[0] < time.monotonic():
+        _local.pop(key, None)
+        return None
+    return entry[1]
+
+
+def _local_set(key: str, payload: dict):
+    if len(_local) >= settings.TENANT_CACHE_LOCAL_MAX_ENTRIES:
+        # Evict the oldest entry (dicts keep insertion order)
+        _local.pop(next(iter(_local)), None)
+    _local[key] = (time.monotonic() + settings.TENANT_CACHE_LOCAL_TTL_SECONDS, payload)
+
+
+async def get_cached(user_id: int, org_ref: str) -> Optional[dict]:
+    """Cached tenant payload for a user and X-Current-Org value, if any"""
+    key = _key(user_id, org_ref)
+    payload = _local_get(key)
+    if payload is not None:
+        return payload
+    
+    try:
+        cached = await get_redis().get(key)
+    except (aioredis.RedisError, OSError) as e:
+        logger.warning(f"Tenant cache read failed: {e}")
+        return None
+    
+    if cached is None:
+        return None
+    payload = json.loads(cached)
+    _local_set(key, payload)
+    return payload
+
+
+async def store(user_id: int, org_ref: str, payload: dict):
+    """
+    Cache a tenant payload
+    
+    Payload: {"user", "organization", "membership", "subscription"}, each
+    from dump_row(). The key is indexed by user and organization so either
+    can be invalidated.
+    """
+    key = _key(user_id, org_ref)
+    _local_set(key, payload)
+    
+    ttl = settings.TENANT_CACHE_TTL_SECONDS
+    indexes = [_user_index(user_id)]
+    if payload.get("organization"):
+        indexes.append(_org_index(payload["organization"]["id"]))
+    
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.set(key, json.dumps(payload), ex=ttl)
+            for index in indexes:
+                pipe.sadd(index, key)
+                pipe.expire(index, ttl)
+            await pipe.execute()
+    except (aioredis.RedisError, OSError) as e:
+        logger.warning(f"Tenant cache write failed: {e}")
+
+
+async def _invalidate(index: str, matches):
+    for key, (_, payload) in list(_local.items()):
+        if matches(payload):
+            _local.pop(key, None)
+    
+    try:
+        redis = get_redis()
+        keys = await redis.smembers(index)
+        await redis.delete(index, *keys)
+    except (aioredis.RedisError, OSError) as e:
+        logger.warning(f"Tenant cache invalidation failed: {e}")
+
+
+async def invalidate_user(user_id: int):
+    """Drop cached contexts of a user (profile or status changed)"""
+    await _invalidate(
+        _user_index(user_id),
+        lambda payload: payload["user"]["id"] == user_id
+    )
+
+
+async def invalidate_org(org_id: int):
+    """Drop cached contexts of an organization (org, membership or subscription changed)"""
+    await _invalidate(
+        _org_index(org_id),
+        lambda payload: (payload.get("organization") or {}).get("id") == org_id
+    )
+
+
+def clear_local():
+    """Empty the process-local layer"""
+    _local.clear()
@@ -0,0 +1,62 @@
+import asyncio
+import logging
+from app.core.config import settings
+
+try:
+    import tiktoken
+except ImportError:  # optional; falls back to a character estimate
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Set by load_tokenizer(); never loaded lazily on the request path
+_encoding = None
+
+
+def load_tokenizer():
+    """
+    Load the cl100k_base encoding (blocking)
+    
+    tiktoken downloads the BPE file on first use, without a timeout, unless
+    it is already in TIKTOKEN_CACHE_DIR (the Docker image bakes it in). A
+    failure is logged and not remembered, so the next call tries again.
+    """
+    global _encoding
+    if tiktoken is None or _encoding is not None:
+        return
+    try:
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"Tokenizer unavailable, estimating token counts: {e}")
+
+
+async def init_tokenizer():
+    """Load the encoding off the event loop (called from lifespan)"""
+    try:
+        await asyncio.wait_for(
+            asyncio.get_running_loop().run_in_executor(None, load_tokenizer),
+            timeout=settings.TOKENIZER_LOAD_TIMEOUT_SECONDS
+        )
+    except asyncio.TimeoutError:
+        # The load carries on in its thread and is used once it finishes
+        logger.warning("Tokenizer still loading, estimating token counts meanwhile")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Local token count for text a provider didn't report usage for
+    
+    Uses tiktoken's cl100k_base once loaded, which is close for the
+    OpenAI-compatible models and a reasonable proxy for the others;
+    otherwise ~4 characters per token.
+    """
+    if not text:
+        return 0
+    if _encoding is None:
+        return (len(text) + 3) // 4
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages) -> int:
+    """Prompt tokens of chat messages, with the usual per-message overhead"""
+    return sum(count_tokens(m.content) + 4 for m in messages)
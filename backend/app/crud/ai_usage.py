@@ -1,9 +1,19 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, insert, func, and_
 from datetime import date, datetime, timedelta
 from typing import List, Optional
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from app.models.ai_usage import AIUsage, AIRequest
 
+# Additive counters on the daily rollup
+USAGE_COUNTER_COLUMNS = (
+    "message_count",
+    "input_tokens",
+    "output_tokens",
+    "total_tokens",
+    "estimated_cost",
+)
+
 
 async def get_or_create_daily_usage(
     db: AsyncSession,
@@ -39,6 +49,33 @@ async def get_or_create_daily_usage(
     return usage
 
 
+async def upsert_usage_deltas(db: AsyncSession, rows: List[dict]):
+    """
+    Add usage deltas to daily rollups in a single statement
+    
+    Each row: organization_id, model, date, message_count, input_tokens,
+    output_tokens, total_tokens, estimated_cost. Missing rollups are
+    created; existing ones are incremented atomically in the database.
+    """
+    if not rows:
+        return
+    
+    # Consistent lock order across concurrent flushes
+    rows = sorted(rows, key=lambda r: (r["organization_id"], r["model"], r["date"]))
+    
+    stmt = pg_insert(AIUsage).values(rows)
+    excluded = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_ai_usage_org_model_date",
+        set_={
+            column: func.coalesce(getattr(AIUsage, column), 0) + getattr(excluded, column)
+            for column in USAGE_COUNTER_COLUMNS
+        } | {"updated_at": func.now()}
+    )
+    await db.execute(stmt)
+    await db.commit()
+
+
 async def update_usage(
     db: AsyncSession,
     org_id: int,
@@ -48,17 +85,16 @@ async def update_usage(
     cost_cents: int
 ):
     """Update daily usage"""
-    usage = await get_or_create_daily_usage(db, org_id, model)
-    
-    usage.message_count += 1
-    usage.input_tokens += input_tokens
-    usage.output_tokens += output_tokens
-    usage.total_tokens += (input_tokens + output_tokens)
-    usage.estimated_cost += cost_cents
-    
-    await db.commit()
-    await db.refresh(usage)
-    return usage
+    await upsert_usage_deltas(db, [{
+        "organization_id": org_id,
+        "model": model,
+        "date": date.today(),
+        "message_count": 1,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+        "estimated_cost": cost_cents,
+    }])
 
 
 async def log_request(
@@ -89,13 +125,17 @@ async def log_request(
     return request
 
 
-async def get_monthly_usage(
-    db: AsyncSession,
-    org_id: int,
-    year: int = None,
-    month: int = None
-) -> List[AIUsage]:
-    """Get monthly usage"""
+async def bulk_insert_requests(db: AsyncSession, rows: List[dict]):
+    """Insert many request log rows in one executemany round trip"""
+    if not rows:
+        return
+    
+    await db.execute(insert(AIRequest), rows)
+    await db.commit()
+
+
+def _month_bounds(year: int = None, month: int = None):
+    """First day of the month and first day of the next one"""
     if year is None or month is None:
         now = datetime.utcnow()
         year = now.year
@@ -106,6 +146,17 @@ async def get_monthly_usage(
         end_date = date(year + 1, 1, 1)
     else:
         end_date = date(year, month + 1, 1)
+    return start_date, end_date
+
+
+async def get_monthly_usage(
+    db: AsyncSession,
+    org_id: int,
+    year: int = None,
+    month: int = None
+) -> List[AIUsage]:
+    """Get monthly usage"""
+    start_date, end_date = _month_bounds(year, month)
     
     result = await db.execute(
         select(AIUsage).where(
@@ -121,31 +172,47 @@ async def get_monthly_usage(
 
 async def get_usage_summary(
     db: AsyncSession,
-    org_id: int
+    org_id: int,
+    year: int = None,
+    month: int = None
 ) -> dict:
-    """Get usage summary for current month"""
-    usage_records = await get_monthly_usage(db, org_id)
+    """
+    Get usage summary for a month (current month by default)
     
-    total_messages = sum(u.message_count for u in usage_records)
-    total_tokens = sum(u.total_tokens for u in usage_records)
-    total_cost = sum(u.estimated_cost for u in usage_records)
+    Totals and the per-model breakdown come from one SUM ... GROUP BY model
+    query returning plain rows.
+    """
+    start_date, end_date = _month_bounds(year, month)
     
-    # Breakdown by model
-    models_breakdown = {}
-    for usage in usage_records:
-        if usage.model not in models_breakdown:
-            models_breakdown[usage.model] = {
-                "messages": 0,
-                "tokens": 0,
-                "cost": 0
-            }
-        models_breakdown[usage.model]["messages"] += usage.message_count
-        models_breakdown[usage.model]["tokens"] += usage.total_tokens
-        models_breakdown[usage.model]["cost"] += usage.estimated_cost
+    result = await db.execute(
+        select(
+            AIUsage.model,
+            func.coalesce(func.sum(AIUsage.message_count), 0).label("messages"),
+            func.coalesce(func.sum(AIUsage.total_tokens), 0).label("tokens"),
+            func.coalesce(func.sum(AIUsage.estimated_cost), 0).label("cost"),
+        )
+        .where(
+            and_(
+                AIUsage.organization_id == org_id,
+                AIUsage.date >= start_date,
+                AIUsage.date < end_date
+            )
+        )
+        .group_by(AIUsage.model)
+    )
+    
+    models_breakdown = {
+        row.model: {
+            "messages": int(row.messages),
+            "tokens": int(row.tokens),
+            "cost": int(row.cost)
+        }
+        for row in result
+    }
     
     return {
-        "total_messages": total_messages,
-        "total_tokens": total_tokens,
-        "total_cost_cents": total_cost,
+        "total_messages": sum(m["messages"] for m in models_breakdown.values()),
+        "total_tokens": sum(m["tokens"] for m in models_breakdown.values()),
+        "total_cost_cents": sum(m["cost"] for m in models_breakdown.values()),
         "models_breakdown": models_breakdown
     }
@@ -1,11 +1,13 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
-from typing import Optional, List, Tuple
+from sqlalchemy import select, update, and_
+from typing import Dict, Optional, List, Tuple
 from datetime import datetime
 import secrets
 import hashlib
 from app.models.api_key import ApiKey
+from app.models.organization import Organization
 from app.schemas.api_key import ApiKeyCreate
+from app.core.api_key_cache import api_key_cache
 
 
 def generate_api_key() -> Tuple[str, str, str]:
@@ -56,6 +58,27 @@ async def get_api_key_by_hash(db: AsyncSession, key_hash: str) -> Optional[ApiKe
     return result.scalar_one_or_none()
 
 
+async def get_api_key_with_org(
+    db: AsyncSession,
+    key_hash: str
+) -> Tuple[Optional[ApiKey], Optional[Organization]]:
+    """Active API key and its organization in one query"""
+    result = await db.execute(
+        select(ApiKey, Organization)
+        .join(Organization, Organization.id == ApiKey.organization_id)
+        .where(
+            and_(
+                ApiKey.key_hash == key_hash,
+                ApiKey.is_active == True
+            )
+        )
+    )
+    row = result.first()
+    if row is None:
+        return None, None
+    return tuple(row)
+
+
 async def get_organization_api_keys(db: AsyncSession, org_id: int) -> List[ApiKey]:
     result = await db.execute(
         select(ApiKey)
@@ -70,14 +93,29 @@ async def update_api_key_last_used(db: AsyncSession, api_key: ApiKey):
     await db.commit()
 
 
+async def bulk_update_last_used(db: AsyncSession, last_used: Dict[int, datetime]):
+    """Set last_used_at for many keys in one executemany round trip"""
+    if not last_used:
+        return
+    
+    await db.execute(
+        update(ApiKey),
+        [{"id": key_id, "last_used_at": used_at} for key_id, used_at in last_used.items()]
+    )
+    await db.commit()
+
+
 async def revoke_api_key(db: AsyncSession, api_key: ApiKey):
     api_key.is_active = False
     await db.commit()
+    await api_key_cache.revoke(api_key.key_hash)
 
 
 async def delete_api_key(db: AsyncSession, api_key: ApiKey):
+    key_hash = api_key.key_hash
     await db.delete(api_key)
     await db.commit()
+    await api_key_cache.revoke(key_hash)
 
 
 def hash_api_key(key: str) -> str:
@@ -1,9 +1,12 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from app.models.organization import Organization, Membership, MemberRole
 from app.models.user import User
+from app.models.subscription import Subscription
 from app.schemas.organization import OrganizationCreate, OrganizationUpdate
+from app.core import tenant_cache
+from app.core.api_key_cache import api_key_cache
 
 
 async def get_organization_by_id(db: AsyncSession, org_id: int) -> Optional[Organization]:
@@ -16,6 +19,46 @@ async def get_organization_by_slug(db: AsyncSession, slug: str) -> Optional[Orga
     return result.scalar_one_or_none()
 
 
+async def get_tenant(
+    db: AsyncSession,
+    user_id: int,
+    org_ref: Optional[str] = None
+) -> Tuple[Optional[User], Optional[Organization], Optional[Membership], Optional[Subscription]]:
+    """
+    Load user, organization, membership and subscription in one query
+    
+    `org_ref` is an organization id or slug (the X-Current-Org header).
+    Missing parts come back as None.
+    """
+    if not org_ref:
+        user = await db.get(User, user_id)
+        return user, None, None, None
+    
+    try:
+        org_match = Organization.id == int(org_ref)
+    except ValueError:
+        org_match = Organization.slug == org_ref
+    
+    result = await db.execute(
+        select(User, Organization, Membership, Subscription)
+        .select_from(User)
+        .outerjoin(Organization, org_match)
+        .outerjoin(
+            Membership,
+            and_(
+                Membership.user_id == User.id,
+                Membership.organization_id == Organization.id
+            )
+        )
+        .outerjoin(Subscription, Subscription.organization_id == Organization.id)
+        .where(User.id == user_id)
+    )
+    row = result.first()
+    if row is None:
+        return None, None, None, None
+    return tuple(row)
+
+
 async def create_organization(
     db: AsyncSession,
     org_in: OrganizationCreate,
@@ -54,6 +97,8 @@ async def update_organization(
     
     await db.commit()
     await db.refresh(org)
+    await tenant_cache.invalidate_org(org.id)
+    await api_key_cache.invalidate_org(org.id)
     return org
 
 
@@ -105,6 +150,7 @@ async def create_membership(
     db.add(membership)
     await db.commit()
     await db.refresh(membership)
+    await tenant_cache.invalidate_org(org_id)
     return membership
 
 
@@ -125,12 +171,14 @@ async def update_membership_role(
     membership.role = role
     await db.commit()
     await db.refresh(membership)
+    await tenant_cache.invalidate_org(membership.organization_id)
     return membership
 
 
 async def delete_membership(db: AsyncSession, membership: Membership):
     await db.delete(membership)
     await db.commit()
+    await tenant_cache.invalidate_org(membership.organization_id)
 
 
 async def check_user_permission(
@@ -3,6 +3,7 @@ from sqlalchemy import select
 from typing import Optional
 from datetime import datetime
 from app.models.subscription import Subscription, PlanType, SubscriptionStatus
+from app.core import tenant_cache
 
 
 async def get_subscription_by_org(db: AsyncSession, org_id: int) -> Optional[Subscription]:
@@ -35,6 +36,7 @@ async def create_subscription(
     db.add(subscription)
     await db.commit()
     await db.refresh(subscription)
+    await tenant_cache.invalidate_org(org_id)
     return subscription
 
 
@@ -79,6 +81,7 @@ async def update_subscription_from_stripe(
     
     await db.commit()
     await db.refresh(subscription)
+    await tenant_cache.invalidate_org(subscription.organization_id)
     return subscription
 
 
@@ -91,6 +94,7 @@ async def update_subscription_plan(
     subscription.plan_type = plan_type
     await db.commit()
     await db.refresh(subscription)
+    await tenant_cache.invalidate_org(subscription.organization_id)
     return subscription
 
 
@@ -103,4 +107,5 @@ async def cancel_subscription(
     subscription.canceled_at = datetime.utcnow()
     await db.commit()
     await db.refresh(subscription)
+    await tenant_cache.invalidate_org(subscription.organization_id)
     return subscription
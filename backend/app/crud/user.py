@@ -1,9 +1,11 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.orm import undefer
 from typing import Optional
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
-from app.core.security import get_password_hash, verify_password
+from app.core.security import get_password_hash_async, verify_password_async, password_needs_rehash
+from app.core import tenant_cache
 
 
 async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
@@ -19,7 +21,7 @@ async def get_user_by_id(db: AsyncSession, user_id: int) -> Optional[User]:
 async def create_user(db: AsyncSession, user_in: UserCreate, stripe_customer_id: Optional[str] = None) -> User:
     db_user = User(
         email=user_in.email,
-        hashed_password=get_password_hash(user_in.password),
+        hashed_password=await get_password_hash_async(user_in.password),
         full_name=user_in.full_name,
         stripe_customer_id=stripe_customer_id
     )
@@ -30,22 +32,31 @@ async def create_user(db: AsyncSession, user_in: UserCreate, stripe_customer_id:
 
 
 async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
-    user = await get_user_by_email(db, email)
+    result = await db.execute(
+        select(User).options(undefer(User.hashed_password)).where(User.email == email)
+    )
+    user = result.scalar_one_or_none()
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return None
+    
+    # Upgrade hashes made with an older cost factor while we know the password
+    if password_needs_rehash(user.hashed_password):
+        user.hashed_password = await get_password_hash_async(password)
+        await db.commit()
     return user
 
 
 async def update_user(db: AsyncSession, user: User, user_in: UserUpdate) -> User:
     update_data = user_in.model_dump(exclude_unset=True)
     if "password" in update_data:
-        update_data["hashed_password"] = get_password_hash(update_data.pop("password"))
+        update_data["hashed_password"] = await get_password_hash_async(update_data.pop("password"))
     
     for field, value in update_data.items():
         setattr(user, field, value)
     
     await db.commit()
     await db.refresh(user)
+    await tenant_cache.invalidate_user(user.id)
     return user
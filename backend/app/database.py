@@ -1,10 +1,15 @@
+from sqlalchemy import create_engine
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import declarative_base
+from sqlalchemy.orm import declarative_base, sessionmaker
 from app.core.config import settings
 
 engine = create_async_engine(settings.DATABASE_URL, echo=settings.DEBUG, future=True)
 async_session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# Synchronous sessions for Celery tasks
+sync_engine = create_engine(settings.DATABASE_URL_SYNC, pool_pre_ping=True)
+SessionLocal = sessionmaker(bind=sync_engine, expire_on_commit=False)
+
 Base = declarative_base()
 
 
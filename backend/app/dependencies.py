@@ -2,26 +2,48 @@ from fastapi import Depends, HTTPException, status, Header
 from fastapi.security import OAuth2PasswordBearer, APIKeyHeader
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, Tuple, List
-from datetime import datetime
+from dataclasses import dataclass
+from datetime import datetime, timezone
 from functools import wraps
 from app.database import get_db
-from app.core.security import decode_token
+from app.core.security import decode_token, is_token_revoked
+from app.core import tenant_cache
+from app.core.api_key_cache import api_key_cache, CachedApiKey
 from app.crud import user as crud_user
 from app.crud import organization as crud_org
 from app.crud import api_key as crud_api_key
 from app.crud import subscription as crud_subscription
+from app.services.api_key_activity import api_key_activity
 from app.models.user import User
-from app.models.organization import Organization, MemberRole
-from app.models.subscription import PlanType, SubscriptionStatus
+from app.models.organization import Organization, Membership, MemberRole
+from app.models.subscription import Subscription, PlanType, SubscriptionStatus
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login", auto_error=False)
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
 
-async def get_current_user(
+@dataclass
+class TenantContext:
+    """Authenticated user plus the organization selected by X-Current-Org"""
+    user: User
+    organization: Optional[Organization] = None
+    membership: Optional[Membership] = None
+    subscription: Optional[Subscription] = None
+
+
+async def get_tenant_context(
     db: AsyncSession = Depends(get_db),
-    token: Optional[str] = Depends(oauth2_scheme)
-) -> User:
+    token: Optional[str] = Depends(oauth2_scheme),
+    x_current_org: Optional[str] = Header(None)
+) -> TenantContext:
+    """
+    Resolve user, organization, membership and subscription once per request
+    
+    FastAPI caches this dependency within a request, so every dependency
+    below shares one resolution. Warm tenants come from the tenant cache
+    (process-local, then Redis) and are attached to the request session
+    without any query; cold ones are loaded with a single joined query.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -35,6 +57,9 @@ async def get_current_user(
     if payload is None or payload.get("type") != "access":
         raise credentials_exception
     
+    if await is_token_revoked(payload):
+        raise credentials_exception
+    
     user_id_str = payload.get("sub")
     if user_id_str is None:
         raise credentials_exception
@@ -44,11 +69,40 @@ async def get_current_user(
     except (ValueError, TypeError):
         raise credentials_exception
     
-    user = await crud_user.get_user_by_id(db, user_id=user_id)
+    org_ref = x_current_org or ""
+    cached = await tenant_cache.get_cached(user_id, org_ref)
+    if cached is not None:
+        parts = []
+        for model, name in (
+            (User, "user"),
+            (Organization, "organization"),
+            (Membership, "membership"),
+            (Subscription, "subscription"),
+        ):
+            obj = tenant_cache.load_row(model, cached[name])
+            parts.append(await db.merge(obj, load=False) if obj is not None else None)
+        return TenantContext(*parts)
+    
+    user, org, membership, subscription = await crud_org.get_tenant(db, user_id, org_ref)
     if user is None:
         raise credentials_exception
     
-    return user
+    # Unknown orgs are not cached: the slug may be created any moment
+    if not org_ref or org is not None:
+        await tenant_cache.store(user_id, org_ref, {
+            "user": tenant_cache.dump_row(user),
+            "organization": tenant_cache.dump_row(org),
+            "membership": tenant_cache.dump_row(membership),
+            "subscription": tenant_cache.dump_row(subscription),
+        })
+    
+    return TenantContext(user, org, membership, subscription)
+
+
+async def get_current_user(
+    tenant: TenantContext = Depends(get_tenant_context)
+) -> User:
+    return tenant.user
 
 
 async def get_current_active_user(
@@ -59,6 +113,12 @@ async def get_current_active_user(
     return current_user
 
 
+def _utcnow_like(value: datetime) -> datetime:
+    """Current UTC time, naive or aware to match `value`"""
+    now = datetime.now(timezone.utc)
+    return now if value.tzinfo else now.replace(tzinfo=None)
+
+
 async def get_current_user_or_api_key(
     db: AsyncSession = Depends(get_db),
     token: Optional[str] = Depends(oauth2_scheme),
@@ -79,26 +139,41 @@ async def get_current_user_or_api_key(
             )
         
         key_hash = crud_api_key.hash_api_key(api_key)
-        db_key = await crud_api_key.get_api_key_by_hash(db, key_hash)
+        cached = api_key_cache.get(key_hash)
         
-        if not db_key:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid API key"
+        if cached is None:
+            # Taken before the read: a revocation during it must not be undone
+            epoch = api_key_cache.epoch
+            db_key, db_org = await crud_api_key.get_api_key_with_org(db, key_hash)
+            if not db_key:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Invalid API key"
+                )
+            cached = CachedApiKey(
+                key_id=db_key.id,
+                organization_id=db_key.organization_id,
+                expires_at=db_key.expires_at,
+                is_active=db_key.is_active,
+                organization=tenant_cache.dump_row(db_org)
+            )
+            api_key_cache.put(key_hash, cached, epoch)
+            org = db_org
+        else:
+            org = await db.merge(
+                tenant_cache.load_row(Organization, cached.organization), load=False
             )
         
         # Check expiration
-        if db_key.expires_at and db_key.expires_at < datetime.utcnow():
+        if cached.expires_at and cached.expires_at < _utcnow_like(cached.expires_at):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="API key expired"
             )
         
-        # Update last used
-        await crud_api_key.update_api_key_last_used(db, db_key)
+        # Update last used (buffered, written in batches)
+        api_key_activity.record(cached.key_id)
         
-        # Get organization
-        org = await crud_org.get_organization_by_id(db, db_key.organization_id)
         if not org or not org.is_active:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -110,7 +185,7 @@ async def get_current_user_or_api_key(
     # Try JWT token
     if token:
         payload = decode_token(token)
-        if payload and payload.get("type") == "access":
+        if payload and payload.get("type") == "access" and not await is_token_revoked(payload):
             user_id = payload.get("sub")
             if user_id:
                 user = await crud_user.get_user_by_id(db, user_id=user_id)
@@ -125,8 +200,8 @@ async def get_current_user_or_api_key(
 
 
 async def get_current_organization(
-    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
+    tenant: TenantContext = Depends(get_tenant_context),
     x_current_org: Optional[str] = Header(None)
 ) -> Organization:
     """Get current organization from header"""
@@ -136,13 +211,7 @@ async def get_current_organization(
             detail="X-Current-Org header required"
         )
     
-    # Try to parse as ID or slug
-    try:
-        org_id = int(x_current_org)
-        org = await crud_org.get_organization_by_id(db, org_id)
-    except ValueError:
-        org = await crud_org.get_organization_by_slug(db, x_current_org)
-    
+    org = tenant.organization
     if not org:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -150,7 +219,7 @@ async def get_current_organization(
         )
     
     # Check user is member
-    membership = await crud_org.get_membership(db, current_user.id, org.id)
+    membership = tenant.membership
     if not membership or not membership.is_active:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -164,10 +233,14 @@ async def require_org_role(
     required_roles: List[MemberRole],
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
-    current_org: Organization = Depends(get_current_organization)
+    current_org: Organization = Depends(get_current_organization),
+    tenant: Optional[TenantContext] = None
 ):
     """Check if user has required role in current organization"""
-    membership = await crud_org.get_membership(db, current_user.id, current_org.id)
+    if tenant is not None:
+        membership = tenant.membership
+    else:
+        membership = await crud_org.get_membership(db, current_user.id, current_org.id)
     
     if not membership or membership.role not in required_roles:
         raise HTTPException(
@@ -182,17 +255,19 @@ async def require_org_role(
 async def require_owner(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
-    current_org: Organization = Depends(get_current_organization)
+    current_org: Organization = Depends(get_current_organization),
+    tenant: TenantContext = Depends(get_tenant_context)
 ):
-    return await require_org_role([MemberRole.OWNER], db, current_user, current_org)
+    return await require_org_role([MemberRole.OWNER], db, current_user, current_org, tenant)
 
 
 async def require_admin(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
-    current_org: Organization = Depends(get_current_organization)
+    current_org: Organization = Depends(get_current_organization),
+    tenant: TenantContext = Depends(get_tenant_context)
 ):
-    return await require_org_role([MemberRole.OWNER, MemberRole.ADMIN], db, current_user, current_org)
+    return await require_org_role([MemberRole.OWNER, MemberRole.ADMIN], db, current_user, current_org, tenant)
 
 
 # ============================================
@@ -201,10 +276,14 @@ async def require_admin(
 
 async def get_organization_subscription(
     db: AsyncSession,
-    org: Organization
+    org: Organization,
+    tenant: Optional[TenantContext] = None
 ):
     """Get organization's subscription"""
-    subscription = await crud_subscription.get_subscription_by_org(db, org.id)
+    if tenant is not None and tenant.organization is org:
+        subscription = tenant.subscription
+    else:
+        subscription = await crud_subscription.get_subscription_by_org(db, org.id)
     if not subscription:
         # Create free subscription if doesn't exist
         subscription = await crud_subscription.create_subscription(
@@ -216,10 +295,11 @@ async def get_organization_subscription(
 async def require_plan(
     required_plans: List[PlanType],
     db: AsyncSession = Depends(get_db),
-    current_org: Organization = Depends(get_current_organization)
+    current_org: Organization = Depends(get_current_organization),
+    tenant: Optional[TenantContext] = None
 ):
     """Check if organization has required plan"""
-    subscription = await get_organization_subscription(db, current_org)
+    subscription = await get_organization_subscription(db, current_org, tenant)
     
     # Check if subscription is active
     if subscription.status not in [SubscriptionStatus.ACTIVE, SubscriptionStatus.TRIALING]:
@@ -241,18 +321,20 @@ async def require_plan(
 # Specific plan dependencies
 async def require_pro_plan(
     db: AsyncSession = Depends(get_db),
-    current_org: Organization = Depends(get_current_organization)
+    current_org: Organization = Depends(get_current_organization),
+    tenant: TenantContext = Depends(get_tenant_context)
 ):
     """Require Pro or Team plan"""
-    return await require_plan([PlanType.PRO, PlanType.TEAM], db, current_org)
+    return await require_plan([PlanType.PRO, PlanType.TEAM], db, current_org, tenant)
 
 
 async def require_team_plan(
     db: AsyncSession = Depends(get_db),
-    current_org: Organization = Depends(get_current_organization)
+    current_org: Organization = Depends(get_current_organization),
+    tenant: TenantContext = Depends(get_tenant_context)
 ):
     """Require Team plan"""
-    return await require_plan([PlanType.TEAM], db, current_org)
+    return await require_plan([PlanType.TEAM], db, current_org, tenant)
 
 
 # Decorator for plan requirements
@@ -15,6 +15,14 @@ async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
     # Startup
     logger.info("🚀 Starting FastAPI SaaS application...")
+    await init_http_clients()
+    init_password_hasher()
+    await init_tokenizer()
+    await init_redis()
+    usage_aggregator.start()
+    request_log_sink.start()
+    api_key_cache.start()
+    api_key_activity.start()
     logger.info("✅ Database connection pool initialized")
     logger.info("✅ Redis connection established")
     logger.info("✅ All services ready")
@@ -23,6 +31,16 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("👋 Shutting down application...")
+    # Streams first: generations finishing during their grace period still
+    # record usage through the aggregator and request log sink
+    await resumable_streams.stop()
+    await usage_aggregator.stop()
+    await request_log_sink.stop()
+    await api_key_activity.stop()
+    await api_key_cache.stop()
+    await close_http_clients()
+    shutdown_password_hasher()
+    await close_redis()
 
 
 # Import after lifespan to avoid circular imports
@@ -30,6 +48,15 @@ from app.core.config import settings
 from app.api.v1 import auth, users, organizations, apikeys, premium, ai, health
 from app.api.v1 import billing as billing_router
 from app.core.metrics import metrics_endpoint, MetricsMiddleware
+from app.core.http_client import init_http_clients, close_http_clients
+from app.core.redis_client import init_redis, close_redis
+from app.core.security import init_password_hasher, shutdown_password_hasher
+from app.core.tokenizer import init_tokenizer
+from app.services.usage_aggregator import usage_aggregator
+from app.services.request_log_sink import request_log_sink
+from app.services.api_key_activity import api_key_activity
+from app.core.api_key_cache import api_key_cache
+from app.services.stream_buffer import resumable_streams
 from app.admin.admin import setup_admin
 
 app = FastAPI(
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Date, BigInteger
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Date, BigInteger, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -7,6 +7,9 @@ from app.database import Base
 class AIUsage(Base):
     """Track AI usage per organization per day"""
     __tablename__ = "ai_usage"
+    __table_args__ = (
+        UniqueConstraint("organization_id", "model", "date", name="uq_ai_usage_org_model_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     organization_id = Column(Integer, ForeignKey("organizations.id", ondelete="CASCADE"), nullable=False)
@@ -34,8 +37,14 @@ class AIUsage(Base):
 
 
 class AIRequest(Base):
-    """Individual AI request log"""
+    """
+    Individual AI request log
+    
+    Range-partitioned by month on created_at (see migration 006); partitions
+    are created ahead of time and dropped for retention by Celery beat.
+    """
     __tablename__ = "ai_requests"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
     
     id = Column(Integer, primary_key=True, index=True)
     organization_id = Column(Integer, ForeignKey("organizations.id", ondelete="CASCADE"), nullable=False)
@@ -53,10 +62,11 @@ class AIRequest(Base):
     
     # Performance
     duration_ms = Column(Integer, nullable=True)  # milliseconds
-    status = Column(String, nullable=False)  # success, error, timeout
+    status = Column(String, nullable=False)  # success, error, timeout, cancelled, interrupted
     error_message = Column(String, nullable=True)
     
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Partition key, hence part of the primary key
+    created_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
     
     # Relationships
     organization = relationship("Organization")
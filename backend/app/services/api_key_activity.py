@@ -0,0 +1,70 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from app.core.config import settings
+from app.database import async_session_maker
+from app.crud import api_key as crud_api_key
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ApiKeyActivity:
+    """
+    Buffered `last_used_at` updates for API keys
+    
+    Authenticated requests only note the time per key in memory; the latest
+    time of every key used since the last flush is written in one batched
+    UPDATE every `flush_interval` seconds.
+    """
+    
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._last_used: Dict[int, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+    
+    def record(self, key_id: int):
+        """Note that a key was just used"""
+        self._last_used[key_id] = datetime.now(timezone.utc)
+        if self._task is None:
+            self.start()
+    
+    async def flush(self):
+        """Write buffered timestamps in one batch"""
+        if not self._last_used:
+            return
+        
+        last_used, self._last_used = self._last_used, {}
+        try:
+            async with async_session_maker() as db:
+                await crud_api_key.bulk_update_last_used(db, last_used)
+        except Exception as e:
+            logger.error(f"API key last_used_at flush failed, will retry: {e}")
+            # Keep the newest time per key
+            for key_id, used_at in last_used.items():
+                if key_id not in self._last_used:
+                    self._last_used[key_id] = used_at
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+    
+    def start(self):
+        """Start the periodic flush loop (called from lifespan)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the flush loop and write whatever is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+api_key_activity = ApiKeyActivity(flush_interval=settings.API_KEY_LAST_USED_FLUSH_SECONDS)
@@ -0,0 +1,100 @@
+import asyncio
+import hashlib
+import json
+from typing import Optional
+import redis.asyncio as aioredis
+from app.core.config import settings
+from app.core.redis_client import get_redis
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used with a different request body"""
+
+
+class IdempotencyInFlight(Exception):
+    """The original request is still running after the wait timeout"""
+
+
+def request_fingerprint(body: str) -> str:
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _key(org_id: int, idempotency_key: str) -> str:
+    digest = hashlib.sha256(idempotency_key.encode()).hexdigest()
+    return f"idempotency:{org_id}:{digest}"
+
+
+class IdempotencyService:
+    """
+    Idempotency-Key handling backed by Redis
+    
+    The first request with a key claims it ("in_flight", with a lock TTL
+    covering the provider call). Duplicates wait for it to finish and get
+    the stored response, kept for IDEMPOTENCY_TTL_SECONDS. A failed
+    request releases the key so the client can retry.
+    """
+    
+    @staticmethod
+    async def begin(org_id: int, idempotency_key: str, fingerprint: str) -> Optional[dict]:
+        """
+        Claim a key or fetch the stored response
+        
+        Returns None when the caller owns the key and must run the request,
+        otherwise the stored response. Redis errors fail open (the request
+        runs without idempotency).
+        """
+        key = _key(org_id, idempotency_key)
+        claim = json.dumps({"status": "in_flight", "fingerprint": fingerprint})
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.IDEMPOTENCY_WAIT_SECONDS
+        delay = 0.05
+        
+        try:
+            redis = get_redis()
+            while True:
+                if await redis.set(key, claim, nx=True, ex=settings.IDEMPOTENCY_LOCK_SECONDS):
+                    return None
+                
+                stored = await redis.get(key)
+                if stored is None:
+                    # Released or expired in between; try to claim it again
+                    continue
+                
+                record = json.loads(stored)
+                if record["fingerprint"] != fingerprint:
+                    raise IdempotencyKeyReused()
+                if record["status"] == "completed":
+                    return record["response"]
+                
+                if loop.time() >= deadline:
+                    raise IdempotencyInFlight()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.5)
+        
+        except (aioredis.RedisError, OSError) as e:
+            logger.warning(f"Idempotency store unavailable, running request: {e}")
+            return None
+    
+    @staticmethod
+    async def complete(org_id: int, idempotency_key: str, fingerprint: str, response: dict):
+        """Store the response of a claimed key"""
+        record = {"status": "completed", "fingerprint": fingerprint, "response": response}
+        try:
+            await get_redis().set(
+                _key(org_id, idempotency_key),
+                json.dumps(record),
+                ex=settings.IDEMPOTENCY_TTL_SECONDS
+            )
+        except (aioredis.RedisError, OSError) as e:
+            logger.warning(f"Failed to store idempotent response: {e}")
+    
+    @staticmethod
+    async def release(org_id: int, idempotency_key: str):
+        """Give a claimed key up after a failure so it can be retried"""
+        try:
+            await get_redis().delete(_key(org_id, idempotency_key))
+        except (aioredis.RedisError, OSError) as e:
+            logger.warning(f"Failed to release idempotency key: {e}")
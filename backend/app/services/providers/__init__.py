@@ -0,0 +1,41 @@
+from app.core.config import settings
+from app.services.providers.base import Provider, ProviderError, StreamItem, StreamTrailer
+from app.services.providers.openai_compat import OpenAICompatibleProvider
+from app.services.providers.anthropic import AnthropicProvider
+from app.services.providers.gemini import GeminiProvider
+
+# Gemini model ids are served by OpenRouter's free Gemma models unless
+# AI_GEMINI_BACKEND is "google"
+openrouter = OpenAICompatibleProvider("OpenRouter", "openrouter", {
+    "gemini-1.5-flash": "google/gemma-3n-e4b-it:free",
+    "gemini-1.5-pro": "google/gemma-3n-e4b-it:free",
+    "gemini-2.0-flash": "google/gemma-3n-e4b-it:free",
+})
+openai = OpenAICompatibleProvider("OpenAI", "openai", {})
+anthropic = AnthropicProvider("anthropic", {
+    "claude-3-haiku": "claude-3-haiku-20240307",
+})
+gemini = GeminiProvider("gemini", {})
+
+
+def get_provider(model: str) -> Provider:
+    """Provider serving one of our model ids"""
+    if model.startswith("gemini"):
+        return gemini if settings.AI_GEMINI_BACKEND == "google" else openrouter
+    elif model.startswith("claude"):
+        return anthropic
+    elif model.startswith("gpt"):
+        return openai
+    raise ValueError(f"Unsupported model: {model}")
+
+
+__all__ = [
+    "Provider",
+    "ProviderError",
+    "StreamItem",
+    "StreamTrailer",
+    "OpenAICompatibleProvider",
+    "AnthropicProvider",
+    "GeminiProvider",
+    "get_provider",
+]
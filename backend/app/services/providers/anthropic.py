@@ -0,0 +1,100 @@
+import json
+from typing import AsyncGenerator, List
+from app.core.sse import parse_sse
+from app.schemas.ai import Message
+from app.services.providers.base import Provider, ProviderError, StreamItem, StreamTrailer
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Anthropic stop reasons in OpenAI terms, as used everywhere else
+_FINISH_REASONS = {"end_turn": "stop", "stop_sequence": "stop", "max_tokens": "length"}
+
+
+class AnthropicProvider(Provider):
+    """Anthropic Messages API"""
+    
+    name = "Anthropic"
+    
+    def _payload(self, messages: List[Message], model: str, temperature: float, max_tokens: int) -> dict:
+        payload = {
+            "model": self.upstream_model(model),
+            # System prompts are a separate field, not a message role
+            "messages": [
+                {"role": m.role, "content": m.content}
+                for m in messages if m.role != "system"
+            ],
+            "temperature": min(temperature, 1.0),
+            "max_tokens": max_tokens,
+        }
+        system = "\n\n".join(m.content for m in messages if m.role == "system")
+        if system:
+            payload["system"] = system
+        return payload
+    
+    async def complete(self, messages, model, temperature, max_tokens) -> dict:
+        response = await self.client.post(
+            "/messages",
+            json=self._payload(messages, model, temperature, max_tokens)
+        )
+        if response.status_code != 200:
+            raise self.error(response.status_code, response.content)
+        
+        result = response.json()
+        usage = result.get("usage", {})
+        input_tokens = usage.get("input_tokens", 0)
+        output_tokens = usage.get("output_tokens", 0)
+        return {
+            "message": "".join(
+                block.get("text", "") for block in result.get("content", [])
+                if block.get("type") == "text"
+            ),
+            "usage": {
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+            "finish_reason": _FINISH_REASONS.get(result.get("stop_reason"), "stop"),
+        }
+    
+    async def stream(self, messages, model, temperature, max_tokens) -> AsyncGenerator[StreamItem, None]:
+        payload = self._payload(messages, model, temperature, max_tokens)
+        payload["stream"] = True
+        
+        async with self.client.stream("POST", "/messages", json=payload) as response:
+            if response.status_code != 200:
+                raise self.error(response.status_code, await response.aread())
+            
+            input_tokens = output_tokens = None
+            finish_reason = "stop"
+            async for event in parse_sse(response.aiter_lines()):
+                try:
+                    data = json.loads(event.data)
+                except ValueError:
+                    logger.error(f"Failed to parse SSE data: {event.data[:100]}")
+                    continue
+                
+                kind = data.get("type")
+                if kind == "content_block_delta":
+                    text = data.get("delta", {}).get("text")
+                    if text:
+                        yield text
+                elif kind == "message_start":
+                    input_tokens = data["message"].get("usage", {}).get("input_tokens")
+                elif kind == "message_delta":
+                    output_tokens = data.get("usage", {}).get("output_tokens", output_tokens)
+                    reason = data.get("delta", {}).get("stop_reason")
+                    finish_reason = _FINISH_REASONS.get(reason, finish_reason)
+                elif kind == "message_stop":
+                    break
+                elif kind == "error":
+                    raise ProviderError(f"Anthropic stream error: {data.get('error', {}).get('message', data)}")
+            
+            usage = None
+            if input_tokens is not None and output_tokens is not None:
+                usage = {
+                    "input_tokens": input_tokens,
+                    "output_tokens": output_tokens,
+                    "total_tokens": input_tokens + output_tokens,
+                }
+            yield StreamTrailer(usage, finish_reason)
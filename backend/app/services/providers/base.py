@@ -0,0 +1,82 @@
+import json
+from abc import ABC, abstractmethod
+from typing import AsyncGenerator, Dict, List, NamedTuple, Optional, Union
+import httpx
+from app.core.http_client import get_http_client
+from app.schemas.ai import Message
+
+
+class StreamTrailer(NamedTuple):
+    """Last item of a stream: what the provider reported about it"""
+    usage: Optional[dict]  # input/output/total_tokens, None if not reported
+    finish_reason: str
+
+
+class ProviderError(Exception):
+    """The provider rejected or failed the request"""
+    
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+StreamItem = Union[str, StreamTrailer]
+
+
+class Provider(ABC):
+    """
+    One upstream API
+    
+    Subclasses implement `complete` (one response) and `stream` (text
+    chunks as they are generated, then a StreamTrailer), both through the
+    pooled HTTP client named `client_name`. `model_map` translates our
+    model ids to the provider's.
+    """
+    
+    name = "provider"
+    
+    def __init__(self, client_name: str, model_map: Dict[str, str]):
+        self.client_name = client_name
+        self.model_map = model_map
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return get_http_client(self.client_name)
+    
+    def upstream_model(self, model: str) -> str:
+        return self.model_map.get(model, model)
+    
+    def error(self, status_code: int, body: bytes) -> ProviderError:
+        """ProviderError for a non-200 response"""
+        if status_code == 429:
+            return ProviderError(
+                "Rate limit exceeded. The AI service has reached its daily limit. "
+                "Please try again later or contact support.",
+                status_code
+            )
+        try:
+            error = json.loads(body).get("error", {})
+            message = error.get("message", str(error)) if isinstance(error, dict) else str(error)
+        except (ValueError, AttributeError):
+            message = body.decode(errors="replace")[:200]
+        return ProviderError(f"{self.name} API error ({status_code}): {message}", status_code)
+    
+    @abstractmethod
+    async def complete(
+        self,
+        messages: List[Message],
+        model: str,
+        temperature: float,
+        max_tokens: int
+    ) -> dict:
+        """{"message", "usage", "finish_reason"} of a full completion"""
+    
+    @abstractmethod
+    def stream(
+        self,
+        messages: List[Message],
+        model: str,
+        temperature: float,
+        max_tokens: int
+    ) -> AsyncGenerator[StreamItem, None]:
+        """Text chunks as they arrive, then a StreamTrailer"""
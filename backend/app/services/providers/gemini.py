@@ -0,0 +1,97 @@
+import json
+from typing import AsyncGenerator, List
+from app.core.sse import parse_sse
+from app.schemas.ai import Message
+from app.services.providers.base import Provider, ProviderError, StreamItem, StreamTrailer
+import logging
+
+logger = logging.getLogger(__name__)
+
+_FINISH_REASONS = {"STOP": "stop", "MAX_TOKENS": "length", "SAFETY": "content_filter"}
+
+
+def _usage(metadata: dict) -> dict:
+    return {
+        "input_tokens": metadata.get("promptTokenCount", 0),
+        "output_tokens": metadata.get("candidatesTokenCount", 0),
+        "total_tokens": metadata.get("totalTokenCount", 0),
+    }
+
+
+def _text(response: dict) -> str:
+    candidates = response.get("candidates") or [{}]
+    parts = candidates[0].get("content", {}).get("parts", [])
+    return "".join(part.get("text", "") for part in parts)
+
+
+class GeminiProvider(Provider):
+    """Google Gemini API (generateContent / streamGenerateContent)"""
+    
+    name = "Gemini"
+    
+    def _payload(self, messages: List[Message], temperature: float, max_tokens: int) -> dict:
+        payload = {
+            "contents": [
+                {"role": "model" if m.role == "assistant" else "user", "parts": [{"text": m.content}]}
+                for m in messages if m.role != "system"
+            ],
+            "generationConfig": {"temperature": temperature, "maxOutputTokens": max_tokens},
+        }
+        system = "\n\n".join(m.content for m in messages if m.role == "system")
+        if system:
+            payload["systemInstruction"] = {"parts": [{"text": system}]}
+        return payload
+    
+    def _finish_reason(self, response: dict, default: str) -> str:
+        candidates = response.get("candidates") or [{}]
+        reason = candidates[0].get("finishReason")
+        return _FINISH_REASONS.get(reason, default) if reason else default
+    
+    async def complete(self, messages, model, temperature, max_tokens) -> dict:
+        response = await self.client.post(
+            f"/models/{self.upstream_model(model)}:generateContent",
+            json=self._payload(messages, temperature, max_tokens)
+        )
+        if response.status_code != 200:
+            raise self.error(response.status_code, response.content)
+        
+        result = response.json()
+        if not result.get("candidates"):
+            raise ProviderError(f"Invalid API response: {json.dumps(result)}")
+        
+        return {
+            "message": _text(result),
+            "usage": _usage(result.get("usageMetadata", {})),
+            "finish_reason": self._finish_reason(result, "stop"),
+        }
+    
+    async def stream(self, messages, model, temperature, max_tokens) -> AsyncGenerator[StreamItem, None]:
+        async with self.client.stream(
+            "POST",
+            f"/models/{self.upstream_model(model)}:streamGenerateContent",
+            params={"alt": "sse"},
+            json=self._payload(messages, temperature, max_tokens),
+        ) as response:
+            if response.status_code != 200:
+                raise self.error(response.status_code, await response.aread())
+            
+            usage = None
+            finish_reason = "stop"
+            async for event in parse_sse(response.aiter_lines()):
+                try:
+                    chunk = json.loads(event.data)
+                except ValueError:
+                    logger.error(f"Failed to parse SSE data: {event.data[:100]}")
+                    continue
+                
+                if chunk.get("error"):
+                    raise ProviderError(f"Gemini stream error: {chunk['error'].get('message', chunk['error'])}")
+                # Usage metadata is cumulative; the last chunk has the totals
+                if chunk.get("usageMetadata"):
+                    usage = _usage(chunk["usageMetadata"])
+                finish_reason = self._finish_reason(chunk, finish_reason)
+                text = _text(chunk)
+                if text:
+                    yield text
+            
+            yield StreamTrailer(usage, finish_reason)
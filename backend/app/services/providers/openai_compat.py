@@ -0,0 +1,84 @@
+import json
+from typing import AsyncGenerator, List
+from app.core.sse import parse_sse
+from app.schemas.ai import Message
+from app.services.providers.base import Provider, ProviderError, StreamItem, StreamTrailer
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _usage(usage: dict) -> dict:
+    return {
+        "input_tokens": usage.get("prompt_tokens", 0),
+        "output_tokens": usage.get("completion_tokens", 0),
+        "total_tokens": usage.get("total_tokens", 0),
+    }
+
+
+class OpenAICompatibleProvider(Provider):
+    """Chat Completions API (OpenAI, OpenRouter and compatible gateways)"""
+    
+    def __init__(self, name: str, client_name: str, model_map: dict):
+        super().__init__(client_name, model_map)
+        self.name = name
+    
+    def _payload(self, messages: List[Message], model: str, temperature: float, max_tokens: int) -> dict:
+        return {
+            "model": self.upstream_model(model),
+            "messages": [{"role": m.role, "content": m.content} for m in messages],
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+    
+    async def complete(self, messages, model, temperature, max_tokens) -> dict:
+        response = await self.client.post(
+            "/chat/completions",
+            json=self._payload(messages, model, temperature, max_tokens)
+        )
+        if response.status_code != 200:
+            raise self.error(response.status_code, response.content)
+        
+        result = response.json()
+        if not result.get("choices"):
+            raise ProviderError(f"Invalid API response: {json.dumps(result)}")
+        
+        return {
+            "message": result["choices"][0]["message"]["content"],
+            "usage": _usage(result.get("usage", {})),
+            "finish_reason": result["choices"][0].get("finish_reason") or "stop",
+        }
+    
+    async def stream(self, messages, model, temperature, max_tokens) -> AsyncGenerator[StreamItem, None]:
+        payload = self._payload(messages, model, temperature, max_tokens)
+        payload["stream"] = True
+        # Usage arrives in a final chunk with empty choices
+        payload["stream_options"] = {"include_usage": True}
+        
+        async with self.client.stream("POST", "/chat/completions", json=payload) as response:
+            if response.status_code != 200:
+                raise self.error(response.status_code, await response.aread())
+            
+            usage = None
+            finish_reason = "stop"
+            async for event in parse_sse(response.aiter_lines()):
+                if event.data == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(event.data)
+                except ValueError:
+                    logger.error(f"Failed to parse SSE data: {event.data[:100]}")
+                    continue
+                
+                if chunk.get("error"):
+                    raise ProviderError(f"{self.name} stream error: {chunk['error'].get('message', chunk['error'])}")
+                if chunk.get("usage"):
+                    usage = _usage(chunk["usage"])
+                if chunk.get("choices"):
+                    choice = chunk["choices"][0]
+                    finish_reason = choice.get("finish_reason") or finish_reason
+                    content = (choice.get("delta") or {}).get("content")
+                    if content:
+                        yield content
+            
+            yield StreamTrailer(usage, finish_reason)
@@ -0,0 +1,179 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import List, Optional
+from app.core.config import settings
+from app.core.metrics import ai_request_logs_dropped_total
+from app.database import async_session_maker
+from app.crud import ai_usage as crud_ai_usage
+import logging
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+
+class RequestLogSink:
+    """
+    Background writer for AIRequest log rows
+
+    Requests enqueue a plain dict and return immediately; a background task
+    bulk-inserts up to `batch_size` rows per round trip, at least every
+    `flush_interval` seconds. The queue is bounded by `max_queue`; when it
+    is full, `overflow_policy` decides whether to drop the oldest row, drop
+    the new row, or make the caller wait.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        flush_interval: float,
+        max_queue: int,
+        overflow_policy: str = "drop_oldest"
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        # Dequeued by the writer but not yet written
+        self._batch: List[dict] = []
+
+    async def submit(
+        self,
+        org_id: int,
+        user_id: Optional[int],
+        model: str,
+        input_tokens: int,
+        output_tokens: int,
+        duration_ms: int,
+        status: str = "success",
+        error_message: Optional[str] = None
+    ):
+        """Queue one request log entry"""
+        record = {
+            "organization_id": org_id,
+            "user_id": user_id,
+            "model": model,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "duration_ms": duration_ms,
+            "status": status,
+            "error_message": error_message,
+            # Stamped now, not at flush time
+            "created_at": datetime.now(timezone.utc),
+        }
+
+        if self._task is None:
+            self.start()
+
+        if self.overflow_policy == "block":
+            await self._queue.put(record)
+            return
+
+        if self._queue.full():
+            ai_request_logs_dropped_total.labels(policy=self.overflow_policy).inc()
+            if self.overflow_policy == "drop_newest":
+                return
+            self._queue.get_nowait()
+
+        self._queue.put_nowait(record)
+
+    async def _next_batch(self):
+        """
+        Wait for the first row, then collect up to batch_size rows
+
+        Rows are collected on `self._batch` rather than a local, so a stop()
+        that cancels the writer mid-collection still writes them.
+        """
+        self._batch.append(await self._queue.get())
+        deadline = asyncio.get_running_loop().time() + self.flush_interval
+
+        while len(self._batch) < self.batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            if not self._queue.empty():
+                self._batch.append(self._queue.get_nowait())
+                continue
+            # Not wait_for: it can swallow a cancel that races with the get,
+            # losing the row and leaving the writer blocked
+            getter = asyncio.ensure_future(self._queue.get())
+            try:
+                await asyncio.wait({getter}, timeout=timeout)
+            finally:
+                if getter.done():
+                    self._batch.append(getter.result())
+                else:
+                    getter.cancel()
+            if not getter.done():
+                break
+
+    def _requeue(self, batch: List[dict]):
+        """Hand rows back for the next flush, as far as the queue has room"""
+        dropped = 0
+        for record in batch:
+            if self._queue.full():
+                dropped += 1
+            else:
+                self._queue.put_nowait(record)
+        if dropped:
+            logger.warning(f"Dropped {dropped} AI request logs: queue full after a failed write")
+
+    async def _write(self, batch: List[dict]) -> bool:
+        """Insert one batch; on failure the rows are re-queued"""
+        try:
+            async with async_session_maker() as db:
+                await crud_ai_usage.bulk_insert_requests(db, batch)
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} AI request logs, will retry: {e}")
+            self._requeue(batch)
+            return False
+        return True
+
+    async def _run(self):
+        while True:
+            await self._next_batch()
+            # The batch stays on self._batch while in flight, so a cancelled
+            # write is retried by the final drain
+            written = await self._write(self._batch)
+            self._batch = []
+            if not written:
+                await asyncio.sleep(self.flush_interval)
+
+    async def drain(self):
+        """Write everything dequeued or queued, until a write fails"""
+        batch, self._batch = self._batch, []
+        while batch or not self._queue.empty():
+            while not self._queue.empty() and len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+            if not await self._write(batch):
+                return
+            batch = []
+
+    def start(self):
+        """Start the background writer (called from lifespan)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the writer and flush whatever is still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.drain()
+
+
+request_log_sink = RequestLogSink(
+    batch_size=settings.REQUEST_LOG_BATCH_SIZE,
+    flush_interval=settings.REQUEST_LOG_FLUSH_INTERVAL_SECONDS,
+    max_queue=settings.REQUEST_LOG_MAX_QUEUE,
+    overflow_policy=settings.REQUEST_LOG_OVERFLOW_POLICY
+)
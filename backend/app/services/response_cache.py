@@ -0,0 +1,168 @@
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Iterator, List, Optional, Tuple
+import redis.asyncio as aioredis
+from app.core.config import settings
+from app.core.metrics import ai_response_cache_hits_total, ai_response_cache_misses_total
+from app.core.redis_client import get_redis
+from app.schemas.ai import ChatRequest, Message
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bump when the cached payload or the key layout changes
+KEY_VERSION = "v1"
+
+
+def is_cacheable(request: ChatRequest) -> bool:
+    """Only deterministic requests are cached, and only when enabled"""
+    return settings.AI_RESPONSE_CACHE_ENABLED and request.temperature == 0
+
+
+def cache_directives(cache_control: Optional[str]) -> Tuple[bool, bool]:
+    """
+    (read, write) for a request's Cache-Control header
+    
+    `no-cache` asks for a fresh answer (which is still stored), `no-store`
+    keeps the cache out of the request entirely.
+    """
+    directives = {d.strip().lower() for d in (cache_control or "").split(",")}
+    no_store = "no-store" in directives
+    return not (no_store or "no-cache" in directives), not no_store
+
+
+def request_digest(
+    messages: List[Message],
+    model: str,
+    max_tokens: int,
+    temperature: float
+) -> str:
+    """Hash of a canonical encoding of everything that shapes the answer"""
+    canonical = json.dumps(
+        {
+            "model": model,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "messages": [{"role": m.role, "content": m.content} for m in messages],
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def request_key(org_id: int, request: ChatRequest) -> str:
+    """Response cache key of a request, scoped to the organization"""
+    digest = request_digest(
+        request.messages, request.model, request.max_tokens, request.temperature
+    )
+    return f"ai_response_cache:{KEY_VERSION}:{org_id}:{digest}"
+
+
+def replay_chunks(text: str, size: int = 64) -> Iterator[str]:
+    """Split cached text into stream-sized pieces on word boundaries"""
+    chunk = ""
+    for word in re.findall(r"\s*\S+\s*|\s+", text):
+        chunk += word
+        if len(chunk) >= size:
+            yield chunk
+            chunk = ""
+    if chunk:
+        yield chunk
+
+
+class ResponseCache:
+    """
+    Two-tier cache of chat completions
+    
+    Each worker keeps recent entries in an LRU bounded by their encoded
+    size; misses fall through to Redis, shared by all workers, where
+    entries live for `ttl` seconds. Keys are scoped per organization.
+    Cached answers never change, so there is nothing to invalidate; Redis
+    errors are treated as misses.
+    """
+    
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+    
+    def _get_local(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, payload = entry
+        if expires < time.monotonic():
+            self._pop_local(key)
+            return None
+        self._entries.move_to_end(key)
+        return payload
+    
+    def _put_local(self, key: str, payload: str, ttl: float):
+        size = len(payload.encode())
+        if size > self.max_bytes:
+            return
+        self._pop_local(key)
+        self._entries[key] = (time.monotonic() + ttl, payload)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            self._bytes -= len(self._entries.popitem(last=False)[1][1].encode())
+    
+    def _pop_local(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1].encode())
+    
+    async def get(self, key: str) -> Optional[dict]:
+        """Cached {"message", "usage", "finish_reason"} or None"""
+        payload = self._get_local(key)
+        if payload is not None:
+            ai_response_cache_hits_total.labels(tier="local").inc()
+            return json.loads(payload)
+        
+        try:
+            async with get_redis().pipeline(transaction=False) as pipe:
+                pipe.get(key)
+                pipe.ttl(key)
+                payload, ttl = await pipe.execute()
+        except (aioredis.RedisError, OSError) as e:
+            logger.warning(f"Response cache read failed: {e}")
+            payload = None
+        
+        if payload is None:
+            ai_response_cache_misses_total.inc()
+            return None
+        
+        # Don't let the local copy outlive the shared one
+        self._put_local(key, payload, ttl if ttl > 0 else self.ttl)
+        ai_response_cache_hits_total.labels(tier="redis").inc()
+        return json.loads(payload)
+    
+    async def set(self, key: str, result: dict):
+        """Store a completion's message, usage and finish reason"""
+        payload = json.dumps({
+            "message": result["message"],
+            "usage": result["usage"],
+            "finish_reason": result["finish_reason"],
+        })
+        self._put_local(key, payload, self.ttl)
+        try:
+            await get_redis().set(key, payload, ex=int(self.ttl))
+        except (aioredis.RedisError, OSError) as e:
+            logger.warning(f"Response cache write failed: {e}")
+    
+    def clear(self):
+        """Drop this worker's local entries"""
+        self._entries.clear()
+        self._bytes = 0
+
+
+response_cache = ResponseCache(
+    max_bytes=settings.AI_RESPONSE_CACHE_LOCAL_MAX_BYTES,
+    ttl=settings.AI_RESPONSE_CACHE_TTL_SECONDS
+)
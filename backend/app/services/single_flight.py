@@ -0,0 +1,187 @@
+import asyncio
+import json
+import uuid
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+import redis.asyncio as aioredis
+from app.core.config import settings
+from app.core.metrics import ai_single_flight_coalesced_total
+from app.core.redis_client import get_redis
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Broadcast:
+    """One upstream stream and the chunks it has produced so far"""
+    
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+    
+    def _notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+    
+    async def pump(self, source: AsyncIterator[str]):
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight provider calls
+    
+    The first caller for a key starts the upstream call as its own task;
+    callers arriving while it runs await the same task instead of making
+    another request. Streams are fanned out: every subscriber gets all
+    chunks from the start, including ones produced before it joined.
+    
+    The shared task outlives a caller that goes away, so one disconnect
+    doesn't fail the others; a stream is only cancelled once its last
+    subscriber has left. With AI_SINGLE_FLIGHT_CROSS_WORKER, completions
+    are also coalesced across workers through a Redis lock.
+    """
+    
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._streams: Dict[str, _Broadcast] = {}
+    
+    async def do(self, key: str, fn: Callable[[], Awaitable[dict]]) -> dict:
+        """Result of `fn()`, shared with identical concurrent calls"""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(self._run(key, fn))
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget_call(key, t))
+        else:
+            ai_single_flight_coalesced_total.labels(kind="completion", scope="local").inc()
+        
+        return await asyncio.shield(task)
+    
+    def _forget_call(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Retrieved here so an unawaited failure isn't logged as lost
+            task.exception()
+    
+    async def _run(self, key: str, fn: Callable[[], Awaitable[dict]]) -> dict:
+        if not settings.AI_SINGLE_FLIGHT_CROSS_WORKER:
+            return await fn()
+        return await self._run_across_workers(key, fn)
+    
+    async def _run_across_workers(self, key: str, fn: Callable[[], Awaitable[dict]]) -> dict:
+        """
+        Leader election through a Redis lock
+        
+        The lock holds the leader's token; the leader publishes its result
+        under that token for waiters on other workers. A waiter that sees
+        the lock disappear without a result (the leader failed) tries to
+        take over. Redis errors fall back to calling the provider directly.
+        """
+        lock_key = f"single_flight:lock:{key}"
+        token = uuid.uuid4().hex
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.AI_SINGLE_FLIGHT_LOCK_SECONDS
+        delay = 0.05
+        
+        owner = None
+        
+        try:
+            redis = get_redis()
+            while True:
+                # The last leader seen may have finished (and released the
+                # lock) since; its result outlives the lock for a while
+                if owner is not None:
+                    stored = await redis.get(f"single_flight:result:{owner}")
+                    if stored is not None:
+                        ai_single_flight_coalesced_total.labels(kind="completion", scope="redis").inc()
+                        return json.loads(stored)
+                
+                if await redis.set(lock_key, token, nx=True, ex=settings.AI_SINGLE_FLIGHT_LOCK_SECONDS):
+                    break
+                owner = await redis.get(lock_key) or owner
+                
+                if loop.time() >= deadline:
+                    return await fn()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.5)
+        
+        except (aioredis.RedisError, OSError) as e:
+            logger.warning(f"Single-flight lock unavailable, calling provider: {e}")
+            return await fn()
+        
+        try:
+            result = await fn()
+            try:
+                await redis.set(
+                    f"single_flight:result:{token}",
+                    json.dumps(result),
+                    ex=settings.AI_SINGLE_FLIGHT_RESULT_TTL_SECONDS
+                )
+            except (aioredis.RedisError, OSError) as e:
+                logger.warning(f"Failed to publish single-flight result: {e}")
+            return result
+        
+        finally:
+            try:
+                # Only release our own lock; it may have expired and been retaken
+                if await redis.get(lock_key) == token:
+                    await redis.delete(lock_key)
+            except (aioredis.RedisError, OSError) as e:
+                logger.warning(f"Failed to release single-flight lock: {e}")
+    
+    async def stream(
+        self,
+        key: str,
+        factory: Callable[[], AsyncIterator[str]]
+    ) -> AsyncIterator[str]:
+        """Chunks of `factory()`, shared with identical concurrent streams"""
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast()
+            self._streams[key] = broadcast
+            broadcast.task = asyncio.create_task(broadcast.pump(factory()))
+            broadcast.task.add_done_callback(lambda _: self._forget_stream(key, broadcast))
+        else:
+            ai_single_flight_coalesced_total.labels(kind="stream", scope="local").inc()
+        
+        broadcast.subscribers += 1
+        try:
+            sent = 0
+            while True:
+                changed = broadcast.changed
+                while sent < len(broadcast.chunks):
+                    yield broadcast.chunks[sent]
+                    sent += 1
+                
+                if broadcast.done:
+                    if broadcast.error is not None:
+                        raise broadcast.error
+                    return
+                await changed.wait()
+        
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.done:
+                # Nobody is listening any more
+                self._forget_stream(key, broadcast)
+                broadcast.task.cancel()
+    
+    def _forget_stream(self, key: str, broadcast: _Broadcast):
+        if self._streams.get(key) is broadcast:
+            del self._streams[key]
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,255 @@
+import asyncio
+import uuid
+from typing import AsyncGenerator, AsyncIterator, List, Optional, Set, Tuple
+import redis.asyncio as aioredis
+from app.core.config import settings
+from app.core.sse import encode_batch, encode_event
+from app.core.redis_client import get_redis
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Field of the entry that closes a generation. Entries carry explicit ids
+# "0-<seq>", so a gap left by trimming shows up as a jump in seq.
+_END = "end"
+
+
+class StreamNotFound(Exception):
+    """The generation is unknown, expired or belongs to another organization"""
+
+
+def parse_last_event_id(value: str) -> Optional[Tuple[str, int]]:
+    """(generation_id, seq) from a Last-Event-ID header, None if malformed"""
+    generation_id, _, seq = value.strip().partition(":")
+    if not generation_id or not seq.isdigit():
+        return None
+    return generation_id, int(seq)
+
+
+def _stream_key(org_id: int, generation_id: str) -> str:
+    return f"ai_stream:{org_id}:{generation_id}"
+
+
+def _attached_key(stream_key: str) -> str:
+    """Refreshed by readers of a resumed stream, on whichever worker"""
+    return f"{stream_key}:attached"
+
+
+class Generation:
+    """
+    One streamed generation, teed into a Redis Stream
+    
+    Payloads (text chunks, "[DONE]", "[ERROR] ...") are numbered from 1 and
+    appended to `ai_stream:{org}:{generation}`, capped at
+    AI_STREAM_BUFFER_MAX_CHUNKS entries and expiring
+    AI_STREAM_BUFFER_TTL_SECONDS after the last write. Payloads produced
+    while a write is in flight go out together in the next pipeline. The
+    client that started it reads them from a local queue; a reconnect reads
+    the buffer.
+    
+    Once nobody has been reading for AI_STREAM_RESUME_GRACE_SECONDS, the
+    generation is cancelled, which closes the upstream request, and
+    `abandoned` is set so the source can tell this from a shutdown.
+    """
+    
+    def __init__(self, org_id: int):
+        self.generation_id = uuid.uuid4().hex
+        self.key = _stream_key(org_id, self.generation_id)
+        self._queue: "asyncio.Queue[Optional[Tuple[int, str]]]" = asyncio.Queue()
+        self._buffered = True
+        self._pending: List[Tuple[int, dict]] = []
+        self._writer: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[asyncio.Task] = None
+        self.abandoned = False
+    
+    def _append(self, seq: int, fields: dict):
+        if not self._buffered:
+            return
+        self._pending.append((seq, fields))
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write())
+    
+    async def _write(self):
+        while self._pending and self._buffered:
+            batch, self._pending = self._pending, []
+            try:
+                async with get_redis().pipeline(transaction=False) as pipe:
+                    for seq, fields in batch:
+                        pipe.xadd(
+                            self.key, fields, id=f"0-{seq}",
+                            maxlen=settings.AI_STREAM_BUFFER_MAX_CHUNKS, approximate=False
+                        )
+                    pipe.expire(self.key, settings.AI_STREAM_BUFFER_TTL_SECONDS)
+                    await pipe.execute()
+            except (aioredis.RedisError, OSError) as e:
+                # The live client is unaffected; this generation just can't be resumed
+                logger.warning(f"Stream buffer write failed, {self.generation_id} not resumable: {e}")
+                self._buffered = False
+    
+    async def _run(self, source: AsyncGenerator[str, None]):
+        seq = 0
+        try:
+            async for payload in source:
+                seq += 1
+                self._append(seq, {"data": payload})
+                self._queue.put_nowait((seq, payload))
+        finally:
+            # Close the source now even if we were cancelled between chunks
+            await source.aclose()
+            self._append(seq + 1, {_END: "1"})
+            if self._writer is not None:
+                await self._writer
+            self._queue.put_nowait(None)
+    
+    async def events(self) -> AsyncIterator[str]:
+        """
+        SSE frames for the client that started the generation
+        
+        After the first frame, chunks arriving within AI_STREAM_COALESCE_MS
+        are written together (merged into events of up to
+        AI_STREAM_COALESCE_MAX_BYTES), so a fast stream costs one send per
+        window instead of one per token.
+        """
+        window = settings.AI_STREAM_COALESCE_MS / 1000
+        max_bytes = settings.AI_STREAM_COALESCE_MAX_BYTES if window > 0 else 0
+        finished = False
+        first = True
+        try:
+            while not finished:
+                items = [await self._queue.get()]
+                if window > 0 and not first and items[0] is not None:
+                    await asyncio.sleep(window)
+                while not self._queue.empty():
+                    items.append(self._queue.get_nowait())
+                first = False
+                
+                if items[-1] is None:
+                    finished = True
+                    items.pop()
+                if items:
+                    yield encode_batch(
+                        ((payload, f"{self.generation_id}:{seq}") for seq, payload in items),
+                        max_bytes
+                    )
+        
+        finally:
+            # Runs when Starlette sees http.disconnect and cancels the response
+            if not finished and self._task is not None and not self._task.done():
+                self._watchdog = asyncio.create_task(self._cancel_when_abandoned())
+    
+    async def _cancel_when_abandoned(self):
+        """Cancel the generation unless a resumed reader keeps it attached"""
+        grace = settings.AI_STREAM_RESUME_GRACE_SECONDS
+        while True:
+            await asyncio.wait({self._task}, timeout=grace)
+            if self._task.done():
+                return
+            try:
+                attached = self._buffered and await get_redis().exists(_attached_key(self.key))
+            except (aioredis.RedisError, OSError):
+                attached = False
+            if not attached:
+                logger.info(f"Stream {self.generation_id} abandoned, cancelling generation")
+                self.abandoned = True
+                self._task.cancel()
+                return
+
+
+class ResumableStreams:
+    """
+    Runs streamed generations independently of the client connection
+    
+    A generation is consumed to the end by a background task, even when
+    the client that started it has gone, so a reconnect with Last-Event-ID
+    (on any worker) can pick up the rest from Redis instead of paying for
+    a second generation.
+    """
+    
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+    
+    def start(self, org_id: int, source: AsyncGenerator[str, None]) -> Generation:
+        """Start consuming `source` in the background"""
+        generation = Generation(org_id)
+        task = asyncio.create_task(generation._run(source))
+        generation._task = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return generation
+    
+    async def resume(self, org_id: int, last_event_id: str) -> AsyncIterator[str]:
+        """
+        SSE frames after `last_event_id`, read from the buffer
+        
+        Raises StreamNotFound before anything is sent if the generation
+        can't be resumed. Ends with an "[ERROR]" frame if entries the
+        client hasn't seen were already trimmed from the buffer.
+        """
+        parsed = parse_last_event_id(last_event_id)
+        if parsed is None:
+            raise StreamNotFound()
+        generation_id, seq = parsed
+        key = _stream_key(org_id, generation_id)
+        
+        try:
+            if not await get_redis().exists(key):
+                raise StreamNotFound()
+        except (aioredis.RedisError, OSError) as e:
+            logger.warning(f"Stream buffer unavailable, can't resume: {e}")
+            raise StreamNotFound()
+        
+        return self._read(key, generation_id, seq)
+    
+    async def _read(self, key: str, generation_id: str, seq: int) -> AsyncIterator[str]:
+        redis = get_redis()
+        grace = settings.AI_STREAM_RESUME_GRACE_SECONDS
+        # Wake up often enough to keep the generation attached
+        block_ms = max(1, min(settings.AI_STREAM_RESUME_BLOCK_MS, int(grace * 500)))
+        while True:
+            try:
+                await redis.set(_attached_key(key), "1", ex=max(1, int(grace)))
+                response = await redis.xread({key: f"0-{seq}"}, count=100, block=block_ms)
+            except (aioredis.RedisError, OSError) as e:
+                logger.warning(f"Stream buffer read failed: {e}")
+                yield encode_event("[ERROR] Stream interrupted, please retry")
+                return
+            
+            if not response:
+                if not await redis.exists(key):
+                    yield encode_event("[ERROR] Stream expired")
+                    return
+                # Keep the connection alive while the generation is slow
+                yield ": keep-alive\n\n"
+                continue
+            
+            batch = []
+            ended = False
+            for entry_id, fields in response[0][1]:
+                entry_seq = int(entry_id.split("-")[1])
+                if entry_seq != seq + 1:
+                    batch.append(("[ERROR] Stream buffer no longer holds this position", None))
+                    ended = True
+                    break
+                seq = entry_seq
+                if _END in fields:
+                    ended = True
+                    break
+                batch.append((fields["data"], f"{generation_id}:{seq}"))
+            
+            if batch:
+                yield encode_batch(batch, settings.AI_STREAM_COALESCE_MAX_BYTES)
+            if ended:
+                return
+    
+    async def stop(self, timeout: float = 10.0):
+        """Give running generations a moment to finish, then cancel them"""
+        if not self._tasks:
+            return
+        _, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+resumable_streams = ResumableStreams()
@@ -0,0 +1,131 @@
+import asyncio
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.database import async_session_maker
+from app.crud import ai_usage as crud_ai_usage
+from app.services.usage_summary_cache import invalidate_usage_summaries
+import logging
+
+logger = logging.getLogger(__name__)
+
+UsageKey = Tuple[int, str, date]  # (organization_id, model, date)
+
+
+class UsageAggregator:
+    """
+    Write-behind buffer for the daily AIUsage rollups
+
+    Requests only add deltas to an in-process dict keyed by
+    (org, model, date). The buffer is written with one batched
+    INSERT ... ON CONFLICT DO UPDATE every `flush_interval` seconds, or
+    sooner once `max_events` requests have been buffered.
+    """
+
+    def __init__(self, flush_interval: float, max_events: int):
+        self.flush_interval = flush_interval
+        self.max_events = max_events
+        self._deltas: Dict[UsageKey, List[int]] = {}
+        self._events = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    def add(
+        self,
+        org_id: int,
+        model: str,
+        input_tokens: int,
+        output_tokens: int,
+        cost_cents: int,
+        messages: int = 1
+    ):
+        """Buffer usage of one request"""
+        key = (org_id, model, date.today())
+        delta = self._deltas.get(key)
+        if delta is None:
+            delta = self._deltas[key] = [0, 0, 0, 0, 0]
+
+        delta[0] += messages
+        delta[1] += input_tokens
+        delta[2] += output_tokens
+        delta[3] += input_tokens + output_tokens
+        delta[4] += cost_cents
+
+        self._events += 1
+        if self._task is None:
+            self.start()
+        if self._events >= self.max_events:
+            self._wakeup.set()
+
+    def _merge(self, deltas: Dict[UsageKey, List[int]]):
+        """Put deltas back into the buffer (after a failed flush)"""
+        for key, values in deltas.items():
+            current = self._deltas.setdefault(key, [0, 0, 0, 0, 0])
+            for i, value in enumerate(values):
+                current[i] += value
+
+    async def flush(self):
+        """Write all buffered deltas in one UPSERT"""
+        async with self._flush_lock:
+            if not self._deltas:
+                return
+
+            deltas, self._deltas = self._deltas, {}
+            self._events = 0
+
+            rows = [
+                {
+                    "organization_id": org_id,
+                    "model": model,
+                    "date": usage_date,
+                    **dict(zip(crud_ai_usage.USAGE_COUNTER_COLUMNS, values)),
+                }
+                for (org_id, model, usage_date), values in deltas.items()
+            ]
+
+            try:
+                async with async_session_maker() as db:
+                    await crud_ai_usage.upsert_usage_deltas(db, rows)
+            except asyncio.CancelledError:
+                self._merge(deltas)
+                raise
+            except Exception as e:
+                logger.error(f"Usage flush failed, will retry: {e}")
+                self._merge(deltas)
+                return
+            
+            await invalidate_usage_summaries(
+                (org_id, usage_date) for org_id, _, usage_date in deltas
+            )
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        """Start the periodic flush loop (called from lifespan)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write whatever is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+usage_aggregator = UsageAggregator(
+    flush_interval=settings.USAGE_FLUSH_INTERVAL_SECONDS,
+    max_events=settings.USAGE_FLUSH_MAX_EVENTS
+)
@@ -0,0 +1,101 @@
+from typing import Optional
+from app.core.ai_config import calculate_cost
+from app.core.config import settings
+from app.core.rate_limiter import RateLimiter
+from app.services.usage_aggregator import usage_aggregator
+from app.services.request_log_sink import request_log_sink
+
+
+class UsageService:
+    """
+    Records AI usage after a request has finished
+
+    Nothing here touches the request's DB session: counters go to Redis and
+    the rollup and request log are written in the background, so callers
+    (notably streaming responses) never hold a connection for accounting.
+    """
+
+    @staticmethod
+    async def record_completion(
+        org_id: int,
+        user_id: Optional[int],
+        model: str,
+        input_tokens: int,
+        output_tokens: int,
+        total_tokens: int,
+        duration_ms: int,
+        status: str = "success"
+    ):
+        """Update monthly counters, daily rollup and request log"""
+        cost_cents = calculate_cost(model, input_tokens, output_tokens)
+
+        # Update Redis counters
+        await RateLimiter.increment_monthly_usage(
+            org_id,
+            messages=1,
+            tokens=total_tokens
+        )
+
+        # Daily rollup and request log are buffered and written in batches
+        usage_aggregator.add(org_id, model, input_tokens, output_tokens, cost_cents)
+
+        await request_log_sink.submit(
+            org_id, user_id, model,
+            input_tokens, output_tokens, duration_ms,
+            status=status
+        )
+
+    @staticmethod
+    async def record_cache_hit(
+        org_id: int,
+        user_id: Optional[int],
+        model: str,
+        usage: dict,
+        duration_ms: int
+    ) -> int:
+        """
+        Record a response served from the response cache
+
+        AI_RESPONSE_CACHE_BILLING decides what a hit costs the organization:
+        "full" counts it like a fresh completion, "messages_only" counts the
+        message but no tokens, "free" only logs it. Returns the tokens
+        billed, for reconciling the token reservation.
+        """
+        policy = settings.AI_RESPONSE_CACHE_BILLING
+
+        if policy == "full":
+            await UsageService.record_completion(
+                org_id, user_id, model,
+                usage["input_tokens"], usage["output_tokens"], usage["total_tokens"],
+                duration_ms, status="cache_hit"
+            )
+            return usage["total_tokens"]
+
+        if policy == "messages_only":
+            await UsageService.record_completion(
+                org_id, user_id, model, 0, 0, 0, duration_ms, status="cache_hit"
+            )
+            return 0
+
+        await UsageService.log_request(
+            org_id, user_id, model, 0, 0, duration_ms, status="cache_hit"
+        )
+        return 0
+
+    @staticmethod
+    async def log_request(
+        org_id: int,
+        user_id: Optional[int],
+        model: str,
+        input_tokens: int,
+        output_tokens: int,
+        duration_ms: int,
+        status: str = "success",
+        error_message: Optional[str] = None
+    ):
+        """Queue a single request log entry"""
+        await request_log_sink.submit(
+            org_id, user_id, model,
+            input_tokens, output_tokens, duration_ms,
+            status=status, error_message=error_message
+        )
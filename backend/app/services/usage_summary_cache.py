@@ -0,0 +1,56 @@
+import json
+from datetime import date, datetime
+from typing import Iterable, Tuple
+import redis.asyncio as aioredis
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.crud import ai_usage as crud_ai_usage
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _summary_key(org_id: int, year_month: str) -> str:
+    return f"usage_summary:{org_id}:{year_month}"
+
+
+async def get_usage_summary(db: AsyncSession, org_id: int) -> dict:
+    """
+    Current month's usage summary, cached in Redis for a short TTL
+    
+    The cache is shared by all workers and dropped whenever new usage for
+    that org and month is written, so a polling dashboard mostly hits Redis.
+    Redis errors fall through to the database.
+    """
+    key = _summary_key(org_id, datetime.utcnow().strftime("%Y-%m"))
+    
+    try:
+        cached = await get_redis().get(key)
+        if cached is not None:
+            return json.loads(cached)
+    except (aioredis.RedisError, OSError) as e:
+        logger.warning(f"Usage summary cache read failed: {e}")
+    
+    summary = await crud_ai_usage.get_usage_summary(db, org_id)
+    
+    try:
+        await get_redis().set(
+            key, json.dumps(summary), ex=settings.USAGE_SUMMARY_CACHE_TTL_SECONDS
+        )
+    except (aioredis.RedisError, OSError) as e:
+        logger.warning(f"Usage summary cache write failed: {e}")
+    
+    return summary
+
+
+async def invalidate_usage_summaries(org_dates: Iterable[Tuple[int, date]]):
+    """Drop cached summaries for the (org, usage date) pairs just written"""
+    keys = {_summary_key(org_id, usage_date.strftime("%Y-%m")) for org_id, usage_date in org_dates}
+    if not keys:
+        return
+    
+    try:
+        await get_redis().delete(*keys)
+    except (aioredis.RedisError, OSError) as e:
+        logger.warning(f"Usage summary cache invalidation failed: {e}")
@@ -1,12 +1,30 @@
 from app.tasks.celery_app import celery_app
 from app.services.ai_service import AIService
 from app.schemas.ai import Message
+from app.core.http_client import close_http_clients
 from typing import List
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def _run_async(coro):
+    """
+    Run a coroutine on a fresh event loop
+    
+    Pooled HTTP clients are bound to the loop that created them, so they are
+    closed before asyncio.run() tears the loop down.
+    """
+    async def runner():
+        try:
+            return await coro
+        finally:
+            await close_http_clients()
+    
+    return asyncio.run(runner())
+
+
 @celery_app.task(name="ai.long_chat_completion")
 def long_chat_completion(
     messages: List[dict],
@@ -26,8 +44,7 @@ def long_chat_completion(
         message_objects = [Message(**msg) for msg in messages]
         
         # Get AI response (sync version needed for Celery)
-        import asyncio
-        result = asyncio.run(
+        result = _run_async(
             AIService.chat_completion(
                 messages=message_objects,
                 model=model,
@@ -75,8 +92,7 @@ def batch_process_messages(
         try:
             messages = [Message(**msg) for msg in item["messages"]]
             
-            import asyncio
-            result = asyncio.run(
+            result = _run_async(
                 AIService.chat_completion(
                     messages=messages,
                     model=model
@@ -5,7 +5,8 @@ from app.core.config import settings
 celery_app = Celery(
     "tasks",
     broker=settings.REDIS_URL,
-    backend=settings.REDIS_URL
+    backend=settings.REDIS_URL,
+    include=["app.tasks.ai_tasks", "app.tasks.scheduled"]
 )
 
 celery_app.conf.update(
@@ -33,6 +34,10 @@ celery_app.conf.beat_schedule = {
         'task': 'check_subscription_renewals',
         'schedule': crontab(hour=9, minute=0),  # Daily at 9 AM UTC
     },
+    'maintain-ai-request-partitions': {
+        'task': 'maintain_ai_request_partitions',
+        'schedule': crontab(hour=0, minute=30),  # Daily at 00:30 UTC
+    },
     'cleanup-old-usage-data': {
         'task': 'cleanup_old_usage_data',
         'schedule': crontab(hour=2, minute=0, day_of_month=1),  # Monthly on 1st at 2 AM UTC
@@ -1,10 +1,16 @@
 from celery import shared_task
-from sqlalchemy import select, update
+from celery.exceptions import SoftTimeLimitExceeded
+from sqlalchemy import select, update, delete, func, text
+from app.core.config import settings
 from app.database import SessionLocal
-from app.models.ai_usage import AIUsage
+from app.models.ai_usage import AIUsage, AIRequest
 from app.models.subscription import Subscription, PlanType
 from app.models.organization import Organization
-from datetime import datetime, timedelta
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, date
+from itertools import groupby
+import re
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,47 +28,89 @@ def reset_daily_usage():
     return {"status": "completed", "timestamp": datetime.utcnow().isoformat()}
 
 
+def _build_usage_report(org_id: int, org_name: str, rows) -> dict:
+    """Fold one organization's per-model aggregate rows into a report"""
+    models = {
+        row.model: {
+            "requests": row.requests,
+            "tokens": row.tokens,
+            "cost_cents": row.cost_cents,
+        }
+        for row in rows
+    }
+    return {
+        "organization_id": org_id,
+        "organization_name": org_name,
+        "requests": sum(m["requests"] for m in models.values()),
+        "tokens": sum(m["tokens"] for m in models.values()),
+        "cost_cents": sum(m["cost_cents"] for m in models.values()),
+        "models": models,
+    }
+
+
+def _deliver_usage_report(report: dict):
+    """Render and send one report"""
+    logger.info(
+        f"Org {report['organization_id']} ({report['organization_name']}): "
+        f"{report['requests']} requests, "
+        f"{report['tokens']} tokens, "
+        f"${report['cost_cents'] / 100:.2f} cost"
+    )
+    # Here you would render and send an email report
+    # For now, just log it
+
+
 @shared_task(name="generate_usage_reports")
-def generate_usage_reports():
-    """Generate and send usage reports to organizations"""
+def generate_usage_reports(days: int = 30):
+    """
+    Generate and send usage reports to organizations
+    
+    One aggregate query grouped by organization and model covers every
+    active organization; rows are streamed with a server-side cursor in
+    organization order and each organization's report is handed to a
+    thread pool for rendering and delivery.
+    """
     logger.info("Starting usage report generation")
     
+    since = (datetime.utcnow() - timedelta(days=days)).date()
+    stmt = (
+        select(
+            AIUsage.organization_id,
+            Organization.name,
+            AIUsage.model,
+            func.coalesce(func.sum(AIUsage.message_count), 0).label("requests"),
+            func.coalesce(func.sum(AIUsage.total_tokens), 0).label("tokens"),
+            func.coalesce(func.sum(AIUsage.estimated_cost), 0).label("cost_cents"),
+        )
+        .join(Organization, Organization.id == AIUsage.organization_id)
+        .where(Organization.is_active == True)
+        .where(AIUsage.date >= since)
+        .group_by(AIUsage.organization_id, Organization.name, AIUsage.model)
+        .order_by(AIUsage.organization_id, AIUsage.model)
+        .execution_options(yield_per=settings.USAGE_REPORT_FETCH_SIZE)
+    )
+    
     db = SessionLocal()
     try:
-        # Get all active organizations
-        result = db.execute(
-            select(Organization).where(Organization.is_active == True)
-        )
-        organizations = result.scalars().all()
-        
-        for org in organizations:
-            # Calculate usage for the past 30 days
-            thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-            
-            usage_result = db.execute(
-                select(AIUsage)
-                .where(AIUsage.organization_id == org.id)
-                .where(AIUsage.created_at >= thirty_days_ago)
-            )
-            usage_records = usage_result.scalars().all()
-            
-            if usage_records:
-                total_tokens = sum(u.tokens_used for u in usage_records)
-                total_cost = sum(float(u.cost) for u in usage_records)
-                total_requests = len(usage_records)
+        organizations = 0
+        # Enough queued reports to keep every worker busy, no more
+        max_in_flight = 2 * settings.USAGE_REPORT_WORKERS
+        with ThreadPoolExecutor(max_workers=settings.USAGE_REPORT_WORKERS) as pool:
+            pending = deque()
+            rows = db.execute(stmt)
+            for (org_id, org_name), org_rows in groupby(rows, key=lambda r: (r[0], r[1])):
+                report = _build_usage_report(org_id, org_name, org_rows)
+                pending.append(pool.submit(_deliver_usage_report, report))
+                organizations += 1
                 
-                logger.info(
-                    f"Org {org.id} ({org.name}): "
-                    f"{total_requests} requests, "
-                    f"{total_tokens} tokens, "
-                    f"${total_cost:.2f} cost"
-                )
-                
-                # Here you would send an email report
-                # For now, just log it
+                while len(pending) >= max_in_flight:
+                    pending.popleft().result()
+            
+            for future in pending:
+                future.result()
         
         logger.info("Usage report generation completed")
-        return {"status": "completed", "organizations_processed": len(organizations)}
+        return {"status": "completed", "organizations_processed": organizations}
         
     except Exception as e:
         logger.error(f"Error generating usage reports: {e}")
@@ -109,32 +157,170 @@ def check_subscription_renewals():
         db.close()
 
 
-@shared_task(name="cleanup_old_usage_data")
-def cleanup_old_usage_data(days=90):
-    """Clean up AI usage data older than specified days"""
-    logger.info(f"Cleaning up usage data older than {days} days")
+def _delete_in_chunks(db, table, column, cutoff, chunk_size: int, on_chunk=None) -> int:
+    """
+    Delete rows of `table` where `column < cutoff`, in primary-key order
     
-    db = SessionLocal()
-    try:
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
+    Each chunk is one set-based DELETE over an id range, committed on its
+    own, so locks are short and memory stays flat. The predicate is
+    idempotent: after an interruption, running again just picks up what
+    is left.
+    """
+    last_id = 0
+    deleted = 0
+    while True:
+        chunk = (
+            select(table.c.id)
+            .where(column < cutoff, table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(chunk_size)
+            .subquery()
+        )
+        count, upper_id = db.execute(
+            select(func.count(), func.max(chunk.c.id))
+        ).one()
+        if upper_id is None:
+            return deleted
         
         result = db.execute(
-            select(AIUsage).where(AIUsage.created_at < cutoff_date)
+            delete(table).where(
+                table.c.id > last_id,
+                table.c.id <= upper_id,
+                column < cutoff
+            )
         )
-        old_records = result.scalars().all()
-        
-        count = len(old_records)
+        db.commit()
         
-        for record in old_records:
-            db.delete(record)
+        deleted += result.rowcount
+        last_id = upper_id
+        if on_chunk:
+            on_chunk(deleted)
+        if count < chunk_size:
+            # A short chunk was the last one; skip the empty lookup
+            return deleted
+
+
+@shared_task(bind=True, name="cleanup_old_usage_data")
+def cleanup_old_usage_data(self, days=90, cutoff=None):
+    """
+    Clean up AI usage data (daily rollups and request logs) older than
+    specified days
+    
+    Deletes in bounded, individually committed chunks and reports progress
+    via task state. If the soft time limit is hit, the task re-queues itself
+    with the same cutoff and continues where it stopped.
+    """
+    cutoff_dt = datetime.fromisoformat(cutoff) if cutoff else datetime.utcnow() - timedelta(days=days)
+    logger.info(f"Cleaning up usage data older than {cutoff_dt.isoformat()}")
+    
+    chunk_size = settings.USAGE_CLEANUP_CHUNK_SIZE
+    progress = {"usage_records_deleted": 0, "request_records_deleted": 0}
+    
+    def report(field):
+        def on_chunk(deleted):
+            progress[field] = deleted
+            self.update_state(state="PROGRESS", meta=dict(progress))
+            logger.info(f"Cleanup progress: {progress}")
+        return on_chunk
+    
+    db = SessionLocal()
+    try:
+        _delete_in_chunks(
+            db, AIUsage.__table__, AIUsage.__table__.c.date, cutoff_dt.date(),
+            chunk_size, report("usage_records_deleted")
+        )
+        # Whole months are dropped as partitions by
+        # maintain_ai_request_partitions; this removes the remainder
+        _delete_in_chunks(
+            db, AIRequest.__table__, AIRequest.__table__.c.created_at, cutoff_dt,
+            chunk_size, report("request_records_deleted")
+        )
         
+        logger.info(f"Cleaned up old usage data: {progress}")
+        return {"status": "completed", **progress}
+    
+    except SoftTimeLimitExceeded:
+        db.rollback()
+        logger.warning(f"Cleanup hit the time limit, resuming in a new task: {progress}")
+        cleanup_old_usage_data.apply_async(
+            kwargs={"days": days, "cutoff": cutoff_dt.isoformat()}
+        )
+        return {"status": "partial", **progress}
+    
+    except Exception as e:
+        logger.error(f"Error cleaning up old usage data: {e}")
+        db.rollback()
+        return {"status": "error", "error": str(e), **progress}
+    finally:
+        db.close()
+
+
+AI_REQUESTS_PARTITION_RE = re.compile(r"^ai_requests_(\d{4})_(\d{2})$")
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+@shared_task(name="maintain_ai_request_partitions")
+def maintain_ai_request_partitions(
+    months_ahead: int = None,
+    retention_days: int = None
+):
+    """
+    Pre-create upcoming monthly ai_requests partitions and drop expired ones
+    
+    A partition is dropped once its whole month is older than the retention
+    window, so retention costs a DETACH + DROP instead of a row-by-row DELETE.
+    """
+    months_ahead = settings.AI_REQUESTS_PARTITIONS_AHEAD if months_ahead is None else months_ahead
+    retention_days = settings.AI_REQUESTS_RETENTION_DAYS if retention_days is None else retention_days
+    logger.info(
+        f"Maintaining ai_requests partitions ({months_ahead} months ahead, "
+        f"{retention_days} days retention)"
+    )
+    
+    db = SessionLocal()
+    try:
+        current_month = datetime.utcnow().date().replace(day=1)
+        created = []
+        for offset in range(months_ahead + 1):
+            month = _add_months(current_month, offset)
+            created.append(db.execute(
+                text("SELECT ai_requests_ensure_partition(:month)"),
+                {"month": month}
+            ).scalar())
         db.commit()
         
-        logger.info(f"Cleaned up {count} old usage records")
-        return {"status": "completed", "records_deleted": count}
+        # Drop partitions whose month ended before the cutoff
+        cutoff = (datetime.utcnow() - timedelta(days=retention_days)).date()
+        partitions = db.execute(text("""
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = 'ai_requests'
+        """)).scalars().all()
         
+        dropped = []
+        for name in sorted(partitions):
+            match = AI_REQUESTS_PARTITION_RE.match(name)
+            if not match:
+                continue
+            month = date(int(match.group(1)), int(match.group(2)), 1)
+            if _add_months(month, 1) <= cutoff:
+                db.execute(text(f'ALTER TABLE ai_requests DETACH PARTITION "{name}"'))
+                db.execute(text(f'DROP TABLE "{name}"'))
+                db.commit()
+                dropped.append(name)
+                logger.info(f"Dropped expired partition {name}")
+        
+        logger.info(f"ai_requests partitions ensured: {created}, dropped: {dropped}")
+        return {"status": "completed", "ensured": created, "dropped": dropped}
+    
     except Exception as e:
-        logger.error(f"Error cleaning up old usage data: {e}")
+        logger.error(f"Error maintaining ai_requests partitions: {e}")
         db.rollback()
         return {"status": "error", "error": str(e)}
     finally:
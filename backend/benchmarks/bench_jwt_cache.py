@@ -0,0 +1,69 @@
+"""
+JWT verification microbenchmark: decode_token and get_tenant_context
+with and without the verified-token cache
+
+The tenant is served from a warm tenant cache and an unconnected session,
+so no database or Redis round trip is measured; only token handling and
+the dependency itself.
+
+Usage (from backend/):
+    python -m benchmarks.bench_jwt_cache [--iterations 20000]
+"""
+import argparse
+import asyncio
+import time
+import fakeredis
+from app.core import security, tenant_cache
+from app.core.config import settings
+from app.database import async_session_maker
+from app.dependencies import get_tenant_context
+from app.models.organization import Organization
+from app.models.user import User
+
+
+def bench_decode(token: str, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        security.decode_token(token)
+    return (time.perf_counter() - start) / iterations
+
+
+async def bench_tenant_context(token: str, iterations: int) -> float:
+    async with async_session_maker() as db:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await get_tenant_context(db, token, "1")
+            db.expunge_all()
+        return (time.perf_counter() - start) / iterations
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    
+    redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    tenant_cache.get_redis = lambda: redis
+    await tenant_cache.store(1, "1", {
+        "user": tenant_cache.dump_row(User(id=1, email="bench@example.com", is_active=True)),
+        "organization": tenant_cache.dump_row(Organization(id=1, name="Bench", slug="bench", is_active=True)),
+        "membership": None,
+        "subscription": None,
+    })
+    token = security.create_access_token({"sub": 1})
+    
+    for label, max_entries in (("no cache", 0), ("cached", settings.JWT_CACHE_MAX_ENTRIES)):
+        settings.JWT_CACHE_MAX_ENTRIES = max_entries
+        security.clear_token_cache()
+        security.decode_token(token)
+        
+        decode = bench_decode(token, args.iterations)
+        context = await bench_tenant_context(token, args.iterations)
+        print(
+            f"{label:>9}: decode_token {decode * 1e6:6.1f}us, "
+            f"get_tenant_context {context * 1e6:6.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
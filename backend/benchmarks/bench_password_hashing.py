@@ -0,0 +1,90 @@
+"""
+Password hashing benchmark: bcrypt on the event loop vs. in a pool
+
+Runs the password check of a login N times with a number of concurrent
+callers and reports logins per second for one worker, together with the
+worst event-loop stall seen by a 10ms heartbeat (what every SSE stream
+on that worker would feel).
+
+Usage (from backend/):
+    python -m benchmarks.bench_password_hashing [--rounds 12] [--logins 64]
+"""
+import argparse
+import asyncio
+import time
+from app.core import security
+from app.core.config import settings
+
+
+async def heartbeat(stalls: list, stop: asyncio.Event, interval: float = 0.01):
+    """Record how late each tick fires"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        stalls.append(loop.time() - expected)
+
+
+async def inline_verify(password: str, hashed: str) -> bool:
+    """The previous implementation: bcrypt directly in the handler"""
+    return security.verify_password(password, hashed)
+
+
+async def run(name: str, verify, hashed: str, logins: int, concurrency: int):
+    stalls = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(heartbeat(stalls, stop))
+    
+    async def worker(count):
+        for _ in range(count):
+            assert await verify("correct horse battery staple", hashed)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        worker(logins // concurrency + (i < logins % concurrency))
+        for i in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    
+    stalls.sort()
+    p99 = stalls[int(len(stalls) * 0.99)] if stalls else 0.0
+    worst = stalls[-1] if stalls else 0.0
+    print(
+        f"{name:>8}: {logins / elapsed:7.1f} logins/s, "
+        f"loop stall p99 {p99 * 1000:6.1f}ms, max {worst * 1000:6.1f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=settings.BCRYPT_ROUNDS)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=settings.PASSWORD_HASH_WORKERS)
+    args = parser.parse_args()
+    
+    settings.BCRYPT_ROUNDS = args.rounds
+    settings.PASSWORD_HASH_WORKERS = args.workers
+    hashed = security.get_password_hash("correct horse battery staple")
+    print(
+        f"bcrypt cost {args.rounds}, {args.logins} logins, "
+        f"{args.concurrency} concurrent callers"
+    )
+    
+    await run("inline", inline_verify, hashed, args.logins, args.concurrency)
+    
+    for executor in ("thread", "process"):
+        settings.PASSWORD_HASH_EXECUTOR = executor
+        security.init_password_hasher()
+        # Warm the pool so worker start-up isn't measured
+        await asyncio.gather(*(
+            security.verify_password_async("x", hashed) for _ in range(args.concurrency)
+        ))
+        await run(executor, security.verify_password_async, hashed, args.logins, args.concurrency)
+        security.shutdown_password_hasher()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
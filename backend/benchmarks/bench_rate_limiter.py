@@ -0,0 +1,106 @@
+"""
+Rate limiter benchmark: legacy GET/SETEX/INCR vs. atomic GCRA script
+
+Counts Redis round trips per check and measures throughput with a number
+of concurrent callers. Runs against REDIS_URL when reachable, otherwise
+against fakeredis. Use --rtt-ms to simulate network latency per round
+trip (fakeredis has none).
+
+Usage (from backend/):
+    python -m benchmarks.bench_rate_limiter [--fake] [--requests 5000] [--rtt-ms 0.5]
+"""
+import argparse
+import asyncio
+import time
+import redis.asyncio as aioredis
+from app.core import rate_limiter
+from app.core.config import settings
+from app.core.rate_limiter import RateLimiter
+
+
+async def legacy_check_rate_limit(client, key: str, limit: int, window_seconds: int = 60):
+    """The previous non-atomic implementation (for comparison)"""
+    current = await client.get(key)
+    if current is None:
+        await client.setex(key, window_seconds, 1)
+        return True
+    if int(current) >= limit:
+        return False
+    await client.incr(key)
+    return True
+
+
+async def get_client(use_fake: bool):
+    if not use_fake:
+        try:
+            client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+            await client.ping()
+            return client, settings.REDIS_URL
+        except (aioredis.RedisError, OSError):
+            pass
+    import fakeredis
+    return fakeredis.aioredis.FakeRedis(decode_responses=True), "fakeredis"
+
+
+def instrument(client, rtt_ms: float) -> list:
+    """Count commands sent to Redis and optionally add latency to each"""
+    calls = []
+    original = client.execute_command
+
+    async def execute_command(*args, **kwargs):
+        calls.append(args[0])
+        if rtt_ms:
+            await asyncio.sleep(rtt_ms / 1000)
+        return await original(*args, **kwargs)
+
+    client.execute_command = execute_command
+    return calls
+
+
+async def run(name: str, check, calls: list, requests: int, concurrency: int):
+    calls.clear()
+    keys = [f"bench:{name}:{i % 100}" for i in range(requests)]
+
+    async def worker(worker_keys):
+        for key in worker_keys:
+            await check(key)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(keys[i::concurrency]) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:>8}: {len(calls) / requests:.2f} round trips/check, "
+        f"{requests / elapsed:,.0f} checks/s"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--fake", action="store_true", help="force fakeredis")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--rtt-ms", type=float, default=0.0)
+    parser.add_argument("--limit", type=int, default=60)
+    args = parser.parse_args()
+
+    client, target = await get_client(args.fake)
+    rate_limiter.get_redis = lambda: client
+    calls = instrument(client, args.rtt_ms)
+    print(
+        f"Target: {target}, {args.requests} checks, "
+        f"{args.concurrency} concurrent callers, simulated RTT {args.rtt_ms}ms"
+    )
+
+    await RateLimiter.check_rate_limit("bench:warmup", args.limit)  # load script
+    await run(
+        "legacy", lambda key: legacy_check_rate_limit(client, key, args.limit),
+        calls, args.requests, args.concurrency
+    )
+    await run(
+        "gcra", lambda key: RateLimiter.check_rate_limit(key, args.limit),
+        calls, args.requests, args.concurrency
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+"""
+SSE streaming benchmark: per-token frames vs. the coalescing encoder
+
+Streams an answer of N tokens through a StreamingResponse whose `send`
+writes each body chunk, HTTP/1.1 chunk-framed, to /dev/null (one write
+syscall per send, as the server does), and reports CPU time per stream,
+the number of sends and the bytes written. Tokens arrive a few at a time
+at a fixed interval, like reads of a provider stream. The Redis tee of
+resumable streams is switched off so only framing and buffering are
+measured.
+
+Usage (from backend/):
+    python -m benchmarks.bench_sse_stream [--tokens 8192] [--interval-ms 1] [--burst 4]
+"""
+import argparse
+import asyncio
+import os
+import time
+from starlette.responses import StreamingResponse
+from app.core.config import settings
+from app.services.stream_buffer import resumable_streams
+
+TOKEN = "tok "
+
+
+async def provider(tokens: int, interval: float, burst: int):
+    for i in range(tokens):
+        if i % burst == 0:
+            await asyncio.sleep(interval)
+        # Every 16th token carries a newline, as code and lists do
+        yield TOKEN if i % 16 else "\n" + TOKEN
+
+
+async def legacy_body(tokens: int, interval: float, burst: int):
+    """The previous handler: string concatenation and one frame per token"""
+    full_response = ""
+    async for chunk in provider(tokens, interval, burst):
+        full_response += chunk
+        yield f"data: {chunk}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def current_body(tokens: int, interval: float, burst: int):
+    async def generate():
+        parts = []
+        async for chunk in provider(tokens, interval, burst):
+            parts.append(chunk)
+            yield chunk
+        full_response = "".join(parts)  # what the handler bills
+        yield "[DONE]"
+    
+    generation = resumable_streams.start(1, generate())
+    generation._buffered = False
+    return generation.events()
+
+
+async def run(name: str, body, fd: int):
+    sends = 0
+    written = 0
+    
+    async def receive():
+        await asyncio.Event().wait()
+    
+    async def send(message):
+        nonlocal sends, written
+        if message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            sends += 1
+            written += len(body)
+            os.write(fd, b"%x\r\n%s\r\n" % (len(body), body))
+    
+    scope = {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.3"}}
+    cpu = time.process_time()
+    wall = time.perf_counter()
+    await StreamingResponse(body, media_type="text/event-stream")(scope, receive, send)
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+    print(
+        f"{name:>14}: cpu {cpu * 1000:7.1f}ms/stream, wall {wall:5.2f}s, "
+        f"{sends:5d} sends, {written / 1024:6.1f} KiB"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tokens", type=int, default=8192)
+    parser.add_argument("--interval-ms", type=float, default=1.0)
+    parser.add_argument("--burst", type=int, default=4)
+    args = parser.parse_args()
+    stream = (args.tokens, args.interval_ms / 1000, args.burst)
+    fd = os.open(os.devnull, os.O_WRONLY)
+    
+    # Baseline for the provider loop itself (sleeps and scheduling)
+    cpu = time.process_time()
+    async for _ in provider(*stream):
+        pass
+    print(f"{'provider only':>14}: cpu {(time.process_time() - cpu) * 1000:7.1f}ms/stream")
+    
+    await run("legacy", legacy_body(*stream), fd)
+    for window in (0, settings.AI_STREAM_COALESCE_MS or 20):
+        settings.AI_STREAM_COALESCE_MS = window
+        await run(f"encoder {window}ms", current_body(*stream), fd)
+    os.close(fd)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
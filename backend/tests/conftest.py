@@ -5,6 +5,22 @@ from faker import Faker
 fake = Faker()
 
 
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """
+    Point the shared Redis client at an in-memory Redis with Lua support
+    
+    Every module reaches Redis through app.core.redis_client.get_redis(),
+    which returns this client for the duration of the test.
+    """
+    fakeredis = pytest.importorskip("fakeredis")
+    from app.core import redis_client
+    
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(redis_client, "_client", client)
+    return client
+
+
 @pytest.fixture
 async def client():
     """Create test client without database"""
@@ -0,0 +1,76 @@
+import json
+import httpx
+import pytest
+from app.core.config import settings
+from app.core import tokenizer
+from app.core.tokenizer import count_tokens
+from app.schemas.ai import Message
+from app.services.ai_service import AIService
+from app.services.providers import StreamTrailer, base
+
+TRANSCRIPT = (
+    'data: {"choices": [{"delta": {"content": "Bonjour"}}]}\n\n'
+    'data: {"choices": [{"delta": {"content": " le monde"}, "finish_reason": "stop"}]}\n\n'
+    'data: {"choices": [], "usage": {"prompt_tokens": 11, "completion_tokens": 4, "total_tokens": 15}}\n\n'
+    'data: [DONE]\n\n'
+)
+
+
+@pytest.mark.asyncio
+async def test_stream_reports_provider_usage_as_trailer(monkeypatch):
+    """Test that the usage chunk becomes a trailer instead of text"""
+    requests = []
+    
+    def handler(request):
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, text=TRANSCRIPT, headers={"content-type": "text/event-stream"})
+    
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://openrouter")
+    monkeypatch.setattr(base, "get_http_client", lambda name: client)
+    monkeypatch.setattr(settings, "AI_SINGLE_FLIGHT_ENABLED", False)
+    
+    items = [
+        item async for item in AIService.chat_completion_stream(
+            [Message(role="user", content="Say hello in French")], "gemini-2.0-flash"
+        )
+    ]
+    
+    assert items == [
+        "Bonjour",
+        " le monde",
+        StreamTrailer({"input_tokens": 11, "output_tokens": 4, "total_tokens": 15}, "stop"),
+    ]
+    assert requests[0]["stream_options"] == {"include_usage": True}
+
+
+def test_local_token_count_fallback():
+    """Test that local counts are available without provider usage"""
+    assert count_tokens("") == 0
+    assert 0 < count_tokens("def f(x):\n    return x * 2") < 30
+
+
+def test_tokenizer_load_failure_is_retried(monkeypatch):
+    """Test that a failed encoding load falls back and is not remembered"""
+    attempts = []
+    
+    class Encoding:
+        def encode(self, text, disallowed_special):
+            return text.split()
+    
+    class FlakyTiktoken:
+        @staticmethod
+        def get_encoding(name):
+            attempts.append(name)
+            if len(attempts) == 1:
+                raise OSError("BPE download failed")
+            return Encoding()
+    
+    monkeypatch.setattr(tokenizer, "tiktoken", FlakyTiktoken)
+    monkeypatch.setattr(tokenizer, "_encoding", None)
+    
+    tokenizer.load_tokenizer()
+    assert count_tokens("one two three four five") == 6  # character estimate
+    
+    tokenizer.load_tokenizer()
+    assert count_tokens("one two three four five") == 5
+    assert len(attempts) == 2
@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+from app.core import api_key_cache as cache_module
+from app.core.api_key_cache import ApiKeyCache, CachedApiKey
+
+
+def _entry(key_id=1, org_id=10):
+    return CachedApiKey(key_id, org_id, None, True, {"id": org_id, "is_active": True})
+
+
+async def _subscribed(*caches):
+    for cache in caches:
+        cache.start()
+    for _ in range(100):
+        if all(cache._subscribed for cache in caches):
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("listener did not subscribe")
+
+
+@pytest.mark.asyncio
+async def test_revocation_reaches_other_workers(fake_redis):
+    """Test that revoking on one worker drops the key on another"""
+    worker_a = ApiKeyCache(max_entries=10, ttl=60)
+    worker_b = ApiKeyCache(max_entries=10, ttl=60)
+    await _subscribed(worker_a, worker_b)
+    
+    worker_b.put("hash-1", _entry(1), worker_b.epoch)
+    worker_b.put("hash-2", _entry(2, org_id=20), worker_b.epoch)
+    assert worker_b.get("hash-1") is not None
+    
+    await worker_a.revoke("hash-1")
+    await worker_a.invalidate_org(20)
+    for _ in range(300):
+        if worker_b.get("hash-1") is None and worker_b.get("hash-2") is None:
+            break
+        await asyncio.sleep(0.01)
+    
+    assert worker_b.get("hash-1") is None
+    assert worker_b.get("hash-2") is None
+    
+    await worker_a.stop()
+    await worker_b.stop()
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_and_unsubscribed_bypass(fake_redis):
+    """Test that the cache is bounded and unused while not subscribed"""
+    cache = ApiKeyCache(max_entries=2, ttl=60)
+    cache.put("early", _entry(), cache.epoch)
+    assert cache._entries == {}
+    
+    await _subscribed(cache)
+    cache.put("a", _entry(1), cache.epoch)
+    cache.put("b", _entry(2), cache.epoch)
+    cache.get("a")
+    cache.put("c", _entry(3), cache.epoch)
+    
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+    
+    await cache.stop()
+
+
+@pytest.mark.asyncio
+async def test_fill_racing_a_revocation_is_skipped(fake_redis):
+    """Test that a row read before a revocation is not cached after it"""
+    cache = ApiKeyCache(max_entries=10, ttl=60)
+    await _subscribed(cache)
+    
+    epoch = cache.epoch  # taken before the database read
+    # Another worker revokes the key while the read is in flight
+    await fake_redis.publish(cache_module.REVOCATION_CHANNEL, "key:hash-1")
+    for _ in range(300):
+        if cache.epoch != epoch:
+            break
+        await asyncio.sleep(0.01)
+    cache.put("hash-1", _entry(1), epoch)
+    
+    assert cache.get("hash-1") is None
+    cache.put("hash-1", _entry(1), cache.epoch)
+    assert cache.get("hash-1") is not None
+    
+    await cache.stop()
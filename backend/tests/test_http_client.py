@@ -0,0 +1,25 @@
+import pytest
+from app.core import http_client
+
+
+@pytest.mark.asyncio
+async def test_provider_client_is_shared():
+    """Test that every call gets the same pooled client"""
+    await http_client.init_http_clients()
+    try:
+        first = http_client.get_http_client("openrouter")
+        second = http_client.get_http_client("openrouter")
+        assert first is second
+        assert str(first.base_url).startswith("https://openrouter.ai")
+    finally:
+        await http_client.close_http_clients()
+    
+    assert first.is_closed
+
+
+@pytest.mark.asyncio
+async def test_client_created_lazily_without_lifespan():
+    """Test fallback when the app lifespan has not run (Celery, scripts)"""
+    client = http_client.get_http_client("openrouter")
+    assert not client.is_closed
+    await http_client.close_http_clients()
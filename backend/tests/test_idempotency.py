@@ -0,0 +1,37 @@
+import asyncio
+import pytest
+from app.services.idempotency import (
+    IdempotencyService,
+    IdempotencyKeyReused,
+    request_fingerprint
+)
+
+
+@pytest.mark.asyncio
+async def test_duplicate_waits_for_original_response(fake_redis):
+    """Test that a retry during the original call gets its stored response"""
+    fingerprint = request_fingerprint('{"messages": []}')
+    assert await IdempotencyService.begin(1, "retry-1", fingerprint) is None
+    
+    duplicate = asyncio.create_task(IdempotencyService.begin(1, "retry-1", fingerprint))
+    await asyncio.sleep(0.1)
+    assert not duplicate.done()
+    
+    await IdempotencyService.complete(1, "retry-1", fingerprint, {"message": "hi"})
+    assert await asyncio.wait_for(duplicate, 2) == {"message": "hi"}
+    
+    # Same key in another organization is independent
+    assert await IdempotencyService.begin(2, "retry-1", fingerprint) is None
+
+
+@pytest.mark.asyncio
+async def test_reuse_with_other_body_and_release(fake_redis):
+    """Test key reuse detection and that a released key can be claimed again"""
+    fingerprint = request_fingerprint("a")
+    assert await IdempotencyService.begin(1, "retry-2", fingerprint) is None
+    
+    with pytest.raises(IdempotencyKeyReused):
+        await IdempotencyService.begin(1, "retry-2", request_fingerprint("b"))
+    
+    await IdempotencyService.release(1, "retry-2")
+    assert await IdempotencyService.begin(1, "retry-2", fingerprint) is None
@@ -0,0 +1,198 @@
+import asyncio
+import json
+from pathlib import Path
+import pytest
+from app.core import http_client
+from app.core.config import settings
+from app.core.sse import SSEEvent, parse_sse
+from app.schemas.ai import Message
+from app.services.providers import Provider, ProviderError, StreamTrailer, get_provider
+
+TRANSCRIPTS = Path(__file__).parent / "transcripts"
+MESSAGES = [
+    Message(role="system", content="Answer in French"),
+    Message(role="user", content="Say hello to the world"),
+]
+
+
+class StubServer:
+    """
+    Local HTTP server replaying a recorded SSE transcript
+    
+    Everything after the first text event is held back until `release` is
+    set, so a test can tell a native stream from a buffered one.
+    """
+    
+    def __init__(self, transcript: str, status: int = 200):
+        self.events = [event + "\n\n" for event in transcript.split("\n\n") if event]
+        self.status = status
+        self.requests = []
+        self.release = asyncio.Event()
+    
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        host, port = self.server.sockets[0].getsockname()[:2]
+        self.url = f"http://{host}:{port}"
+        return self
+    
+    async def __aexit__(self, *exc):
+        self.release.set()
+        self.server.close()
+        await self.server.wait_closed()
+    
+    async def _handle(self, reader, writer):
+        head = await reader.readuntil(b"\r\n\r\n")
+        request_line, *header_lines = head.decode().split("\r\n")
+        headers = dict(
+            line.lower().split(": ", 1) for line in header_lines if ": " in line
+        )
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+        self.requests.append({
+            "path": request_line.split()[1],
+            "headers": headers,
+            "json": json.loads(body) if body else None,
+        })
+        
+        writer.write(
+            f"HTTP/1.1 {self.status} Stub\r\n"
+            "Content-Type: text/event-stream\r\n"
+            "Connection: close\r\n\r\n".encode()
+        )
+        held = False
+        for event in self.events:
+            writer.write(event.encode())
+            await writer.drain()
+            if not held and "Bonjour" in event:
+                held = True
+                await self.release.wait()
+        writer.close()
+
+
+@pytest.fixture
+def stub_provider(monkeypatch):
+    """Point a provider's pooled client at a stub server"""
+    clients = []
+    for key in ["OPENROUTER_API_KEY", "OPENAI_API_KEY", "ANTHROPIC_API_KEY", "GEMINI_API_KEY"]:
+        monkeypatch.setattr(settings, key, "test-key")
+    
+    def use(provider: str, server: StubServer):
+        monkeypatch.setitem(http_client.PROVIDER_BASE_URLS, provider, server.url)
+        http_client._clients.pop(provider, None)
+        clients.append(provider)
+    
+    yield use
+    for provider in clients:
+        http_client._clients.pop(provider, None)
+
+
+async def _stream(server: StubServer, model: str):
+    """First item while the server is still holding back, then the rest"""
+    stream = get_provider(model).stream(MESSAGES, model, 0.7, 100)
+    first = await asyncio.wait_for(stream.__anext__(), timeout=5)
+    assert not server.release.is_set()
+    server.release.set()
+    return [first] + [item async for item in stream]
+
+
+@pytest.mark.asyncio
+async def test_openai_compatible_stream(stub_provider):
+    """Test that OpenRouter chunks stream natively and end with usage"""
+    async with StubServer((TRANSCRIPTS / "openai.sse").read_text()) as server:
+        stub_provider("openrouter", server)
+        items = await _stream(server, "gemini-2.0-flash")
+    
+    assert items == [
+        "Bonjour",
+        " le monde",
+        StreamTrailer({"input_tokens": 11, "output_tokens": 4, "total_tokens": 15}, "stop"),
+    ]
+    request = server.requests[0]
+    assert request["path"] == "/chat/completions"
+    assert request["json"]["stream_options"] == {"include_usage": True}
+    assert request["json"]["messages"][0] == {"role": "system", "content": "Answer in French"}
+
+
+@pytest.mark.asyncio
+async def test_anthropic_stream(stub_provider):
+    """Test that Anthropic message events stream natively and end with usage"""
+    async with StubServer((TRANSCRIPTS / "anthropic.sse").read_text()) as server:
+        stub_provider("anthropic", server)
+        items = await _stream(server, "claude-3-haiku")
+    
+    assert items == [
+        "Bonjour",
+        " le monde",
+        StreamTrailer({"input_tokens": 12, "output_tokens": 5, "total_tokens": 17}, "length"),
+    ]
+    request = server.requests[0]
+    assert request["path"] == "/messages"
+    assert request["headers"]["anthropic-version"] == "2023-06-01"
+    assert request["json"]["model"] == "claude-3-haiku-20240307"
+    assert request["json"]["system"] == "Answer in French"
+    assert [m["role"] for m in request["json"]["messages"]] == ["user"]
+
+
+@pytest.mark.asyncio
+async def test_gemini_stream(stub_provider, monkeypatch):
+    """Test that Gemini chunks stream natively with the last cumulative usage"""
+    monkeypatch.setattr(settings, "AI_GEMINI_BACKEND", "google")
+    
+    async with StubServer((TRANSCRIPTS / "gemini.sse").read_text()) as server:
+        stub_provider("gemini", server)
+        items = await _stream(server, "gemini-2.0-flash")
+    
+    assert items == [
+        "Bonjour",
+        " le monde",
+        StreamTrailer({"input_tokens": 9, "output_tokens": 4, "total_tokens": 13}, "stop"),
+    ]
+    request = server.requests[0]
+    assert request["path"] == "/models/gemini-2.0-flash:streamGenerateContent?alt=sse"
+    assert request["json"]["systemInstruction"] == {"parts": [{"text": "Answer in French"}]}
+
+
+@pytest.mark.asyncio
+async def test_stream_error_status_raises(stub_provider):
+    """Test that a non-200 response raises ProviderError"""
+    async with StubServer('{"error": {"message": "bad key"}}', status=401) as server:
+        stub_provider("openai", server)
+        server.release.set()
+        with pytest.raises(ProviderError) as error:
+            async for _ in get_provider("gpt-4o-mini").stream(MESSAGES, "gpt-4o-mini", 0.7, 100):
+                pass
+    
+    assert error.value.status_code == 401
+    assert "bad key" in str(error.value)
+
+
+@pytest.mark.asyncio
+async def test_parse_sse_fields():
+    """Test that multi-line data, event names and comments are parsed"""
+    async def lines():
+        for line in [": keep-alive", "event: delta", "id: 7", "data: a", "data: b", "", "data: tail"]:
+            yield line
+    
+    assert [event async for event in parse_sse(lines())] == [
+        SSEEvent("delta", "a\nb", "7"),
+        SSEEvent("message", "tail", "7"),
+    ]
+
+
+def test_partial_provider_cannot_be_instantiated():
+    """Test that a provider must implement both complete and stream"""
+    class CompleteOnly(Provider):
+        async def complete(self, messages, model, temperature, max_tokens):
+            return {}
+    
+    with pytest.raises(TypeError):
+        CompleteOnly("openai", {})
+
+
+def test_upstream_errors_map_to_gateway_statuses():
+    """Test that provider failures are not reported as our own 500s"""
+    from app.api.v1.ai import completion_error_status
+    
+    assert completion_error_status(ProviderError("quota", 429)) == 503
+    assert completion_error_status(ProviderError("bad key", 401)) == 502
+    assert completion_error_status(ProviderError("bad response")) == 502
+    assert completion_error_status(KeyError("usage")) == 500
@@ -0,0 +1,112 @@
+import pytest
+from app.core import rate_limiter
+from app.core.rate_limiter import RateLimiter
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_allows_up_to_limit(fake_redis):
+    """Test that exactly `limit` requests pass within the window"""
+    results = [await RateLimiter.check_rate_limit("test:rate", 5, 60) for _ in range(6)]
+    
+    assert [r.allowed for r in results] == [True] * 5 + [False]
+    assert [r.remaining for r in results[:5]] == [4, 3, 2, 1, 0]
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_headers(fake_redis):
+    """Test X-RateLimit-* and Retry-After headers"""
+    allowed = await RateLimiter.check_rate_limit("test:headers", 1, 60)
+    rejected = await RateLimiter.check_rate_limit("test:headers", 1, 60)
+    
+    assert allowed.headers()["X-RateLimit-Remaining"] == "0"
+    assert "Retry-After" not in allowed.headers()
+    
+    headers = rejected.headers()
+    assert headers["X-RateLimit-Limit"] == "1"
+    assert 1 <= int(headers["Retry-After"]) <= 60
+    assert int(headers["X-RateLimit-Reset"]) <= 60
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_single_round_trip(fake_redis, monkeypatch):
+    """Test that check-and-consume is a single Redis command"""
+    await RateLimiter.check_rate_limit("test:rtt", 10, 60)  # load script
+    
+    calls = []
+    original = fake_redis.execute_command
+    
+    async def counting(*args, **kwargs):
+        calls.append(args[0])
+        return await original(*args, **kwargs)
+    
+    monkeypatch.setattr(fake_redis, "execute_command", counting)
+    await RateLimiter.check_rate_limit("test:rtt", 10, 60)
+    
+    assert calls == ["EVALSHA"]
+
+
+@pytest.mark.asyncio
+async def test_monthly_usage_counters(fake_redis):
+    """Test monthly counters and limit check"""
+    await RateLimiter.increment_monthly_usage(1, messages=1, tokens=120)
+    await RateLimiter.increment_monthly_usage(1, messages=1, tokens=30)
+    
+    allowed, usage_info = await RateLimiter.check_monthly_limit(1, 2, None)
+    
+    assert not allowed
+    assert usage_info["current_messages"] == 2
+    assert usage_info["current_tokens"] == 150
+
+
+@pytest.mark.asyncio
+async def test_monthly_counters_expire_after_next_month(fake_redis):
+    """Test that counters get an absolute expiry ~1-2 months out"""
+    await RateLimiter.increment_monthly_usage(2, messages=1, tokens=10)
+    
+    messages_key, tokens_key = rate_limiter._monthly_keys(2)
+    for key in (messages_key, tokens_key):
+        ttl = await fake_redis.ttl(key)
+        assert 28 * 86400 <= ttl <= 62 * 86400
+
+
+@pytest.mark.asyncio
+async def test_token_reservation_refunds_unused(fake_redis):
+    """Test reserve-then-reconcile on a tokens-per-minute limit"""
+    first, reservation = await RateLimiter.reserve_tokens("test:tpm", 10000, 6000)
+    assert first.allowed
+    
+    # Worst case reserved: a second large request doesn't fit
+    second, _ = await RateLimiter.reserve_tokens("test:tpm", 10000, 6000)
+    assert not second.allowed
+    
+    # Only 1000 tokens were really used, so the refund makes room again
+    await RateLimiter.reconcile_tokens(reservation, 1000)
+    third, _ = await RateLimiter.reserve_tokens("test:tpm", 10000, 6000)
+    assert third.allowed
+    assert third.remaining <= 3000
+
+
+@pytest.mark.asyncio
+async def test_token_limit_denial_spends_no_request_unit(fake_redis):
+    """Test that a token-limit 429 leaves the requests-per-minute count unchanged"""
+    from fastapi import HTTPException
+    from app.api.v1.ai import check_ai_limits
+    from app.models.organization import Organization
+    from app.models.subscription import PlanType, Subscription
+    
+    org = Organization(id=42, name="Acme", slug="acme")
+    subscription = Subscription(organization_id=42, plan_type=PlanType.FREE)
+    
+    first = await check_ai_limits(org, subscription, "gemini-2.0-flash", 1000, 100)
+    await RateLimiter.reconcile_tokens(first["token_reservation"], 0)
+    
+    # Use up the whole tokens-per-minute budget
+    _, hog = await RateLimiter.reserve_tokens(f"ai_tokens:{org.id}:minute", 20000, 20000)
+    with pytest.raises(HTTPException) as denied:
+        await check_ai_limits(org, subscription, "gemini-2.0-flash", 1000, 100)
+    assert denied.value.status_code == 429
+    assert "X-RateLimit-Remaining" not in denied.value.headers
+    
+    await RateLimiter.reconcile_tokens(hog, 0)
+    second = await check_ai_limits(org, subscription, "gemini-2.0-flash", 1000, 100)
+    assert second["rate_limit_remaining"] == first["rate_limit_remaining"] - 1
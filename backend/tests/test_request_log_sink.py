@@ -0,0 +1,91 @@
+import asyncio
+import pytest
+from contextlib import asynccontextmanager
+from app.services import request_log_sink as sink_module
+from app.services.request_log_sink import RequestLogSink
+
+
+@pytest.fixture
+def written(monkeypatch):
+    """Capture bulk inserts instead of writing to the database"""
+    batches = []
+    
+    @asynccontextmanager
+    async def fake_session():
+        yield None
+    
+    async def fake_bulk_insert(db, rows):
+        batches.append(rows)
+    
+    monkeypatch.setattr(sink_module, "async_session_maker", fake_session)
+    monkeypatch.setattr(sink_module.crud_ai_usage, "bulk_insert_requests", fake_bulk_insert)
+    return batches
+
+
+@pytest.mark.asyncio
+async def test_rows_are_written_in_batches(written):
+    """Test that queued rows are bulk-inserted and drained on stop"""
+    sink = RequestLogSink(batch_size=3, flush_interval=60, max_queue=100)
+    for i in range(7):
+        await sink.submit(1, 1, "gemini-2.0-flash", i, i, 100)
+    
+    await sink.stop()
+    
+    rows = [row for batch in written for row in batch]
+    assert len(rows) == 7
+    assert all(len(batch) <= 3 for batch in written)
+    assert rows[0]["total_tokens"] == 0
+    assert rows[0]["created_at"] is not None
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest_when_queue_is_full(written):
+    """Test the bounded queue's overflow policy"""
+    sink = RequestLogSink(batch_size=10, flush_interval=60, max_queue=2)
+    sink._task = object()  # keep the background writer from consuming
+    for i in range(4):
+        await sink.submit(1, None, "gpt-4o-mini", i, 0, 0)
+    sink._task = None
+    
+    await sink.stop()
+    
+    assert [row["input_tokens"] for row in written[0]] == [2, 3]
+
+
+def test_unknown_overflow_policy_rejected():
+    with pytest.raises(ValueError):
+        RequestLogSink(batch_size=1, flush_interval=1, max_queue=1, overflow_policy="spill")
+
+
+@pytest.mark.asyncio
+async def test_stop_writes_rows_the_writer_already_dequeued(written):
+    """Test that rows collected by a running writer survive stop()"""
+    sink = RequestLogSink(batch_size=10, flush_interval=60, max_queue=100)
+    for i in range(3):
+        await sink.submit(1, 1, "gemini-2.0-flash", i, 0, 0)
+    while not sink._queue.empty():
+        await asyncio.sleep(0)
+    
+    await sink.stop()
+    
+    assert [row["input_tokens"] for batch in written for row in batch] == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_failed_write_is_requeued(written, monkeypatch):
+    """Test that a batch is kept for the next flush when the insert fails"""
+    insert = sink_module.crud_ai_usage.bulk_insert_requests
+    failures = [RuntimeError("database unavailable")]
+    
+    async def flaky_bulk_insert(db, rows):
+        if failures:
+            raise failures.pop()
+        await insert(db, rows)
+    
+    monkeypatch.setattr(sink_module.crud_ai_usage, "bulk_insert_requests", flaky_bulk_insert)
+    sink = RequestLogSink(batch_size=10, flush_interval=60, max_queue=100)
+    
+    assert not await sink._write([{"input_tokens": 1}, {"input_tokens": 2}])
+    await sink.drain()
+    
+    assert [row["input_tokens"] for row in written[0]] == [1, 2]
@@ -0,0 +1,63 @@
+import pytest
+from app.schemas.ai import ChatRequest
+from app.services.response_cache import (
+    ResponseCache,
+    cache_directives,
+    replay_chunks,
+    request_key
+)
+
+
+def make_result(message: str) -> dict:
+    return {
+        "message": message,
+        "usage": {"input_tokens": 3, "output_tokens": 2, "total_tokens": 5},
+        "finish_reason": "stop",
+        "duration_ms": 120,
+    }
+
+
+def test_request_key_is_canonical_and_per_org():
+    """Test that the key ignores irrelevant fields and separates organizations"""
+    request = ChatRequest(messages=[{"role": "user", "content": "Classify: spam?"}], temperature=0)
+    same = ChatRequest(
+        messages=[{"content": "Classify: spam?", "role": "user"}], temperature=0, stream=True
+    )
+    other = ChatRequest(
+        messages=[{"role": "user", "content": "Classify: spam?"}], temperature=0, max_tokens=10
+    )
+    
+    assert request_key(1, request) == request_key(1, same)
+    assert request_key(1, request) != request_key(2, request)
+    assert request_key(1, request) != request_key(1, other)
+    
+    assert cache_directives(None) == (True, True)
+    assert cache_directives("no-cache") == (False, True)
+    assert cache_directives("max-age=0, No-Store") == (False, False)
+    assert "".join(replay_chunks("one two  three\nfour", size=4)) == "one two  three\nfour"
+
+
+@pytest.mark.asyncio
+async def test_local_tier_is_bounded_by_bytes(fake_redis):
+    """Test that old entries are evicted locally but still served from Redis"""
+    cache = ResponseCache(max_bytes=300, ttl=60)
+    await cache.set("a", make_result("x" * 100))
+    await cache.set("b", make_result("y" * 100))
+    
+    assert "a" not in cache._entries
+    assert cache._bytes <= 300
+    
+    assert (await cache.get("a"))["message"] == "x" * 100
+    assert "a" in cache._entries and "b" not in cache._entries
+    assert 0 < await fake_redis.ttl("a") <= 60
+    
+    assert await cache.get("missing") is None
+
+
+def test_unknown_cache_billing_policy_rejected():
+    """Test that a mistyped billing policy fails at startup instead of billing nothing"""
+    from pydantic import ValidationError
+    from app.core.config import Settings
+    
+    with pytest.raises(ValidationError):
+        Settings(AI_RESPONSE_CACHE_BILLING="ful")
@@ -0,0 +1,172 @@
+import threading
+import time
+from collections import namedtuple
+from datetime import date
+from unittest.mock import MagicMock
+import pytest
+from celery.exceptions import SoftTimeLimitExceeded
+from sqlalchemy import Column, Date, Delete, Integer, MetaData, Table, create_engine, func, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.tasks import scheduled
+
+UsageRow = namedtuple("UsageRow", "organization_id name model requests tokens cost_cents")
+
+
+class FakeSession:
+    """Sync session stand-in that serves canned rows to every execute()"""
+    
+    def __init__(self, rows):
+        self.rows = rows
+        self.closed = False
+    
+    def execute(self, stmt):
+        return iter(self.rows)
+    
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def delivered(monkeypatch):
+    """Record delivered reports and the most reports ever in flight"""
+    lock = threading.Lock()
+    state = {"submitted": 0, "completed": 0, "max_in_flight": 0, "reports": []}
+    build = scheduled._build_usage_report
+    
+    def counting_build(org_id, org_name, rows):
+        # Called right before each submit, so this counts the new report too
+        with lock:
+            state["submitted"] += 1
+            in_flight = state["submitted"] - state["completed"]
+            state["max_in_flight"] = max(state["max_in_flight"], in_flight)
+        return build(org_id, org_name, rows)
+    
+    def slow_deliver(report):
+        time.sleep(0.01)
+        with lock:
+            state["reports"].append(report)
+            state["completed"] += 1
+    
+    monkeypatch.setattr(scheduled, "_build_usage_report", counting_build)
+    monkeypatch.setattr(scheduled, "_deliver_usage_report", slow_deliver)
+    return state
+
+
+def test_usage_reports_one_per_organization(monkeypatch, delivered):
+    """Test that each organization's rows are folded into exactly one report"""
+    session = FakeSession([
+        UsageRow(1, "Acme", "gemini-2.0-flash", 3, 300, 2),
+        UsageRow(1, "Acme", "gpt-4o-mini", 1, 100, 5),
+        UsageRow(2, "Globex", "gpt-4o-mini", 4, 40, 1),
+        UsageRow(3, "Initech", "claude-3-haiku", 2, 20, 3),
+        UsageRow(3, "Initech", "gemini-2.0-flash", 1, 10, 0),
+    ])
+    monkeypatch.setattr(scheduled, "SessionLocal", lambda: session)
+    
+    result = scheduled.generate_usage_reports()
+    
+    assert result == {"status": "completed", "organizations_processed": 3}
+    reports = sorted(delivered["reports"], key=lambda r: r["organization_id"])
+    assert [r["organization_id"] for r in reports] == [1, 2, 3]
+    assert reports[0]["requests"] == 4
+    assert reports[0]["tokens"] == 400
+    assert set(reports[0]["models"]) == {"gemini-2.0-flash", "gpt-4o-mini"}
+    assert reports[2]["cost_cents"] == 3
+    assert session.closed
+
+
+def test_usage_reports_in_flight_are_bounded(monkeypatch, delivered):
+    """Test that no more than 2x the worker count of reports wait at once"""
+    monkeypatch.setattr(settings, "USAGE_REPORT_WORKERS", 2)
+    rows = [UsageRow(org_id, f"Org {org_id}", "gpt-4o-mini", 1, 10, 1) for org_id in range(1, 41)]
+    monkeypatch.setattr(scheduled, "SessionLocal", lambda: FakeSession(rows))
+    
+    result = scheduled.generate_usage_reports()
+    
+    assert result["organizations_processed"] == 40
+    assert len(delivered["reports"]) == 40
+    assert delivered["max_in_flight"] <= 4
+
+
+@pytest.fixture
+def old_rows():
+    """SQLite session over a table of 7 expired rows and 2 recent ones"""
+    engine = create_engine("sqlite://")
+    metadata = MetaData()
+    table = Table(
+        "usage", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("day", Date, nullable=False),
+    )
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(table.insert(), [
+            {"id": i, "day": date(2025, 1, 1) if i <= 7 else date(2026, 6, 1)}
+            for i in range(1, 10)
+        ])
+    
+    db = Session(engine)
+    statements = []
+    execute = db.execute
+    
+    def counting_execute(stmt, *args, **kwargs):
+        statements.append(stmt)
+        return execute(stmt, *args, **kwargs)
+    
+    db.execute = counting_execute
+    yield db, table, statements
+    db.close()
+
+
+def test_delete_in_chunks_stops_on_short_chunk(old_rows):
+    """Test that a chunk smaller than the chunk size ends the loop"""
+    db, table, statements = old_rows
+    progress = []
+    
+    deleted = scheduled._delete_in_chunks(
+        db, table, table.c.day, date(2026, 1, 1), 3, progress.append
+    )
+    
+    assert deleted == 7
+    assert progress == [3, 6, 7]
+    # Lookup + DELETE for each of the 3 chunks, no trailing empty lookup
+    assert len(statements) == 6
+    assert db.execute(select(func.count()).select_from(table)).scalar() == 2
+
+
+class InterruptedSession:
+    """Session whose first DELETE is cut off by the soft time limit"""
+    
+    def __init__(self):
+        self.rolled_back = False
+    
+    def execute(self, stmt):
+        if isinstance(stmt, Delete):
+            raise SoftTimeLimitExceeded()
+        return MagicMock(one=lambda: (5, 5))
+    
+    def commit(self):
+        pass
+    
+    def rollback(self):
+        self.rolled_back = True
+    
+    def close(self):
+        pass
+
+
+def test_cleanup_requeues_with_original_cutoff(monkeypatch):
+    """Test that hitting the soft time limit mid-chunk re-queues the same cutoff"""
+    session = InterruptedSession()
+    requeue = MagicMock()
+    monkeypatch.setattr(scheduled, "SessionLocal", lambda: session)
+    monkeypatch.setattr(scheduled.cleanup_old_usage_data, "apply_async", requeue)
+    
+    result = scheduled.cleanup_old_usage_data(days=30, cutoff="2025-10-01T12:30:00")
+    
+    assert result["status"] == "partial"
+    assert session.rolled_back
+    requeue.assert_called_once_with(
+        kwargs={"days": 30, "cutoff": "2025-10-01T12:30:00"}
+    )
@@ -0,0 +1,59 @@
+import pytest
+from app.core import security
+from app.core.config import settings
+
+
+@pytest.fixture
+def fast_hashing(monkeypatch):
+    """Cheap bcrypt cost and a thread pool so the tests stay quick"""
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 4)
+    monkeypatch.setattr(settings, "PASSWORD_HASH_EXECUTOR", "thread")
+    security.shutdown_password_hasher()
+    yield
+    security.shutdown_password_hasher()
+
+
+@pytest.mark.asyncio
+async def test_async_hash_and_verify(fast_hashing):
+    """Test hashing and verification through the pool"""
+    hashed = await security.get_password_hash_async("TestPass123!")
+    
+    assert await security.verify_password_async("TestPass123!", hashed)
+    assert not await security.verify_password_async("wrong", hashed)
+
+
+def test_needs_rehash_when_cost_changes(fast_hashing, monkeypatch):
+    """Test that hashes with a different cost factor are flagged"""
+    hashed = security.get_password_hash("TestPass123!")
+    assert not security.password_needs_rehash(hashed)
+    
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 5)
+    assert security.password_needs_rehash(hashed)
+
+
+def test_decode_token_cache_respects_expiry(monkeypatch):
+    """Test that a cached token is served until exp and not after"""
+    security.clear_token_cache()
+    token = security.create_access_token({"sub": 1})
+    payload = security.decode_token(token)
+    
+    calls = []
+    monkeypatch.setattr(security.jwt, "decode", lambda *a, **kw: calls.append(a) or {})
+    assert security.decode_token(token) == payload
+    assert calls == []
+    
+    monkeypatch.setattr(security.time, "time", lambda: payload["exp"] + 1)
+    security.decode_token(token)
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_revoked_token_is_rejected(fake_redis, monkeypatch):
+    """Test the optional revocation check"""
+    monkeypatch.setattr(settings, "JWT_REVOCATION_CHECK", True)
+    
+    token = security.create_access_token({"sub": 1})
+    assert not await security.is_token_revoked(security.decode_token(token))
+    
+    assert await security.revoke_token(token)
+    assert await security.is_token_revoked(security.decode_token(token))
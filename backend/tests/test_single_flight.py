@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+from app.core.config import settings
+from app.services.single_flight import SingleFlight
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_upstream_call():
+    """Test that followers get the leader's result, even if the leader goes away"""
+    flight = SingleFlight()
+    calls = []
+    
+    async def upstream():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"message": "shared"}
+    
+    leader = asyncio.create_task(flight.do("k", upstream))
+    await asyncio.sleep(0)
+    followers = [asyncio.create_task(flight.do("k", upstream)) for _ in range(5)]
+    await asyncio.sleep(0)
+    leader.cancel()
+    
+    assert [await f for f in followers] == [{"message": "shared"}] * 5
+    assert len(calls) == 1
+    
+    # Finished calls aren't reused
+    assert await flight.do("k", upstream) == {"message": "shared"}
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_stream_fans_out_to_late_subscribers():
+    """Test that every subscriber sees all chunks and the upstream stops when all leave"""
+    flight = SingleFlight()
+    started = []
+    closed = asyncio.Event()
+    
+    async def upstream():
+        started.append(1)
+        try:
+            for chunk in ("a", "b", "c"):
+                await asyncio.sleep(0.02)
+                yield chunk
+            await asyncio.sleep(10)
+            yield "never"
+        finally:
+            closed.set()
+    
+    async def collect(limit):
+        received = []
+        async for chunk in flight.stream("s", upstream):
+            received.append(chunk)
+            if len(received) == limit:
+                break
+        return received
+    
+    first = asyncio.create_task(collect(3))
+    await asyncio.sleep(0.03)
+    second = asyncio.create_task(collect(3))
+    
+    assert await first == ["a", "b", "c"]
+    assert await second == ["a", "b", "c"]
+    assert len(started) == 1
+    await asyncio.wait_for(closed.wait(), 1)
+
+
+@pytest.mark.asyncio
+async def test_cross_worker_waiter_gets_leader_result(fake_redis, monkeypatch):
+    """Test coalescing across two workers through the Redis lock"""
+    monkeypatch.setattr(settings, "AI_SINGLE_FLIGHT_CROSS_WORKER", True)
+    calls = []
+    
+    async def upstream():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return {"message": f"answer {len(calls)}"}
+    
+    results = await asyncio.gather(
+        SingleFlight().do("k", upstream),
+        SingleFlight().do("k", upstream)
+    )
+    
+    assert results == [{"message": "answer 1"}] * 2
+    assert len(calls) == 1
+    assert await fake_redis.get("single_flight:lock:k") is None
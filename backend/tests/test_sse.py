@@ -0,0 +1,31 @@
+from app.core.sse import encode_batch, encode_event
+
+
+def test_multiline_chunks_are_framed():
+    """Test that newlines in a chunk become separate data fields"""
+    assert encode_event("def f():\n    return 1\r\n") == (
+        "data: def f():\ndata:     return 1\ndata: \n\n"
+    )
+    assert encode_event("hi", "g:1") == "id: g:1\ndata: hi\n\n"
+
+
+def test_batch_merges_text_but_not_markers():
+    """Test that adjacent text is merged up to the size bound, markers stay separate"""
+    payloads = [("Hel", "g:1"), ("lo ", "g:2"), ("world", "g:3"), ("[DONE]", "g:4")]
+    
+    assert encode_batch(payloads, max_bytes=6) == (
+        "id: g:2\ndata: Hello \n\n"
+        "id: g:3\ndata: world\n\n"
+        "id: g:4\ndata: [DONE]\n\n"
+    )
+    assert encode_batch(payloads) == "".join(encode_event(p, i) for p, i in payloads)
+
+
+def test_batch_size_counts_encoded_bytes():
+    """Test that the merge bound is measured in UTF-8 bytes, not characters"""
+    payloads = [("héé", "g:1"), ("à", "g:2"), ("b", "g:3")]
+    
+    assert encode_batch(payloads, max_bytes=6) == (
+        "id: g:2\ndata: hééà\n\n"
+        "id: g:3\ndata: b\n\n"
+    )
@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+from app.core.config import settings
+from app.services.stream_buffer import ResumableStreams, StreamNotFound
+
+
+async def chunks(*payloads, delay=0.0):
+    for payload in payloads:
+        await asyncio.sleep(delay)
+        yield payload
+
+
+@pytest.mark.asyncio
+async def test_resume_after_disconnect(fake_redis):
+    """Test that a reconnect gets the rest of a generation that kept running"""
+    streams = ResumableStreams()
+    generation = streams.start(1, chunks("Hel", "lo", "[DONE]", delay=0.02))
+    gid = generation.generation_id
+    
+    live = generation.events()
+    assert await live.__anext__() == f"id: {gid}:1\ndata: Hel\n\n"
+    await live.aclose()
+    
+    resumed = await streams.resume(1, f"{gid}:1")
+    assert "".join([frame async for frame in resumed]) == (
+        f"id: {gid}:2\ndata: lo\n\n"
+        f"id: {gid}:3\ndata: [DONE]\n\n"
+    )
+    assert 0 < await fake_redis.ttl(generation.key) <= settings.AI_STREAM_BUFFER_TTL_SECONDS
+    
+    # Other organizations and unknown ids can't resume
+    with pytest.raises(StreamNotFound):
+        await streams.resume(2, f"{gid}:1")
+    with pytest.raises(StreamNotFound):
+        await streams.resume(1, "garbage")
+
+
+@pytest.mark.asyncio
+async def test_resume_reports_trimmed_buffer(fake_redis, monkeypatch):
+    """Test that a position trimmed from the bounded buffer isn't silently skipped"""
+    monkeypatch.setattr(settings, "AI_STREAM_BUFFER_MAX_CHUNKS", 2)
+    streams = ResumableStreams()
+    generation = streams.start(1, chunks("a", "b", "c", "d", "[DONE]"))
+    await streams.stop()
+    
+    assert await fake_redis.xlen(generation.key) == 2
+    resumed = await streams.resume(1, f"{generation.generation_id}:1")
+    frames = [frame async for frame in resumed]
+    assert frames == ["data: [ERROR] Stream buffer no longer holds this position\n\n"]
+
+
+@pytest.mark.asyncio
+async def test_abandoned_generation_is_cancelled(fake_redis, monkeypatch):
+    """Test that the upstream is closed once nobody reads or resumes the stream"""
+    monkeypatch.setattr(settings, "AI_STREAM_RESUME_GRACE_SECONDS", 0.05)
+    closed = asyncio.Event()
+    
+    async def endless():
+        try:
+            while True:
+                await asyncio.sleep(0.01)
+                yield "token "
+        finally:
+            closed.set()
+    
+    streams = ResumableStreams()
+    generation = streams.start(1, endless())
+    live = generation.events()
+    await live.__anext__()
+    await live.aclose()
+    
+    await asyncio.wait_for(closed.wait(), 1)
+    assert await fake_redis.xlen(generation.key) > 1
+    assert generation.abandoned
+
+
+@pytest.mark.asyncio
+async def test_shutdown_cancel_is_not_abandonment(fake_redis):
+    """Test that generations cut off by stop() are not marked abandoned"""
+    async def endless():
+        while True:
+            await asyncio.sleep(0.01)
+            yield "token "
+    
+    streams = ResumableStreams()
+    generation = streams.start(1, endless())
+    await generation.events().__anext__()
+    await streams.stop(timeout=0.05)
+    
+    assert not generation.abandoned
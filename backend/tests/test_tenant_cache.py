@@ -0,0 +1,68 @@
+import pytest
+from datetime import datetime, timezone
+from app.core import tenant_cache
+from app.models.organization import Organization
+from app.models.subscription import Subscription, PlanType, SubscriptionStatus
+from app.models.user import User
+
+@pytest.fixture(autouse=True)
+def clear_local_cache():
+    """Start and end each test with an empty in-process layer"""
+    tenant_cache.clear_local()
+    yield
+    tenant_cache.clear_local()
+
+
+def _payload(user_id=1, org_id=10):
+    return {
+        "user": tenant_cache.dump_row(User(id=user_id, email="a@b.c", hashed_password="secret")),
+        "organization": tenant_cache.dump_row(Organization(id=org_id, name="Acme", slug="acme")),
+        "membership": None,
+        "subscription": None,
+    }
+
+
+def test_rows_round_trip_without_password():
+    """Test that enums and datetimes survive and the password hash is not cached"""
+    period_end = datetime(2026, 1, 31, tzinfo=timezone.utc)
+    subscription = Subscription(
+        id=5, organization_id=10, plan_type=PlanType.PRO,
+        status=SubscriptionStatus.ACTIVE, current_period_end=period_end
+    )
+    
+    restored = tenant_cache.load_row(Subscription, tenant_cache.dump_row(subscription))
+    assert restored.plan_type is PlanType.PRO
+    assert restored.current_period_end == period_end
+    
+    user_row = tenant_cache.dump_row(User(id=1, email="a@b.c", hashed_password="secret"))
+    assert "hashed_password" not in user_row
+
+
+@pytest.mark.asyncio
+async def test_org_invalidation_clears_both_layers(fake_redis):
+    """Test that invalidating an org drops local and Redis entries of every member"""
+    await tenant_cache.store(1, "acme", _payload(user_id=1))
+    await tenant_cache.store(2, "10", _payload(user_id=2))
+    await tenant_cache.store(3, "", {**_payload(user_id=3), "organization": None})
+    
+    assert (await tenant_cache.get_cached(1, "acme"))["user"]["id"] == 1
+    
+    await tenant_cache.invalidate_org(10)
+    
+    assert await tenant_cache.get_cached(1, "acme") is None
+    assert await tenant_cache.get_cached(2, "10") is None
+    assert await fake_redis.get("tenant:1:acme") is None
+    assert await tenant_cache.get_cached(3, "") is not None
+
+
+def test_excluded_column_raises_instead_of_lazy_loading():
+    """Test that a rebuilt user's password hash is not silently loaded"""
+    from sqlalchemy.exc import InvalidRequestError
+    from sqlalchemy.orm import Session
+    
+    row = tenant_cache.dump_row(User(id=1, email="a@b.c", hashed_password="secret"))
+    user = Session().merge(tenant_cache.load_row(User, row), load=False)
+    
+    assert user.email == "a@b.c"
+    with pytest.raises(InvalidRequestError, match="raiseload"):
+        user.hashed_password
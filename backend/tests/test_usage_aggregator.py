@@ -0,0 +1,67 @@
+import pytest
+from contextlib import asynccontextmanager
+from app.services import usage_aggregator as aggregator_module
+from app.services.usage_aggregator import UsageAggregator
+
+
+@pytest.fixture
+def flushed(monkeypatch):
+    """Capture UPSERT batches instead of writing to the database"""
+    batches = []
+    
+    @asynccontextmanager
+    async def fake_session():
+        yield None
+    
+    async def fake_upsert(db, rows):
+        batches.append(rows)
+    
+    async def fake_invalidate(org_dates):
+        list(org_dates)
+    
+    monkeypatch.setattr(aggregator_module, "async_session_maker", fake_session)
+    monkeypatch.setattr(aggregator_module.crud_ai_usage, "upsert_usage_deltas", fake_upsert)
+    monkeypatch.setattr(aggregator_module, "invalidate_usage_summaries", fake_invalidate)
+    return batches
+
+
+@pytest.mark.asyncio
+async def test_deltas_are_merged_per_org_model_day(flushed):
+    """Test that many requests become one row per (org, model, date)"""
+    aggregator = UsageAggregator(flush_interval=60, max_events=1000)
+    aggregator.add(1, "gemini-2.0-flash", 10, 20, 1)
+    aggregator.add(1, "gemini-2.0-flash", 5, 5, 0)
+    aggregator.add(2, "gemini-2.0-flash", 1, 1, 0)
+    
+    await aggregator.stop()
+    
+    assert len(flushed) == 1
+    rows = {row["organization_id"]: row for row in flushed[0]}
+    assert rows[1]["message_count"] == 2
+    assert rows[1]["input_tokens"] == 15
+    assert rows[1]["total_tokens"] == 40
+    assert rows[1]["estimated_cost"] == 1
+    assert rows[2]["message_count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_deltas(flushed, monkeypatch):
+    """Test that a failed flush is retried with nothing lost"""
+    aggregator = UsageAggregator(flush_interval=60, max_events=1000)
+    aggregator.add(1, "gpt-4o-mini", 10, 10, 0)
+    
+    upsert = aggregator_module.crud_ai_usage.upsert_usage_deltas
+    
+    async def failing_upsert(db, rows):
+        raise RuntimeError("database unavailable")
+    
+    monkeypatch.setattr(aggregator_module.crud_ai_usage, "upsert_usage_deltas", failing_upsert)
+    await aggregator.flush()
+    assert flushed == []
+    
+    monkeypatch.setattr(aggregator_module.crud_ai_usage, "upsert_usage_deltas", upsert)
+    aggregator.add(1, "gpt-4o-mini", 10, 10, 0)
+    await aggregator.stop()
+    
+    assert flushed[0][0]["message_count"] == 2
+    assert flushed[0][0]["input_tokens"] == 20
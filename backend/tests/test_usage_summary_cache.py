@@ -0,0 +1,31 @@
+import pytest
+from datetime import date
+from app.services import usage_summary_cache
+
+@pytest.fixture
+def db_queries(fake_redis, monkeypatch):
+    """Count summary queries; the cache itself is the in-memory Redis"""
+    queries = []
+    
+    async def fake_summary(db, org_id):
+        queries.append(org_id)
+        return {"total_messages": len(queries), "models_breakdown": {}}
+    
+    monkeypatch.setattr(usage_summary_cache.crud_ai_usage, "get_usage_summary", fake_summary)
+    return queries
+
+
+@pytest.mark.asyncio
+async def test_summary_is_cached_until_invalidated(db_queries):
+    """Test that polling hits the cache and new usage invalidates it"""
+    first = await usage_summary_cache.get_usage_summary(None, 1)
+    second = await usage_summary_cache.get_usage_summary(None, 1)
+    
+    assert first == second
+    assert db_queries == [1]
+    
+    await usage_summary_cache.invalidate_usage_summaries([(1, date.today())])
+    third = await usage_summary_cache.get_usage_summary(None, 1)
+    
+    assert third["total_messages"] == 2
+    assert db_queries == [1, 1]
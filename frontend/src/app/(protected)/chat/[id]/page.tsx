@@ -6,6 +6,7 @@ import { useParams, useRouter } from "next/navigation";
 import { ChatContainer } from "@/components/chat/chat-container";
 import { ChatInput } from "@/components/chat/chat-input";
 import { api } from "@/lib/api";
+import { createSSEParser } from "@/lib/sse";
 import { toast } from "sonner";
 import { Loader2 } from "lucide-react";
 
@@ -157,36 +158,33 @@ export default function ChatPage() {
 
         let accumulatedContent = "";
 
+        const parser = createSSEParser((data) => {
+          if (data === "[DONE]") {
+            return;
+          }
+
+          // The backend sends plain text chunks, not JSON
+          accumulatedContent += data;
+
+          // Update message with accumulated content
+          setMessages((prev) =>
+            prev.map((msg) =>
+              msg.id === aiMessageId
+                ? { ...msg, content: accumulatedContent }
+                : msg
+            )
+          );
+        });
+
         while (true) {
           const { done, value } = await reader.read();
 
           if (done) {
+            parser.end();
             break;
           }
 
-          const chunk = decoder.decode(value, { stream: true });
-          const lines = chunk.split("\n");
-
-          for (const line of lines) {
-            if (line.startsWith("data: ")) {
-              const data = line.slice(6).trim();
-              if (data === "[DONE]" || !data) {
-                continue;
-              }
-
-              // The backend sends plain text chunks, not JSON
-              accumulatedContent += data;
-
-              // Update message with accumulated content
-              setMessages((prev) =>
-                prev.map((msg) =>
-                  msg.id === aiMessageId
-                    ? { ...msg, content: accumulatedContent }
-                    : msg
-                )
-              );
-            }
-          }
+          parser.push(decoder.decode(value, { stream: true }));
         }
 
         setIsStreaming(false);
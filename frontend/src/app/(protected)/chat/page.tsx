@@ -6,6 +6,7 @@ import { useRouter } from "next/navigation";
 import { ChatContainer } from "@/components/chat/chat-container";
 import { ChatInput } from "@/components/chat/chat-input";
 import { api } from "@/lib/api";
+import { createSSEParser } from "@/lib/sse";
 import { toast } from "sonner";
 
 interface ChatMessage {
@@ -131,54 +132,42 @@ export default function NewChatPage() {
 
       console.log("Starting to read stream...");
       let accumulatedContent = "";
-      let buffer = "";
       let chunkCount = 0;
 
+      const parser = createSSEParser((data) => {
+        if (data === "[DONE]") {
+          console.log("Received [DONE] signal");
+          return;
+        }
+
+        chunkCount++;
+        console.log(`Chunk #${chunkCount}:`, data);
+
+        // Backend sends plain text chunks directly
+        accumulatedContent += data;
+
+        // Update message with accumulated content
+        setMessages((prev) =>
+          prev.map((msg) =>
+            msg.id === aiMessageId
+              ? { ...msg, content: accumulatedContent }
+              : msg
+          )
+        );
+      });
+
       while (true) {
         const { done, value } = await reader.read();
 
         if (done) {
           console.log("Stream reading done");
+          parser.end();
           break;
         }
 
         const decoded = decoder.decode(value, { stream: true });
         console.log("Raw chunk received:", decoded);
-        buffer += decoded;
-        const lines = buffer.split("\n");
-        
-        // Keep the last incomplete line in the buffer
-        buffer = lines.pop() || "";
-
-        for (const line of lines) {
-          console.log("Processing line:", line);
-          if (line.startsWith("data: ")) {
-            const data = line.slice(6);  // Don't trim - preserve spaces
-            if (data.trim() === "[DONE]") {
-              console.log("Received [DONE] signal");
-              continue;
-            }
-            if (!data) {
-              console.log("Empty data, skipping");
-              continue;
-            }
-
-            chunkCount++;
-            console.log(`Chunk #${chunkCount}:`, data);
-            
-            // Backend sends plain text chunks directly
-            accumulatedContent += data;
-
-            // Update message with accumulated content
-            setMessages((prev) =>
-              prev.map((msg) =>
-                msg.id === aiMessageId
-                  ? { ...msg, content: accumulatedContent }
-                  : msg
-              )
-            );
-          }
-        }
+        parser.push(decoded);
       }
 
       console.log(`Stream complete. Received ${chunkCount} chunks. Total content length: ${accumulatedContent.length}`);
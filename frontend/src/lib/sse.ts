@@ -0,0 +1,58 @@
+/**
+ * Incremental parser for a text/event-stream response body.
+ *
+ * Feed it decoded text as it arrives with `push`; it calls `onData` once per
+ * event with that event's `data:` lines joined by "\n", so chunks containing
+ * newlines (markdown, code blocks) and blank lines arrive intact. `id:`,
+ * `event:` and `:` comment lines are ignored.
+ */
+export function createSSEParser(onData: (data: string) => void) {
+  let buffer = "";
+  let dataLines: string[] | null = null; // null until the event has a data line
+
+  const processLine = (line: string) => {
+    if (line === "") {
+      // A blank line ends the event
+      if (dataLines !== null) {
+        onData(dataLines.join("\n"));
+      }
+      dataLines = null;
+      return;
+    }
+    if (line.startsWith(":")) {
+      return;
+    }
+
+    const colon = line.indexOf(":");
+    const field = colon === -1 ? line : line.slice(0, colon);
+    let value = colon === -1 ? "" : line.slice(colon + 1);
+    if (value.startsWith(" ")) {
+      value = value.slice(1);
+    }
+    if (field === "data") {
+      if (dataLines === null) {
+        dataLines = [];
+      }
+      dataLines.push(value);
+    }
+  };
+
+  return {
+    push(text: string) {
+      buffer += text;
+      const lines = buffer.split(/\r?\n/);
+      // Keep the last incomplete line in the buffer
+      buffer = lines.pop() || "";
+      lines.forEach(processLine);
+    },
+
+    /** Flush an event the stream ended without terminating */
+    end() {
+      if (buffer) {
+        processLine(buffer);
+      }
+      buffer = "";
+      processLine("");
+    },
+  };
+}